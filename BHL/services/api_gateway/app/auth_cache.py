@@ -0,0 +1,166 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from jose import ExpiredSignatureError, JWTError, jwt
+from redis import asyncio as aioredis
+
+from .clients import get_client
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidTokenError(Exception):
+    """서명/만료 검증에 실패했거나 auth 서비스가 토큰을 거부한 경우."""
+
+
+class UserCache:
+    """
+    토큰 -> 사용자 정보 TTL/LRU 캐시.
+    항목은 min(ttl, 토큰 만료 시각)까지만 유효하며, max_size 를 넘으면 가장 오래 사용하지 않은 항목부터 제거한다.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # token -> (user, expires_at)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[dict]:
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        user, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[token]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return user
+
+    def set(self, token: str, user: dict, token_exp: Optional[float] = None) -> None:
+        expires_at = time.time() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        self._entries[token] = (user, expires_at)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate_user(self, username: str) -> int:
+        tokens = [t for t, (user, _) in self._entries.items() if user.get("username") == username]
+        for token in tokens:
+            del self._entries[token]
+        return len(tokens)
+
+    def invalidate_token(self, token: str) -> int:
+        return 1 if self._entries.pop(token, None) is not None else 0
+
+    def clear(self) -> int:
+        count = len(self._entries)
+        self._entries.clear()
+        return count
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+user_cache = UserCache(max_size=settings.AUTH_CACHE_MAX_SIZE, ttl=settings.AUTH_CACHE_TTL_SEC)
+
+
+def verify_token(token: str) -> dict:
+    """auth 서비스와 같은 비밀키로 JWT 서명과 만료를 로컬에서 검증하고 payload 를 반환한다."""
+    try:
+        payload = jwt.decode(token, settings.AUTH_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+    except ExpiredSignatureError as e:
+        raise InvalidTokenError("토큰이 만료되었습니다") from e
+    except JWTError as e:
+        raise InvalidTokenError(f"유효하지 않은 토큰: {e}") from e
+    if not payload.get("sub"):
+        raise InvalidTokenError("토큰에 사용자 정보(sub)가 없습니다")
+    return payload
+
+
+async def resolve_user(auth_header: str) -> dict:
+    """
+    Authorization 헤더로 사용자 정보를 조회한다.
+    캐시에 있으면 네트워크 호출 없이 반환하고, 없으면 로컬 검증을 통과한 토큰에 한해 auth 서비스에서 한 번 조회해 캐시한다.
+    """
+    scheme, _, token = auth_header.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise InvalidTokenError("Bearer 토큰이 아닙니다")
+
+    user = user_cache.get(token)
+    if user is not None:
+        return user
+
+    payload = verify_token(token)
+
+    # 사용자 레코드(삭제/권한 변경 여부)는 auth 서비스 기준으로 확인
+    response = await get_client("auth").get("/users/me", headers={"Authorization": auth_header})
+    if response.status_code != 200:
+        raise InvalidTokenError(f"auth 서비스가 토큰을 거부했습니다 (status={response.status_code})")
+    user = response.json()
+
+    exp = payload.get("exp")
+    user_cache.set(token, user, token_exp=float(exp) if exp is not None else None)
+    return user
+
+
+def apply_invalidation(message: str) -> int:
+    """
+    무효화 메시지 처리.
+    {"username": "..."} 는 해당 사용자의 모든 토큰, {"token": "..."} 는 해당 토큰, {"all": true} 또는 "*" 는 전체 캐시를 지운다.
+    """
+    if message == "*":
+        return user_cache.clear()
+    data = json.loads(message)
+    if data.get("all"):
+        return user_cache.clear()
+    removed = 0
+    if data.get("username"):
+        removed += user_cache.invalidate_user(data["username"])
+    if data.get("token"):
+        removed += user_cache.invalidate_token(data["token"])
+    return removed
+
+
+async def listen_invalidations() -> None:
+    """Redis pub/sub 채널을 구독해 캐시 무효화 메시지를 반영한다. 연결이 끊기면 캐시를 비우고 재연결한다."""
+    backoff = 1.0
+    while True:
+        redis = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(settings.AUTH_INVALIDATION_CHANNEL)
+            logger.info(f"인증 캐시 무효화 채널 구독: {settings.AUTH_INVALIDATION_CHANNEL}")
+            backoff = 1.0
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                try:
+                    removed = apply_invalidation(message["data"])
+                    logger.info(f"인증 캐시 무효화: {removed}개 항목 제거")
+                except (ValueError, AttributeError) as e:
+                    logger.warning(f"잘못된 인증 캐시 무효화 메시지: {message['data']!r} ({e})")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 구독이 끊긴 동안의 무효화 메시지를 놓쳤을 수 있으므로 캐시 전체를 비운다
+            user_cache.clear()
+            logger.warning(f"인증 캐시 무효화 채널 연결 끊김, {backoff:.0f}초 후 재연결: {e}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+        finally:
+            try:
+                await pubsub.close()
+                await redis.close()
+            except Exception:
+                pass
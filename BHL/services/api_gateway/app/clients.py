@@ -0,0 +1,180 @@
+import logging
+import time
+from typing import Dict
+
+import httpx
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 는 h2 패키지(httpx[http2])가 설치된 경우에만 사용
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def _upstream_urls() -> Dict[str, str]:
+    return {
+        "converter": settings.CONVERTER_SERVICE_URL,
+        "transcription": settings.TRANSCRIPTION_SERVICE_URL,
+        "summarization": settings.SUMMARIZATION_SERVICE_URL,
+        "database": settings.DATABASE_SERVICE_URL,
+        "auth": settings.AUTH_SERVICE_URL,
+        "s3": settings.S3_SERVICE_URL,
+    }
+
+
+class UpstreamStats:
+    """업스트림별 요청 통계 (요청 수, 진행 중 요청 수, 오류 수, 응답 헤더까지의 누적 시간)."""
+
+    def __init__(self):
+        self.requests = 0
+        self.in_flight = 0
+        self.errors = 0
+        self.status_codes: Dict[str, int] = {}
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def to_dict(self) -> dict:
+        completed = self.requests - self.in_flight
+        return {
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "errors": self.errors,
+            "status_codes": dict(self.status_codes),
+            "avg_latency_ms": round(self.total_seconds / completed * 1000, 2) if completed else 0.0,
+            "max_latency_ms": round(self.max_seconds * 1000, 2),
+        }
+
+
+class StatsTransport(httpx.AsyncHTTPTransport):
+    """요청마다 통계를 기록하고 커넥션 풀 상태를 조회할 수 있는 전송 계층."""
+
+    def __init__(self, stats: UpstreamStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        stats = self.stats
+        stats.requests += 1
+        stats.in_flight += 1
+        started = time.monotonic()
+        try:
+            response = await super().handle_async_request(request)
+        except Exception:
+            stats.errors += 1
+            raise
+        else:
+            code = str(response.status_code)
+            stats.status_codes[code] = stats.status_codes.get(code, 0) + 1
+            return response
+        finally:
+            elapsed = time.monotonic() - started
+            stats.in_flight -= 1
+            stats.total_seconds += elapsed
+            stats.max_seconds = max(stats.max_seconds, elapsed)
+
+    def pool_stats(self) -> dict:
+        # _pool.connections / info() 는 httpcore 내부 API 라 버전에 따라 없을 수 있다.
+        # 없으면 직접 센 요청 통계(in_flight)만 보고한다
+        pool = getattr(self, "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return {"available": False, "in_flight": self.stats.in_flight}
+        connections = list(connections)
+
+        def count(check) -> int:
+            total = 0
+            for c in connections:
+                try:
+                    total += bool(check(c))
+                except Exception:
+                    pass
+            return total
+
+        return {
+            "available": True,
+            "connections": len(connections),
+            "idle": count(lambda c: c.is_idle()),
+            "active": count(lambda c: not c.is_idle() and not c.is_closed()),
+            "http2": count(lambda c: "HTTP/2" in c.info()),
+        }
+
+
+class ClientRegistry:
+    """
+    업스트림 서비스별로 앱 수명 동안 유지되는 httpx.AsyncClient 모음.
+    요청마다 클라이언트를 만들고 닫지 않고, keep-alive 커넥션 풀을 재사용한다.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._transports: Dict[str, StatsTransport] = {}
+        self._stats: Dict[str, UpstreamStats] = {}
+
+    def _build(self, name: str) -> httpx.AsyncClient:
+        urls = _upstream_urls()
+        if name not in urls:
+            raise KeyError(f"알 수 없는 업스트림: {name}")
+
+        max_connections = settings.UPSTREAM_MAX_CONNECTIONS.get(name, settings.UPSTREAM_DEFAULT_MAX_CONNECTIONS)
+        max_keepalive = min(settings.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS, max_connections)
+        limits = httpx.Limits(max_connections=max_connections,
+                              max_keepalive_connections=max_keepalive,
+                              keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY)
+        if name == "converter":
+            # 대용량 업로드를 스트리밍하므로 읽기/쓰기 타임아웃을 길게 둔다
+            timeout = httpx.Timeout(settings.UPLOAD_PROXY_TIMEOUT, connect=settings.UPLOAD_PROXY_CONNECT_TIMEOUT)
+        else:
+            timeout = httpx.Timeout(settings.UPSTREAM_TIMEOUT, connect=settings.UPSTREAM_CONNECT_TIMEOUT)
+
+        http2 = name in settings.UPSTREAM_HTTP2_SERVICES
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning(f"{name}: h2 패키지가 없어 HTTP/1.1 로 연결합니다")
+            http2 = False
+
+        stats = UpstreamStats()
+        transport = StatsTransport(stats, limits=limits, http2=http2)
+        client = httpx.AsyncClient(base_url=urls[name], transport=transport, timeout=timeout)
+        self._stats[name] = stats
+        self._transports[name] = transport
+        logger.info(f"업스트림 클라이언트 생성: {name} ({urls[name]}, max_connections={max_connections}, http2={http2})")
+        return client
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._build(name)
+        return client
+
+    async def aclose(self) -> None:
+        for name, client in list(self._clients.items()):
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"{name} 클라이언트 종료 실패: {e}")
+        self._clients.clear()
+
+    def stats(self) -> dict:
+        result = {}
+        for name, stats in self._stats.items():
+            entry = stats.to_dict()
+            transport = self._transports.get(name)
+            if transport is not None:
+                try:
+                    entry["pool"] = transport.pool_stats()
+                except Exception as e:
+                    entry["pool"] = {"error": str(e)}
+            result[name] = entry
+        return result
+
+
+clients = ClientRegistry()
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """업스트림 이름(converter, transcription, summarization, database, auth, s3)으로 공유 클라이언트 조회."""
+    return clients.get(name)
@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings
+from typing import Dict, List, Optional
 import os
 
 
@@ -6,6 +7,11 @@ class Settings(BaseSettings):
     # Redis 설정
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
+    # MongoDB 설정 (Redis 에 없는 작업 상태는 work_db.jobs 에서 조회)
+    MONGODB_URI: Optional[str] = os.getenv("MONGODB_URI")
+    WORK_MONGODB_DB: str = os.getenv("WORK_MONGODB_DB", "mars_work_db")
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 3000
+
     # 마이크로서비스 URL 설정
     CONVERTER_SERVICE_URL: str = os.getenv(
         "CONVERTER_SERVICE_URL", "http://converter:8000"
@@ -25,6 +31,34 @@ class Settings(BaseSettings):
     
     S3_SERVICE_URL: str = "http://s3_service:8000"    
 
+    # JWT 로컬 검증 설정 (auth 서비스와 같은 비밀키/알고리즘 사용)
+    AUTH_SECRET_KEY: str = os.getenv("AUTH_SECRET_KEY", "your-super-secret-key-change-this-in-production")
+    JWT_ALGORITHM: str = "HS256"
+    AUTH_CACHE_TTL_SEC: float = 300.0          # 토큰별 사용자 정보 캐시 유지 시간 (토큰 만료 시각을 넘지 않음)
+    AUTH_CACHE_MAX_SIZE: int = 10000
+    AUTH_INVALIDATION_CHANNEL: str = "auth:invalidate"  # 캐시 무효화 Redis pub/sub 채널
+
+    # 업스트림 HTTP 클라이언트 설정 (app/clients.py)
+    UPSTREAM_DEFAULT_MAX_CONNECTIONS: int = 50
+    UPSTREAM_MAX_CONNECTIONS: Dict[str, int] = {
+        "converter": 20,       # 대용량 업로드 스트리밍
+        "database": 100,       # 목록/상세 조회 프록시
+        "auth": 100,           # 인증 미들웨어
+    }
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    UPSTREAM_KEEPALIVE_EXPIRY: float = 30.0
+    UPSTREAM_CONNECT_TIMEOUT: float = 5.0
+    UPSTREAM_TIMEOUT: float = 30.0
+    UPSTREAM_HTTP2_SERVICES: List[str] = []   # HTTP/2 를 지원하는 업스트림 이름 (h2 패키지 필요)
+
+    # 업로드 프록시 설정 (Total_Processing -> converter)
+    UPLOAD_PROXY_CONNECT_TIMEOUT: float = 5.0
+    UPLOAD_PROXY_TIMEOUT: float = 300.0       # 대용량 업로드를 고려한 읽기/쓰기 타임아웃
+
+    # 작업 상태 조회 설정
+    STATUS_STREAM_HEARTBEAT_SEC: float = 15.0  # SSE 연결 유지용 주석 이벤트 간격
+    STATUS_BATCH_MAX_IDS: int = 100            # /status?ids= 로 한 번에 조회할 수 있는 최대 작업 수
+
     # 출력 디렉토리 경로 설정
     AUDIO_OUTPUT_DIR: str = "/app/audio_outputs"
 
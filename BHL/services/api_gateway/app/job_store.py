@@ -0,0 +1,216 @@
+import json
+import logging
+from datetime import datetime, UTC
+from typing import Dict, List, Optional
+
+from pymongo import MongoClient
+from redis import asyncio as aioredis
+from redis.exceptions import ResponseError, WatchError
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+from .models import ProcessingJob
+
+logger = logging.getLogger(__name__)
+
+# 작업 상태는 job:{job_id} 해시에 필드별로 저장한다.
+#   job_id, status, created_at, updated_at, stages.{stage}.status, stages.{stage}.job_id, stages.{stage}.error
+# 단계별 갱신은 해당 필드만 HSET 하므로 동시에 도착한 웹훅이 서로의 변경을 덮어쓰지 않는다.
+STAGE_FIELDS = ("status", "job_id", "error")
+
+redis_client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+
+# 키가 해시로 존재할 때만 필드를 갱신 (없으면 0, 이전 JSON 문자열 형식이면 -1)
+_UPDATE_IF_EXISTS = redis_client.register_script("""
+local t = redis.call('TYPE', KEYS[1])['ok']
+if t == 'none' then
+    return 0
+end
+if t ~= 'hash' then
+    return -1
+end
+redis.call('HSET', KEYS[1], unpack(ARGV))
+return 1
+""")
+
+
+# Redis 에 없는 작업(만료, 재시작 등)은 워커가 관리하는 work_db.jobs 상태 문서에서 _id 로 조회한다
+_mongo_client: Optional[MongoClient] = None
+
+
+def _jobs_collection():
+    global _mongo_client
+    if not settings.MONGODB_URI:
+        return None
+    if _mongo_client is None:
+        _mongo_client = MongoClient(settings.MONGODB_URI, tz_aware=True,
+                                    serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS)
+    return _mongo_client[settings.WORK_MONGODB_DB].jobs
+
+
+def _from_state(doc: dict) -> dict:
+    """work_db.jobs 문서를 Redis 작업 상태와 같은 형식으로 변환한다."""
+    def iso(value):
+        return value.isoformat() if isinstance(value, datetime) else value
+
+    stages = {}
+    for stage, state in (doc.get("stages") or {}).items():
+        stages[stage] = {"status": state.get("status"), "job_id": None, "error": state.get("error")}
+    return {
+        "job_id": doc["_id"],
+        "status": doc.get("status"),
+        "stages": stages,
+        "created_at": iso(doc.get("created_at")),
+        "updated_at": iso(doc.get("updated_at")),
+    }
+
+
+async def _get_states(job_ids: List[str]) -> Dict[str, dict]:
+    jobs = _jobs_collection()
+    if jobs is None or not job_ids:
+        return {}
+    try:
+        docs = await run_in_threadpool(lambda: list(jobs.find({"_id": {"$in": job_ids}})))
+    except Exception as e:
+        logger.warning(f"작업 상태 문서 조회 실패: {e}")
+        return {}
+    return {doc["_id"]: _from_state(doc) for doc in docs}
+
+
+def job_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def event_channel(job_id: str) -> str:
+    """작업 상태가 바뀔 때마다 변경된 필드를 발행하는 pub/sub 채널."""
+    return f"job-events:{job_id}"
+
+
+async def _publish(job_id: str, fields: Dict[str, str]) -> None:
+    try:
+        await redis_client.publish(event_channel(job_id), json.dumps({"job_id": job_id, "fields": fields}))
+    except Exception as e:
+        # 상태 저장은 이미 끝났으므로 발행 실패는 구독자만 놓친다 (다음 조회/이벤트로 복구)
+        logger.warning(f"작업 이벤트 발행 실패 ({job_id}): {e}")
+
+
+def _now() -> str:
+    return datetime.now(UTC).isoformat()
+
+
+def _flatten(job: dict) -> Dict[str, str]:
+    fields = {}
+    for key in ("job_id", "status", "created_at", "updated_at"):
+        value = job.get(key)
+        if value is not None:
+            fields[key] = value.isoformat() if isinstance(value, datetime) else str(value)
+    for stage, stage_status in (job.get("stages") or {}).items():
+        for name in STAGE_FIELDS:
+            value = stage_status.get(name)
+            if value is not None:
+                fields[f"stages.{stage}.{name}"] = str(value)
+    return fields
+
+
+def _unflatten(fields: Dict[str, str]) -> dict:
+    """해시 필드를 기존 JSON 형식(stages 중첩 dict)으로 되돌린다."""
+    job = {"job_id": None, "status": None, "stages": {}, "created_at": None, "updated_at": None}
+    for key, value in fields.items():
+        if key.startswith("stages."):
+            _, stage, name = key.split(".", 2)
+            stage_status = job["stages"].setdefault(stage, {name: None for name in STAGE_FIELDS})
+            stage_status[name] = value
+        else:
+            job[key] = value
+    return job
+
+
+async def create_job(job: ProcessingJob) -> None:
+    key = job_key(job.job_id)
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.delete(key)
+        pipe.hset(key, mapping=_flatten(job.model_dump()))
+        await pipe.execute()
+    await _publish(job.job_id, {"status": job.status})
+
+
+async def _migrate_legacy(job_id: str) -> None:
+    """이전 형식(JSON 문자열)으로 저장된 작업을 해시로 변환한다."""
+    key = job_key(job_id)
+    async with redis_client.pipeline(transaction=True) as pipe:
+        try:
+            await pipe.watch(key)
+            if await pipe.type(key) != "string":
+                return
+            legacy = json.loads(await pipe.get(key))
+            pipe.multi()
+            pipe.delete(key)
+            pipe.hset(key, mapping=_flatten(legacy))
+            await pipe.execute()
+            logger.info(f"작업 상태를 해시 형식으로 변환: {job_id}")
+        except WatchError:
+            # 다른 요청이 먼저 변환함
+            pass
+
+
+async def get_job(job_id: str) -> Optional[dict]:
+    key = job_key(job_id)
+    try:
+        fields = await redis_client.hgetall(key)
+    except ResponseError:
+        # 이전 형식(JSON 문자열)
+        legacy = await redis_client.get(key)
+        return json.loads(legacy) if legacy else None
+    if fields:
+        return _unflatten(fields)
+    return (await _get_states([job_id])).get(job_id)
+
+
+async def get_jobs(job_ids: List[str]) -> Dict[str, Optional[dict]]:
+    """여러 작업을 한 번의 파이프라인(HGETALL x N)으로 조회한다. Redis 에 없으면 작업 상태 문서로 보충하고, 그래도 없으면 None."""
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for job_id in job_ids:
+            pipe.hgetall(job_key(job_id))
+        results = await pipe.execute(raise_on_error=False)
+    jobs = {}
+    for job_id, fields in zip(job_ids, results):
+        if isinstance(fields, ResponseError):
+            # 이전 형식(JSON 문자열)은 개별 조회
+            jobs[job_id] = await get_job(job_id)
+        else:
+            jobs[job_id] = _unflatten(fields) if fields else None
+    missing = [job_id for job_id, job in jobs.items() if job is None]
+    if missing:
+        # Redis 에 없는 작업은 작업 상태 문서를 한 번의 $in 조회로 보충
+        jobs.update(await _get_states(missing))
+    return jobs
+
+
+async def update_job(job_id: str, fields: Dict[str, str]) -> bool:
+    """
+    작업 해시의 지정한 필드만 원자적으로 갱신한다 (updated_at 포함).
+    작업이 없으면 False 를 반환하고 새로 만들지 않는다.
+    """
+    fields = dict(fields)
+    fields.setdefault("updated_at", _now())
+    args = [item for pair in fields.items() for item in pair]
+    key = job_key(job_id)
+    result = await _UPDATE_IF_EXISTS(keys=[key], args=args)
+    if result == -1:
+        await _migrate_legacy(job_id)
+        result = await _UPDATE_IF_EXISTS(keys=[key], args=args)
+    if result == 1:
+        await _publish(job_id, fields)
+    return result == 1
+
+
+def stage_fields(stage: str, status: Optional[str] = None, job_id: Optional[str] = None,
+                 error: Optional[str] = None) -> Dict[str, str]:
+    values = {"status": status, "job_id": job_id, "error": error}
+    return {f"stages.{stage}.{name}": value for name, value in values.items() if value is not None}
+
+
+async def close() -> None:
+    await redis_client.close()
+    if _mongo_client is not None:
+        _mongo_client.close()
@@ -1,17 +1,22 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Response, Query, Request, Body, Depends, Form
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from redis import Redis
 from datetime import datetime, UTC
 import httpx
+import asyncio
 import uuid
 import json
 import logging
 import os
+import time
 from .config import Settings
-from .models import ProcessingJob, StageStatus, UploadRequest, RegisterRequest, LoginRequest
+from .models import ProcessingJob, StageStatus, StageEvent, UploadRequest, RegisterRequest, LoginRequest
 from .middleware import auth_middleware  # 미들웨어 임포트
+from .clients import clients, get_client
+from .auth_cache import listen_invalidations, user_cache
+from . import job_store
+from .job_store import stage_fields
 from typing import List, Optional
 
 # 로깅 설정
@@ -45,14 +50,37 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
-# Redis 연결
-redis_client = Redis.from_url(settings.REDIS_URL, decode_responses=True)
+# Redis 연결 (asyncio 클라이언트, 작업 상태는 app/job_store.py 의 job:{job_id} 해시)
+
+
+# 인증 캐시 무효화 채널 구독
+@app.on_event("startup")
+async def start_auth_invalidation_listener():
+    app.state.auth_invalidation_task = asyncio.create_task(listen_invalidations())
+
+# 업스트림 HTTP 클라이언트는 app/clients.py 레지스트리에서 앱 수명 동안 공유
+@app.on_event("shutdown")
+async def close_http_clients():
+    task = getattr(app.state, "auth_invalidation_task", None)
+    if task is not None:
+        task.cancel()
+    await clients.aclose()
+    await job_store.close()
 
 # Auth 관련 설정
 security = HTTPBearer()
 
 @app.post("/Total_Processing")
-async def Total_Processing(file: UploadFile = File(...), user_name: str = Form(...)):
+async def Total_Processing(request: Request):
+    """
+    multipart 요청 본문(file, user_name)을 파싱하지 않고 도착하는 대로 converter 의 /convert 로 스트리밍한다.
+    파일 전체를 게이트웨이 메모리나 임시 파일에 올리지 않으므로 메모리 사용량은 청크 크기에만 비례한다.
+    user_name 폼 필드는 converter 가 같은 본문에서 직접 읽고, 없으면 converter 가 422 로 거절한다.
+    """
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("multipart/form-data"):
+        raise HTTPException(status_code=400, detail="multipart/form-data 요청만 지원합니다")
+
     try:
         job_id = str(uuid.uuid4())
         current_time = datetime.now(UTC)
@@ -73,108 +101,212 @@ async def Total_Processing(file: UploadFile = File(...), user_name: str = Form(.
         )
 
         # Redis에 저장
-        redis_result = redis_client.set(f"job:{job_id}", job_status.model_dump_json())
-        logger.info(f"Redis 저장 결과: {redis_result}, job_id: {job_id}")
-
-        # 오디오 변환 서비스로 파일 전송 (job_id 포함)
-        async with httpx.AsyncClient() as client:
-            files = {"file": (file.filename, file.file, file.content_type)}
-            response = await client.post(
-                f"{settings.CONVERTER_SERVICE_URL}/convert", files=files, params={"job_id": job_id, "user_name": user_name}
+        await job_store.create_job(job_status)
+        logger.info(f"Redis 저장 완료, job_id: {job_id}")
+
+        # 오디오 변환 서비스로 요청 본문을 그대로 스트리밍 (boundary 유지를 위해 Content-Type 그대로 전달)
+        headers = {"Content-Type": content_type}
+        if "content-length" in request.headers:
+            headers["Content-Length"] = request.headers["content-length"]
+        response = await get_client("converter").post(
+            "/convert", content=request.stream(), headers=headers, params={"job_id": job_id}
+        )
+
+        if response.status_code == 422:
+            # converter 가 폼 필드(user_name 등) 누락을 거절 - 작업은 실패 처리하고 검증 오류를 그대로 전달
+            await job_store.update_job(job_id, {"status": "failed", **stage_fields("conversion", status="failed")})
+            raise HTTPException(status_code=422, detail=response.json().get("detail"))
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=response.status_code, detail="오디오 변환 요청 실패"
             )
 
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=response.status_code, detail="오디오 변환 요청 실패"
-                )
+        result = response.json()
+        if result.get("status") == "completed":
+            # 같은 녹음을 이미 처리한 경우 converter 가 캐시된 결과를 연결하고 바로 완료함
+            fields = {"status": "completed"}
+            for stage in ("conversion", "transcription", "summarization"):
+                fields.update(stage_fields(stage, status="completed"))
+            await job_store.update_job(job_id, fields)
+            logger.info(f"중복 업로드, 캐시 결과로 완료: {job_id} <- {result.get('cached_from')}")
+            return {"job_id": job_id, "status": "completed", "cached_from": result.get("cached_from")}
 
-            # 상태 업데이트
-            job_status.stages["conversion"].status = "processing"
-            job_status.updated_at = datetime.now(UTC)
-            redis_result = redis_client.set(
-                f"job:{job_id}", job_status.model_dump_json()
-            )
-            logger.info(f"Redis 업데이트 결과: {redis_result}")
+        # 상태 업데이트
+        redis_result = await job_store.update_job(job_id, stage_fields("conversion", status="processing"))
+        logger.info(f"Redis 업데이트 결과: {redis_result}")
 
         return {"job_id": job_id, "status": "processing"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"처리 중 오류 발생: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/status")
+async def get_job_statuses(ids: List[str] = Query(...)):
+    """여러 작업 상태 일괄 조회 (?ids=a,b,c 또는 ?ids=a&ids=b). Redis 파이프라인 한 번으로 조회한다."""
+    job_ids = list(dict.fromkeys(i.strip() for value in ids for i in value.split(",") if i.strip()))
+    if len(job_ids) > settings.STATUS_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"한 번에 최대 {settings.STATUS_BATCH_MAX_IDS}개 작업까지 조회할 수 있습니다",
+        )
+    try:
+        jobs = await job_store.get_jobs(job_ids)
+        return {
+            "jobs": {job_id: job for job_id, job in jobs.items() if job},
+            "not_found": [job_id for job_id, job in jobs.items() if not job],
+        }
+    except Exception as e:
+        logger.error(f"상태 일괄 조회 중 오류 발생: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# 더 이상 바뀌지 않는 작업 상태
+TERMINAL_JOB_STATUSES = ("completed", "failed")
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.get("/status/{job_id}/stream")
+async def stream_job_status(job_id: str, request: Request):
+    """
+    작업 상태를 Server-Sent Events 로 전달한다.
+    연결 직후 현재 상태를 보내고, 이후 웹훅이 상태를 갱신할 때마다(job-events:{job_id} 발행) 새 상태를 보낸다.
+    작업이 끝나면(completed/failed) 스트림을 닫는다.
+    """
+    # 구독을 먼저 시작해야 현재 상태 조회와 구독 사이의 변경을 놓치지 않는다
+    pubsub = job_store.redis_client.pubsub()
+    await pubsub.subscribe(job_store.event_channel(job_id))
+    job_status = await job_store.get_job(job_id)
+    if not job_status:
+        await pubsub.close()
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다")
+
+    async def events():
+        try:
+            yield _sse_event("status", job_status)
+            if job_status.get("status") in TERMINAL_JOB_STATUSES:
+                return
+            last_sent = time.monotonic()
+            while not await request.is_disconnected():
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None:
+                    # 프록시가 유휴 연결을 끊지 않도록 주석 이벤트 전송
+                    if time.monotonic() - last_sent >= settings.STATUS_STREAM_HEARTBEAT_SEC:
+                        yield ": keepalive\n\n"
+                        last_sent = time.monotonic()
+                    continue
+                current = await job_store.get_job(job_id)
+                if not current:
+                    break
+                yield _sse_event("status", current)
+                last_sent = time.monotonic()
+                if current.get("status") in TERMINAL_JOB_STATUSES:
+                    break
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/status/{job_id}")
 async def get_job_status(job_id: str):
     try:
-        job_status = redis_client.get(f"job:{job_id}")
+        job_status = await job_store.get_job(job_id)
         if not job_status:
             raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다")
 
-        return json.loads(job_status)
+        return job_status
 
     except Exception as e:
         logger.error(f"상태 조회 중 오류 발생: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/webhook/status/{job_id}")
+async def status_webhook(job_id: str, event: StageEvent):
+    """
+    Celery chain 모드의 단계 상태 이벤트. 단계 간 연결은 워커들이 브로커에서 직접 하므로
+    게이트웨이는 다른 서비스를 호출하지 않고 작업 상태만 갱신한다.
+    """
+    try:
+        logger.info(f"상태 이벤트 수신: {job_id} {event.stage}={event.status}")
+        fields = stage_fields(event.stage, status=event.status, error=event.error)
+        if event.status == "failed":
+            fields["status"] = "failed"
+        elif event.stage == "summarization" and event.status == "completed":
+            fields["status"] = "completed"
+        elif event.status == "processing":
+            fields["status"] = "processing"
+
+        if not await job_store.update_job(job_id, fields):
+            return {"status": "ignored", "detail": "작업을 찾을 수 없습니다"}
+        return {"status": "success"}
+
+    except Exception as e:
+        logger.error(f"상태 이벤트 처리 중 오류 발생: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/webhook/conversion/{job_id}")
 async def conversion_webhook(job_id: str):
     try:
         logger.info(f"변환 완료 웹훅 수신: {job_id}")
 
         # Redis에서 작업 상태 조회
-        job_status_str = redis_client.get(f"job:{job_id}")
-        logger.info(f"Redis에서 조회된 작업 상태: {job_status_str}")
+        job_status = await job_store.get_job(job_id)
+        logger.info(f"Redis에서 조회된 작업 상태: {job_status}")
 
-        if not job_status_str:
+        if not job_status:
             return {"status": "ignored", "detail": "작업을 찾을 수 없습니다"}
 
-        job_status = json.loads(job_status_str)
-
         # Converter 서비스에서 변환 상태 확인
-        async with httpx.AsyncClient() as client:
-            conv_response = await client.get(
-                f"{settings.CONVERTER_SERVICE_URL}/convert/{job_id}"
+        conv_response = await get_client("converter").get(f"/convert/{job_id}")
+        if conv_response.status_code != 200:
+            raise HTTPException(
+                status_code=conv_response.status_code, detail="변환 상태 조회 실패"
             )
-            if conv_response.status_code != 200:
-                raise HTTPException(
-                    status_code=conv_response.status_code, detail="변환 상태 조회 실패"
-                )
 
-            conv_data = conv_response.json()
-            converted_file_path = conv_data.get("output_file")
+        conv_data = conv_response.json()
+        converted_file_path = conv_data.get("output_file")
 
-            # 파일 경로를 api_gateway의 마운트된 경로로 변환
-            converted_file_path = converted_file_path.replace(
-                "/app/audio_outputs", settings.AUDIO_OUTPUT_DIR
-            )
-            logger.info(f"변환된 파일 경로: {converted_file_path}")
-
-            if not os.path.exists(converted_file_path):
-                logger.error(f"파일이 존재하지 않음: {converted_file_path}")
-                raise FileNotFoundError(
-                    f"변환된 파일을 찾을 수 없습니다: {converted_file_path}"
-                )
-
-            # Transcription 서비스로 요청 전송
-            # job_id를 쿼리 파라미터로 전달
-            trans_response = await client.post(
-                f"{settings.TRANSCRIPTION_SERVICE_URL}/transcribe",
-                params={"job_id": job_id},  # job_id를 쿼리 파라미터로 추가
+        # 파일 경로를 api_gateway의 마운트된 경로로 변환
+        converted_file_path = converted_file_path.replace(
+            "/app/audio_outputs", settings.AUDIO_OUTPUT_DIR
+        )
+        logger.info(f"변환된 파일 경로: {converted_file_path}")
+
+        if not os.path.exists(converted_file_path):
+            logger.error(f"파일이 존재하지 않음: {converted_file_path}")
+            raise FileNotFoundError(
+                f"변환된 파일을 찾을 수 없습니다: {converted_file_path}"
             )
 
-            trans_response.raise_for_status()
-            transcription_job = trans_response.json()
+        # Transcription 서비스로 요청 전송
+        # job_id를 쿼리 파라미터로 전달
+        trans_response = await get_client("transcription").post(
+            "/transcribe",
+            params={"job_id": job_id},  # job_id를 쿼리 파라미터로 추가
+        )
 
-            # 작업 상태 업데이트
-            job_status["stages"]["conversion"]["status"] = "completed"
-            job_status["stages"]["transcription"]["job_id"] = transcription_job[
-                "job_id"
-            ]
-            job_status["stages"]["transcription"]["status"] = "processing"
-            job_status["updated_at"] = datetime.now(UTC).isoformat()
+        trans_response.raise_for_status()
+        transcription_job = trans_response.json()
 
-            redis_client.set(f"job:{job_id}", json.dumps(job_status))
+        # 작업 상태 업데이트 (해당 단계 필드만 갱신)
+        await job_store.update_job(job_id, {
+            **stage_fields("conversion", status="completed"),
+            **stage_fields("transcription", status="processing", job_id=transcription_job["job_id"]),
+        })
 
         return {"status": "success"}
 
@@ -195,55 +327,25 @@ async def conversion_webhook(job_id: str):
 
 @app.post("/webhook/transcription/{job_id}")
 async def transcription_webhook(job_id: str):
+    """
+    전사 완료 웹훅. 요약 태스크는 transcription 워커가 전사 결과 참조(transcript_ref)를 담아 직접 큐에 넣으므로
+    게이트웨이는 전사 텍스트를 조회하거나 전달하지 않고 상태만 갱신한다.
+    """
     try:
         logger.info(f"텍스트 변환 완료 웹훅 수신: {job_id}")
 
-        # Redis에서 작업 상태 조회
-        job_status_str = redis_client.get(f"job:{job_id}")
-        if not job_status_str:
+        # 작업 상태 업데이트 (해당 단계 필드만 갱신, 작업이 없으면 갱신하지 않음)
+        updated = await job_store.update_job(job_id, {
+            **stage_fields("transcription", status="completed"),
+            **stage_fields("summarization", status="processing", job_id=job_id),
+        })
+        if not updated:
             raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다")
 
-        job_status = json.loads(job_status_str)
-
-        # 텍스트 변환 결과 조회
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{settings.TRANSCRIPTION_SERVICE_URL}/transcript/{job_id}"
-            )
-
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail="텍스트 변환 결과 조회 실패",
-                )
-
-            transcript_data = response.json()
-
-            # 요약 작업 시작
-            summarize_response = await client.post(
-                f"{settings.SUMMARIZATION_SERVICE_URL}/summarize/{job_id}",
-                json={"text": transcript_data["text"]},
-            )
-
-            if summarize_response.status_code != 200:
-                raise HTTPException(
-                    status_code=summarize_response.status_code, detail="요약 요청 실패"
-                )
-
-            summarization_job = summarize_response.json()
-
-            # 작업 상태 업데이트
-            job_status["stages"]["transcription"]["status"] = "completed"
-            job_status["stages"]["summarization"]["job_id"] = summarization_job[
-                "job_id"
-            ]
-            job_status["stages"]["summarization"]["status"] = "processing"
-            job_status["updated_at"] = datetime.now(UTC).isoformat()
-
-            redis_client.set(f"job:{job_id}", json.dumps(job_status))
-
         return {"status": "success"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"텍스트 변환 웹훅 처리 중 오류 발생: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -254,21 +356,14 @@ async def summarization_webhook(job_id: str):
     try:
         logger.info(f"요약 완료 웹훅 수신: {job_id}")
 
-        # Redis에서 작업 상태 조회
-        job_status = redis_client.get(f"job:{job_id}")
-        if not job_status:
+        # 작업 상태 업데이트 (작업이 없으면 갱신하지 않음)
+        updated = await job_store.update_job(job_id, {
+            **stage_fields("summarization", status="completed"),
+            "status": "completed",
+        })
+        if not updated:
             raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다")
 
-        job_status = json.loads(job_status)
-
-        # 작업 상태 업데이트
-        job_status["stages"]["summarization"]["status"] = "completed"
-        job_status["status"] = "completed"
-        # datetime 객체를 ISO 형식 문자열로 변환
-        job_status["updated_at"] = datetime.now(UTC).isoformat()
-
-        redis_client.set(f"job:{job_id}", json.dumps(job_status))
-
         return {"status": "success"}
 
     except Exception as e:
@@ -276,14 +371,13 @@ async def summarization_webhook(job_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 # 공통 헤더 전달을 위한 유틸리티 함수
-async def proxy_request(method: str, url: str, **kwargs):
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.request(method, url, **kwargs)
-            return Response(content=response.content, status_code=response.status_code, headers=dict(response.headers))
-        except httpx.RequestError as exc:
-            logger.error(f"Request error: {exc}")
-            raise HTTPException(status_code=500, detail="Internal server error") from exc
+async def proxy_request(method: str, url: str, upstream: str = "database", **kwargs):
+    try:
+        response = await get_client(upstream).request(method, url, **kwargs)
+        return Response(content=response.content, status_code=response.status_code, headers=dict(response.headers))
+    except httpx.RequestError as exc:
+        logger.error(f"Request error: {exc}")
+        raise HTTPException(status_code=500, detail="Internal server error") from exc
 
 # ### Calls 엔드포인트 ###
 
@@ -468,10 +562,9 @@ async def get_audio_stream(name: str, request: Request):
         # 미들웨어에서 설정된 사용자 정보 사용
         user_name = request.state.user["username"]
         # 오디오 스트림 URL 조회
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{settings.S3_SERVICE_URL}/audio/stream/{name}", params={"user_name": user_name})
-            response.raise_for_status()
-            return response.json()
+        response = await get_client("s3").get(f"/audio/stream/{name}", params={"user_name": user_name})
+        response.raise_for_status()
+        return response.json()
     except HTTPException:
         raise
     except Exception as e:
@@ -486,18 +579,16 @@ async def upload_file(upload_request: UploadRequest, request: Request):
     try:
         # 미들웨어에서 설정된 사용자 정보 사용
         user_name = request.state.user["username"]
-        url = f"{settings.S3_SERVICE_URL}/audio/upload/"
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url,
-                params={"user_name": user_name},
-                json={
-                    "filename": upload_request.filename,
-                    "content_type": upload_request.content_type
-                }
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await get_client("s3").post(
+            "/audio/upload/",
+            params={"user_name": user_name},
+            json={
+                "filename": upload_request.filename,
+                "content_type": upload_request.content_type
+            }
+        )
+        response.raise_for_status()
+        return response.json()
     except Exception as e:
         logger.error(f"파일 업로드 URL 생성 중 오류 발생: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -507,6 +598,11 @@ async def upload_file(upload_request: UploadRequest, request: Request):
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def http_client_metrics():
+    """업스트림별 HTTP 클라이언트 요청 통계와 커넥션 풀 상태"""
+    return {"upstreams": clients.stats(), "auth_cache": user_cache.stats()}
+
 @app.post("/register")
 async def register(request: RegisterRequest):
     try:
@@ -524,24 +620,23 @@ async def register(request: RegisterRequest):
             "password": request.password
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{settings.AUTH_SERVICE_URL}/register",
-                json=register_data,  # data 대신 json 사용
-                headers={
-                    "Content-Type": "application/json",
-                    "Accept": "application/json"
-                }
-            )
+        response = await get_client("auth").post(
+            "/register",
+            json=register_data,  # data 대신 json 사용
+            headers={
+                "Content-Type": "application/json",
+                "Accept": "application/json"
+            }
+        )
             
-            if response.status_code >= 400:
-                error_detail = response.json().get("detail", "회원가입 실패")
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=error_detail
-                )
+        if response.status_code >= 400:
+            error_detail = response.json().get("detail", "회원가입 실패")
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=error_detail
+            )
                 
-            return response.json()
+        return response.json()
     except HTTPException:
         raise
     except Exception as e:
@@ -560,24 +655,23 @@ async def login(request: LoginRequest):
             "grant_type": "password"
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{settings.AUTH_SERVICE_URL}/token",
-                data=form_data,
-                headers={
-                    "Content-Type": "application/x-www-form-urlencoded",
-                    "Accept": "application/json"
-                }
-            )
+        response = await get_client("auth").post(
+            "/token",
+            data=form_data,
+            headers={
+                "Content-Type": "application/x-www-form-urlencoded",
+                "Accept": "application/json"
+            }
+        )
             
-            if response.status_code == 401:
-                raise HTTPException(
-                    status_code=401,
-                    detail="아이디 또는 비밀번호가 올바르지 않습니다"
-                )
+        if response.status_code == 401:
+            raise HTTPException(
+                status_code=401,
+                detail="아이디 또는 비밀번호가 올바르지 않습니다"
+            )
             
-            response.raise_for_status()
-            return response.json()
+        response.raise_for_status()
+        return response.json()
             
     except HTTPException:
         raise
@@ -588,18 +682,17 @@ async def login(request: LoginRequest):
 @app.get("/users/me")
 async def get_current_user(request: Request):
     try:
-        async with httpx.AsyncClient() as client:
-            # 요청의 Authorization 헤더를 그대로 전달
-            headers = {
-                "Authorization": request.headers.get("Authorization"),
-                "Accept": "application/json"
-            }
-            response = await client.get(
-                f"{settings.AUTH_SERVICE_URL}/users/me",
-                headers=headers
-            )
-            response.raise_for_status()
-            return response.json()
+        # 요청의 Authorization 헤더를 그대로 전달
+        headers = {
+            "Authorization": request.headers.get("Authorization"),
+            "Accept": "application/json"
+        }
+        response = await get_client("auth").get(
+            "/users/me",
+            headers=headers
+        )
+        response.raise_for_status()
+        return response.json()
     except HTTPException:
         raise
     except Exception as e:
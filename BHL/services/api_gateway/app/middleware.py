@@ -1,7 +1,7 @@
 from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
-import httpx
 import logging
+from .auth_cache import InvalidTokenError, resolve_user
 
 logger = logging.getLogger(__name__)
 
@@ -33,7 +33,8 @@ async def auth_middleware(request: Request, call_next):
         "/properties",  # 매물 관련 API - 개인정보와 매물 데이터 보호
         "/calls",      # 통화 관련 API - 통화 기록 보호
         "/users",      # 사용자 관련 API - 사용자 정보 보호
-        "/audio"
+        "/audio",
+        "/metrics"     # 업스트림 HTTP 클라이언트/인증 캐시 통계 - 내부 운영 정보 보호
     ]
     
     # 인증이 필요없는 경로들
@@ -64,22 +65,16 @@ async def auth_middleware(request: Request, call_next):
             )
 
         try:
-            # 토큰 검증
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    "http://auth:8000/users/me",
-                    headers={"Authorization": auth_header}
-                )
-                
-                if response.status_code != 200:
-                    return make_cors_aware_response(
-                        status_code=401,
-                        content={"detail": "인증이 만료되었거나 유효하지 않습니다. 다시 로그인해주세요."}
-                    )
+            # 토큰 검증 (로컬 서명/만료 검증 + 사용자 정보 캐시, 캐시 미스일 때만 auth 서비스 호출)
+            # 사용자 정보를 request.state에 저장
+            request.state.user = await resolve_user(auth_header)
 
-                # 사용자 정보를 request.state에 저장
-                request.state.user = response.json()
-                
+        except InvalidTokenError as e:
+            logger.info(f"인증 실패: {e}")
+            return make_cors_aware_response(
+                status_code=401,
+                content={"detail": "인증이 만료되었거나 유효하지 않습니다. 다시 로그인해주세요."}
+            )
         except Exception as e:
             logger.error(f"인증 서비스 오류: {str(e)}")
             return make_cors_aware_response(
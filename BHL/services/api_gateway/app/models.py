@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Dict, Optional
+from typing import Dict, Literal, Optional
 from datetime import datetime
 
 class StageStatus(BaseModel):
@@ -7,6 +7,11 @@ class StageStatus(BaseModel):
     job_id: Optional[str] = None
     error: Optional[str] = None
 
+class StageEvent(BaseModel):
+    stage: Literal["conversion", "transcription", "summarization"]
+    status: Literal["processing", "completed", "failed"]
+    error: Optional[str] = None
+
 class ProcessingJob(BaseModel):
     job_id: str
     status: str
@@ -5,14 +5,39 @@ class Settings(BaseSettings):
     MONGODB_URI: str = os.getenv("MONGODB_URI")
     MONGODB_DB: str = "converter_db"
     WORK_MONGODB_DB: str = "mars_work_db"
+    MONGO_MAX_POOL_SIZE: int = 10                   # 워커 프로세스당 MongoDB 커넥션 풀 크기
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGO_HEALTHCHECK_INTERVAL_SEC: float = 30.0    # 공유 클라이언트 ping 확인 간격
+
+    # 이벤트 로그(db.logs) 버퍼링: 개수/시간 임계값에 도달하면 bulk_write, 실패 시 스풀 디렉토리에 JSONL 로 보관
+    EVENT_LOG_MAX_BATCH: int = 100
+    EVENT_LOG_FLUSH_INTERVAL_SEC: float = 1.0
+    EVENT_LOG_SPOOL_DIR: str = "/app/spool/event_log"
+
+    # 작업 상태 컬렉션(work_db.jobs) 임대: 만료되면 스캐너가 단계를 다시 큐에 넣는다
+    JOB_LEASE_SEC: int = 300               # 처리 중 임대 (하트비트로 연장)
+    JOB_LEASE_RENEW_SEC: float = 60.0      # 하트비트 연장 주기 (JOB_LEASE_SEC 보다 충분히 짧게)
+    JOB_QUEUE_LEASE_SEC: int = 3600        # 큐 등록 후 워커가 시작할 때까지의 임대
     
     # 디렉토리 설정
     UPLOAD_DIR: str = "/app/uploads"
     OUTPUT_DIR: str = "/app/audio_outputs"
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024        # 업로드 파일을 디스크에 기록할 때의 청크 크기 (바이트)
+    AUDIO_CACHE_ENABLED: bool = True            # 업로드 내용 해시(SHA-256)가 같은 녹음은 이전 결과를 재사용
     
     # API 설정
     PROJECT_NAME: str = "Audio Converter Service"
     API_GATEWAY_URL: str = "http://api_gateway:8000"
+
+    # 변환 설정
+    STREAMING_CONVERSION: bool = True            # ffmpeg 파이프 스트리밍 변환 사용 (False 면 pydub 전체 디코딩)
+    CONVERSION_PROGRESS_INTERVAL_SEC: float = 5.0  # 진행 상황 로그 갱신 간격
+
+    # 단계 연결 방식: "chain" 이면 변환 -> 전사 -> 요약을 Celery chain 으로 브로커에서 바로 연결하고
+    # 게이트웨이에는 상태 이벤트만 보낸다. "webhook" 이면 기존처럼 단계마다 게이트웨이 웹훅을 거친다.
+    # 기본은 webhook, chain 은 환경 변수(docker-compose 의 ORCHESTRATION_MODE)로 켠다
+    ORCHESTRATION_MODE: str = "webhook"
+    TRANSCRIPTION_OUTPUT_DIR: str = "/app/text_outputs"  # transcription 워커의 OUTPUT_DIR
     
     class Config:
         case_sensitive = True
@@ -0,0 +1,56 @@
+import os
+
+import numpy as np
+
+# 변환된 WAV 옆에 저장하는 에너지 프로파일 파일 접미사 (transcription 서비스와 동일해야 함)
+ENERGY_PROFILE_SUFFIX = ".energy.npy"
+
+
+def energy_profile_path(wav_path: str) -> str:
+    """{job_id}.wav -> {job_id}.energy.npy"""
+    return os.path.splitext(wav_path)[0] + ENERGY_PROFILE_SUFFIX
+
+
+class EnergyProfile:
+    """
+    16bit 모노 PCM 을 블록 단위로 받아 1ms 평균 제곱(mean square) 에너지를 누적한다.
+    transcription 서비스가 오디오를 다시 디코딩하지 않고 묵음 구간을 계산할 수 있도록
+    변환 중에 함께 계산해 float32 .npy 사이드카로 저장한다 (PCM 의 1/8 크기).
+    """
+
+    def __init__(self, frame_rate: int = 16000):
+        if frame_rate % 1000:
+            raise ValueError(f"frame_rate 는 1000 의 배수여야 합니다: {frame_rate}")
+        self.frame_rate = frame_rate
+        self.samples_per_ms = frame_rate // 1000
+        self._blocks = []
+        self._pending = np.zeros(0, dtype=np.int16)
+        self._total_samples = 0
+
+    def update(self, pcm_bytes: bytes) -> None:
+        samples = np.frombuffer(pcm_bytes, dtype=np.int16)
+        self._total_samples += len(samples)
+        if self._pending.size:
+            samples = np.concatenate((self._pending, samples))
+        whole = len(samples) - len(samples) % self.samples_per_ms
+        if whole:
+            block = samples[:whole].astype(np.int64).reshape(-1, self.samples_per_ms)
+            self._blocks.append((block * block).mean(axis=1).astype(np.float32))
+        self._pending = samples[whole:].copy()
+
+    def finalize(self) -> np.ndarray:
+        """길이는 pydub len(AudioSegment) 와 같은 ms 단위 (마지막 부분 ms 는 반올림 규칙을 따름)."""
+        energy = np.concatenate(self._blocks) if self._blocks else np.zeros(0, dtype=np.float32)
+        n_ms = int(round(self._total_samples * 1000.0 / self.frame_rate))
+        if n_ms > len(energy) and self._pending.size:
+            tail = self._pending.astype(np.int64)
+            energy = np.append(energy, np.float32((tail * tail).mean()))
+        return energy
+
+    @property
+    def duration_seconds(self) -> float:
+        return self._total_samples / self.frame_rate
+
+    def save(self, path: str) -> str:
+        np.save(path, self.finalize())
+        return path
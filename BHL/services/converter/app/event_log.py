@@ -0,0 +1,186 @@
+import glob
+import logging
+import os
+import threading
+from itertools import groupby
+from typing import List, Optional, Tuple
+
+from bson import json_util
+from pymongo import InsertOne, UpdateOne
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from .config import settings
+from .db import get_client
+
+logger = logging.getLogger(__name__)
+
+
+def _to_request(record: dict):
+    if record["op"] == "insert":
+        return InsertOne(record["document"])
+    return UpdateOne(record["filter"], record["update"], upsert=record.get("upsert", False))
+
+
+class EventLogSink:
+    """
+    로그 이벤트(db.logs 쓰기)를 메모리에 모았다가 bulk_write 로 한 번에 기록하는 싱크.
+    - max_batch 개가 쌓이거나 flush_interval 초가 지나면 백그라운드 스레드가 기록한다.
+    - 태스크가 끝나면 flush() 로 남은 이벤트를 동기 기록한다 (tasks.py 의 task_postrun).
+    - 기록에 실패한 이벤트는 spool_dir 의 JSONL 파일에 남겼다가 다음 flush 나 워커 시작 시 다시 기록한다.
+    같은 컬렉션의 이벤트는 ordered bulk_write 로 보내므로 호출 순서대로 적용된다.
+    """
+
+    def __init__(self, name: str, max_batch: int = 100, flush_interval: float = 1.0, spool_dir: Optional[str] = None):
+        self.name = name
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.spool_dir = spool_dir
+        self._buffer: List[Tuple[Collection, dict]] = []
+        self._lock = threading.Lock()        # 버퍼 보호
+        self._flush_lock = threading.Lock()  # flush 직렬화 (기록 순서 유지)
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._spool_pending = False
+        self._replay_on_start = False
+        self.flushed = 0
+        self.spooled = 0
+
+    # ---- 기록 API (pymongo 의 update_one / insert_one 과 같은 인자) ----
+
+    def update_one(self, collection: Collection, filter: dict, update: dict, upsert: bool = False) -> None:
+        self._add(collection, {"op": "update", "filter": filter, "update": update, "upsert": upsert})
+
+    def insert_one(self, collection: Collection, document: dict) -> None:
+        self._add(collection, {"op": "insert", "document": document})
+
+    def _add(self, collection: Collection, record: dict) -> None:
+        with self._lock:
+            self._buffer.append((collection, record))
+            full = len(self._buffer) >= self.max_batch
+        self._ensure_thread()
+        if full:
+            self._wakeup.set()
+
+    def _ensure_thread(self) -> None:
+        # fork 된 워커 프로세스에는 부모의 스레드가 없으므로 처음 기록할 때 시작
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-event-log", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            if self._replay_on_start:
+                self.flush()
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"이벤트 로그 백그라운드 기록 실패: {e}")
+
+    # ---- 기록 ----
+
+    def flush(self) -> int:
+        """버퍼의 이벤트를 컬렉션별 bulk_write 로 기록하고 기록한 개수를 반환한다."""
+        with self._flush_lock:
+            if self._replay_on_start:
+                # 워커 시작 시 남아 있던 스풀을 새 이벤트보다 먼저 기록
+                self._replay_on_start = False
+                try:
+                    self._replay_spool()
+                except Exception as e:
+                    logger.warning(f"이벤트 로그 스풀 재기록 실패: {e}")
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            written = 0
+            for collection, items in groupby(batch, key=lambda item: item[0]):
+                records = [record for _, record in items]
+                written += self._write(collection, records)
+            self.flushed += written
+            if written and self._spool_pending:
+                self._replay_spool(own_only=True)
+            return written
+
+    def _write(self, collection: Collection, records: List[dict]) -> int:
+        try:
+            collection.bulk_write([_to_request(r) for r in records], ordered=True)
+            return len(records)
+        except BulkWriteError as e:
+            # ordered 이므로 첫 오류 이전은 적용됨. 오류 난 이벤트는 다시 써도 실패하므로 버리고 나머지만 스풀
+            index = e.details["writeErrors"][0]["index"]
+            logger.error(f"이벤트 로그 기록 오류로 1건 폐기 ({collection.full_name}): {e.details['writeErrors'][0].get('errmsg')}")
+            self._spool(collection, records[index + 1:])
+            return index
+        except PyMongoError as e:
+            # 연결 오류 등 - 일부가 적용됐을 수 있으나 $set 갱신은 다시 적용해도 결과가 같다
+            logger.warning(f"이벤트 로그 기록 실패, 스풀에 보관 ({collection.full_name}, {len(records)}건): {e}")
+            self._spool(collection, records)
+            return 0
+
+    # ---- 스풀 (MongoDB 장애 시 디스크 보관) ----
+
+    def _spool_path(self) -> str:
+        return os.path.join(self.spool_dir, f"{self.name}-{os.getpid()}.jsonl")
+
+    def _spool(self, collection: Collection, records: List[dict]) -> None:
+        if not records:
+            return
+        if not self.spool_dir:
+            logger.error(f"스풀 디렉토리가 없어 이벤트 로그 {len(records)}건 유실 ({collection.full_name})")
+            return
+        os.makedirs(self.spool_dir, exist_ok=True)
+        with open(self._spool_path(), "a", encoding="utf-8") as f:
+            for record in records:
+                line = dict(record, db=collection.database.name, collection=collection.name)
+                f.write(json_util.dumps(line, json_options=json_util.CANONICAL_JSON_OPTIONS) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.spooled += len(records)
+        self._spool_pending = True
+
+    def _replay_spool(self, own_only: bool = False) -> int:
+        """스풀 파일을 다시 기록한다. 다른 프로세스와 겹치지 않도록 파일 이름을 바꿔 선점한 뒤 처리한다."""
+        if not self.spool_dir or not os.path.isdir(self.spool_dir):
+            return 0
+        paths = [self._spool_path()] if own_only else glob.glob(os.path.join(self.spool_dir, f"{self.name}-*.jsonl"))
+        self._spool_pending = False
+        replayed = 0
+        for path in paths:
+            claimed = f"{path}.replay-{os.getpid()}"
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+            with open(claimed, encoding="utf-8") as f:
+                lines = [json_util.loads(line) for line in f if line.strip()]
+            os.remove(claimed)
+            client = get_client(settings.MONGODB_URI)
+            entries = [((line.pop("db"), line.pop("collection")), line) for line in lines]
+            for (db_name, coll_name), items in groupby(entries, key=lambda entry: entry[0]):
+                replayed += self._write(client[db_name][coll_name], [record for _, record in items])
+        if replayed:
+            logger.info(f"스풀된 이벤트 로그 {replayed}건 재기록")
+        return replayed
+
+    def start(self) -> None:
+        """
+        워커 프로세스 시작 시 호출 - 이전에 남은 스풀을 백그라운드 스레드에서 기록한다.
+        장애 후에는 스풀이 클 수 있어 worker_process_init(제한 시간 약 4초) 안에서 기다리지 않는다.
+        재기록은 flush 안에서 먼저 하므로 이 프로세스의 새 이벤트는 스풀 이후에 기록된다.
+        """
+        self._replay_on_start = True
+        self._ensure_thread()
+
+    def stats(self) -> dict:
+        with self._lock:
+            buffered = len(self._buffer)
+        return {"buffered": buffered, "flushed": self.flushed, "spooled": self.spooled}
+
+
+event_log = EventLogSink(
+    name=settings.MONGODB_DB,
+    max_batch=settings.EVENT_LOG_MAX_BATCH,
+    flush_interval=settings.EVENT_LOG_FLUSH_INTERVAL_SEC,
+    spool_dir=settings.EVENT_LOG_SPOOL_DIR,
+)
@@ -0,0 +1,275 @@
+import logging
+import os
+import socket
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from .config import settings
+
+UTC = timezone.utc
+logger = logging.getLogger(__name__)
+
+# 작업 상태 컬렉션 (work_db.jobs) - 작업마다 문서 하나, _id 는 job_id
+# {
+#   _id, job_id, status: pending|processing|completed|failed, created_at, updated_at,
+#   stages: {
+#     conversion|transcription|summarization: {
+#       status: pending|queued|processing|completed|failed|failed_missing_input,
+#       attempts, lease_owner, lease_expires_at, started_at, finished_at, updated_at, error,
+#       (단계별 입력/결과 참조: input_path, output_file, transcript_ref ...)
+#     }
+#   }
+# }
+# 상태 전이는 모두 현재 상태를 조건으로 건 find_one_and_update / update_one (compare-and-set) 으로만 한다.
+#
+# 임대(lease):
+#   queued     - 태스크를 큐에 넣은 쪽(스캐너/이전 단계)이 JOB_QUEUE_LEASE_SEC 동안 잡는다. 겹친 스캔이 같은 작업을 중복 등록하지 않는다.
+#   processing - 처리 중인 워커가 JOB_LEASE_SEC 동안 잡고, LeaseHeartbeat 가 JOB_LEASE_RENEW_SEC 마다 연장한다.
+#   어느 쪽이든 만료되면 (워커 종료, 메시지 유실) 스캐너가 다시 queued 로 가져가 재등록한다.
+STAGES = ("conversion", "transcription", "summarization")
+STARTABLE_STATUSES = ("pending", "queued", "failed")
+LEASED_STATUSES = ("queued", "processing")
+FINAL_STAGE = STAGES[-1]
+
+
+def _now() -> datetime:
+    return datetime.now(UTC)
+
+
+def jobs_collection(client):
+    return client[settings.WORK_MONGODB_DB].jobs
+
+
+def ensure_job_indexes(jobs) -> None:
+    """단계별 상태 조회(재시도 스캐너, 대시보드)용 인덱스."""
+    try:
+        jobs.create_index([("status", 1), ("updated_at", -1)], name="status_updated", background=True)
+        for stage in STAGES:
+            jobs.create_index([(f"stages.{stage}.status", 1), (f"stages.{stage}.updated_at", 1)],
+                              name=f"{stage}_status", background=True)
+            jobs.create_index([(f"stages.{stage}.status", 1), (f"stages.{stage}.lease_expires_at", 1)],
+                              name=f"{stage}_lease", background=True)
+    except PyMongoError as e:
+        logger.warning(f"jobs 인덱스 생성 실패: {e}")
+
+
+def worker_id(task_id: Optional[str] = None) -> str:
+    """임대(lease) 소유자 식별자: 호스트:pid[:task_id]"""
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    return f"{owner}:{task_id}" if task_id else owner
+
+
+def create_job(jobs, job_id: str, **fields) -> None:
+    """작업 문서를 만든다 (이미 있으면 그대로 둔다)."""
+    now = _now()
+    on_insert = {"job_id": job_id, "status": "pending", "created_at": now, "updated_at": now}
+    on_insert.update({f"stages.{stage}.status": "pending" for stage in STAGES})
+    on_insert.update({f"stages.{stage}.attempts": 0 for stage in STAGES})
+    on_insert.update(fields)
+    jobs.update_one({"_id": job_id}, {"$setOnInsert": on_insert}, upsert=True)
+
+
+def get_job(jobs, job_id: str) -> Optional[dict]:
+    return jobs.find_one({"_id": job_id})
+
+
+def start_stage(jobs, job_id: str, stage: str, owner: str, **fields) -> Optional[dict]:
+    """
+    단계를 processing 으로 전이하고 임대를 잡는다 (attempts +1).
+    pending/queued/failed 이거나, processing 이지만 임대가 만료된 경우에만 성공하며 갱신된 문서를 반환한다.
+    다른 워커가 처리 중이거나 이미 끝난 단계면 None.
+    """
+    now = _now()
+    prefix = f"stages.{stage}"
+    query = {
+        "_id": job_id,
+        "$or": [
+            {f"{prefix}.status": {"$in": list(STARTABLE_STATUSES)}},
+            {f"{prefix}.status": {"$exists": False}},
+            {f"{prefix}.status": "processing", f"{prefix}.lease_expires_at": {"$lt": now}},
+        ],
+    }
+    set_fields = {
+        f"{prefix}.status": "processing",
+        f"{prefix}.lease_owner": owner,
+        f"{prefix}.lease_expires_at": now + timedelta(seconds=settings.JOB_LEASE_SEC),
+        f"{prefix}.started_at": now,
+        f"{prefix}.updated_at": now,
+        f"{prefix}.error": None,
+        "status": "processing",
+        "updated_at": now,
+    }
+    set_fields.update({f"{prefix}.{name}": value for name, value in fields.items()})
+    # 작업 문서가 없으면(이전 버전에서 시작된 작업 등) 함께 만든다
+    on_insert = {"job_id": job_id, "created_at": now}
+    on_insert.update({f"stages.{other}.status": "pending" for other in STAGES if other != stage})
+    try:
+        return jobs.find_one_and_update(
+            query,
+            {"$set": set_fields, "$inc": {f"{prefix}.attempts": 1}, "$setOnInsert": on_insert},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # 문서는 있지만 조건(시작 가능한 상태)에 맞지 않음
+        return None
+
+
+def finish_stage(jobs, job_id: str, stage: str, owner: str, status: str = "completed",
+                 error: Optional[str] = None, **fields) -> bool:
+    """
+    임대를 가진 쪽만 단계를 completed / failed / failed_missing_input 으로 전이한다.
+    임대를 잃었으면(만료 후 다른 워커가 가져감) False.
+    """
+    now = _now()
+    prefix = f"stages.{stage}"
+    if status != "completed":
+        job_status = "failed"
+    elif stage == FINAL_STAGE:
+        job_status = "completed"
+    else:
+        job_status = "processing"
+    set_fields = {
+        f"{prefix}.status": status,
+        f"{prefix}.error": error,
+        f"{prefix}.lease_owner": None,
+        f"{prefix}.lease_expires_at": None,
+        f"{prefix}.finished_at": now,
+        f"{prefix}.updated_at": now,
+        "status": job_status,
+        "updated_at": now,
+    }
+    set_fields.update({f"{prefix}.{name}": value for name, value in fields.items()})
+    result = jobs.update_one(
+        {"_id": job_id, f"{prefix}.status": {"$in": list(LEASED_STATUSES)}, f"{prefix}.lease_owner": owner},
+        {"$set": set_fields},
+    )
+    if result.matched_count == 0:
+        logger.warning(f"Job {job_id}: {stage} 임대를 잃어 상태({status})를 기록하지 않음 (owner={owner})")
+        return False
+    return True
+
+
+def complete_stage(jobs, job_id: str, stage: str, owner: str, **fields) -> bool:
+    return finish_stage(jobs, job_id, stage, owner, "completed", **fields)
+
+
+def fail_stage(jobs, job_id: str, stage: str, owner: str, error: str, status: str = "failed") -> bool:
+    return finish_stage(jobs, job_id, stage, owner, status, error=error)
+
+
+def complete_from_cache(jobs, job_id: str, source_job_id: str) -> bool:
+    """
+    같은 녹음의 결과를 재사용한 작업을 모든 단계 completed 로 기록한다 (cached_from 에 원본 작업).
+    아직 시작되지 않은(pending) 작업만 전이하며, 이미 처리 중인 작업이면 False.
+    """
+    now = _now()
+    set_fields = {"status": "completed", "cached_from": source_job_id, "updated_at": now}
+    for stage in STAGES:
+        set_fields.update({
+            f"stages.{stage}.status": "completed",
+            f"stages.{stage}.cached_from": source_job_id,
+            f"stages.{stage}.finished_at": now,
+            f"stages.{stage}.updated_at": now,
+        })
+    result = jobs.update_one(
+        {"_id": job_id, "stages.conversion.status": "pending"},
+        {"$set": set_fields},
+    )
+    return result.matched_count == 1
+
+
+def claim_queued(jobs, job_id: str, stage: str, owner: str, from_statuses=("failed",)) -> bool:
+    """
+    태스크를 큐에 넣기 전에 단계를 queued 로 전이하고 등록 임대를 잡는다.
+    from_statuses 상태이거나, queued/processing 이지만 임대가 만료된 경우에만 성공한다.
+    False 면 다른 스캐너/워커가 이미 등록했거나 처리 중이므로 큐에 넣지 않는다.
+    """
+    now = _now()
+    prefix = f"stages.{stage}"
+    result = jobs.update_one(
+        {
+            "_id": job_id,
+            "$or": [
+                {f"{prefix}.status": {"$in": list(from_statuses)}},
+                {f"{prefix}.status": {"$in": list(LEASED_STATUSES)}, f"{prefix}.lease_expires_at": {"$lt": now}},
+            ],
+        },
+        {"$set": {
+            f"{prefix}.status": "queued",
+            f"{prefix}.lease_owner": owner,
+            f"{prefix}.lease_expires_at": now + timedelta(seconds=settings.JOB_QUEUE_LEASE_SEC),
+            f"{prefix}.queued_at": now,
+            f"{prefix}.updated_at": now,
+            "updated_at": now,
+        }},
+    )
+    return result.matched_count == 1
+
+
+def find_expired(jobs, stage: str, projection: Optional[dict] = None):
+    """임대가 만료된 queued/processing 단계 (워커 종료, 메시지 유실)."""
+    prefix = f"stages.{stage}"
+    return jobs.find(
+        {f"{prefix}.status": {"$in": list(LEASED_STATUSES)}, f"{prefix}.lease_expires_at": {"$lt": _now()}},
+        projection,
+    )
+
+
+def renew_lease(jobs, job_id: str, stage: str, owner: str) -> bool:
+    """처리 중인 단계의 임대를 JOB_LEASE_SEC 만큼 연장한다. 임대를 잃었으면 False."""
+    now = _now()
+    prefix = f"stages.{stage}"
+    result = jobs.update_one(
+        {"_id": job_id, f"{prefix}.status": "processing", f"{prefix}.lease_owner": owner},
+        {"$set": {f"{prefix}.lease_expires_at": now + timedelta(seconds=settings.JOB_LEASE_SEC),
+                  f"{prefix}.heartbeat_at": now}},
+    )
+    return result.matched_count == 1
+
+
+class LeaseHeartbeat:
+    """
+    단계 처리 중 임대를 interval 초마다 연장하는 백그라운드 스레드.
+    임대를 잃으면 lost 가 True 가 되고 연장을 멈춘다 (이후 finish_stage 도 기록되지 않음).
+    """
+
+    def __init__(self, jobs, job_id: str, stage: str, owner: str, interval: Optional[float] = None):
+        self.jobs = jobs
+        self.job_id = job_id
+        self.stage = stage
+        self.owner = owner
+        self.interval = interval if interval is not None else settings.JOB_LEASE_RENEW_SEC
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{stage}-{job_id}", daemon=True)
+
+    def start(self) -> "LeaseHeartbeat":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "LeaseHeartbeat":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                if not renew_lease(self.jobs, self.job_id, self.stage, self.owner):
+                    self.lost = True
+                    logger.error(f"Job {self.job_id}: {self.stage} 임대를 잃었습니다 (owner={self.owner})")
+                    return
+            except PyMongoError as e:
+                # 일시적 오류는 다음 주기에 다시 시도 (임대가 남아 있는 동안은 안전)
+                logger.warning(f"Job {self.job_id}: {self.stage} 임대 연장 실패, 재시도 예정: {e}")
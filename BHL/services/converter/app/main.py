@@ -1,14 +1,18 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Query
 from pymongo import MongoClient
 from datetime import datetime, timezone
+import hashlib
 import os
 import uuid
 import logging
+from typing import Optional
 from .models import AudioConversion
 from .tasks import celery, convert_audio_task
+from .pipeline import build_processing_chain
 from .config import settings
-from .utils import parse_string_to_datetime
-from .config import settings
+from .utils import parse_string_to_datetime, save_upload_file
+from .job_state import complete_from_cache, create_job, ensure_job_indexes, jobs_collection
+from .audio_cache import cache_collection, find_cached
 
 UTC = timezone.utc
 # 로깅 설정
@@ -31,6 +35,9 @@ try:
     db = client[settings.MONGODB_DB]
     work_client = MongoClient(settings.MONGODB_URI)
     work_db = work_client[settings.WORK_MONGODB_DB]
+    jobs = jobs_collection(work_client)
+    ensure_job_indexes(jobs)
+    audio_cache = cache_collection(work_client)
     logger.info("MongoDB 연결 성공")
 except Exception as e:
     logger.error(f"MongoDB 연결 실패: {str(e)}")
@@ -72,7 +79,7 @@ async def get_conversion_status(job_id: str):
         return {
             "job_id": job_id,
             "status": "completed",  # 파일이 존재하면 완료된 것으로 간주
-            "output_file": log["output_file"]
+            "output_file": log.get("output_file")
         }
         
     except Exception as e:
@@ -80,7 +87,16 @@ async def get_conversion_status(job_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/convert")
-async def convert_audio_endpoint(file: UploadFile = File(...), job_id: str = None, user_name: str = None):
+async def convert_audio_endpoint(file: UploadFile = File(...), job_id: str = None,
+                                 user_name: Optional[str] = Form(None),
+                                 user_name_query: Optional[str] = Query(None, alias="user_name")):
+    # api_gateway 는 multipart 본문을 그대로 스트리밍하므로 user_name 은 폼 필드로 들어옴 (쿼리 파라미터도 호환)
+    user_name = user_name or user_name_query
+    if not user_name:
+        # 게이트웨이가 본문을 검증하지 않으므로 필수 필드 누락은 여기서 422 로 거절 (작업 생성 전)
+        raise HTTPException(status_code=422, detail=[{
+            "type": "missing", "loc": ["body", "user_name"], "msg": "Field required", "input": None,
+        }])
     try:
         # job_id가 없으면 새로 생성
         if not job_id:
@@ -90,13 +106,14 @@ async def convert_audio_endpoint(file: UploadFile = File(...), job_id: str = Non
         
         logger.info(f"새 변환 작업 시작: {job_id}, {file.filename}")
         
-        # 파일 저장
+        # 파일 저장 (청크 단위로 스트리밍하여 업로드 전체를 메모리에 올리지 않음)
+        # 저장하면서 내용 해시(SHA-256)를 함께 계산해 중복 업로드를 찾는다
         input_path = os.path.join(UPLOAD_DIR, f"{job_id}_{file.filename}")
-        with open(input_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        digest = hashlib.sha256()
+        written = await save_upload_file(file, input_path, settings.UPLOAD_CHUNK_SIZE, digest)
+        audio_sha256 = digest.hexdigest()
         
-        logger.info(f"파일 저장됨: {input_path}")
+        logger.info(f"파일 저장됨: {input_path} ({written} bytes, sha256={audio_sha256})")
         logger.info(f"파일 경로: {file.filename}")
         
 
@@ -149,12 +166,43 @@ async def convert_audio_endpoint(file: UploadFile = File(...), job_id: str = Non
                     "customer_name": customer_name,
                     "customer_contact": customer_contact,
                     "recording_date": parse_string_to_datetime(recording_date),
-                    "created_by": user_name
+                    "created_by": user_name,
+                    "audio_sha256": audio_sha256
                 }
             },
             upsert=True
         )
         
+        # 작업 상태 문서 생성 (단계별 상태는 각 워커가 CAS 로 전이)
+        create_job(jobs, job_id, created_by=user_name, audio_sha256=audio_sha256)
+
+        # 같은 녹음을 이미 처리했으면 변환/전사/요약 없이 캐시된 결과를 연결하고 바로 완료
+        cached = find_cached(audio_cache, audio_sha256) if settings.AUDIO_CACHE_ENABLED else None
+        if cached and cached.get("source_job_id") != job_id:
+            source_job_id = cached["source_job_id"]
+            now = datetime.now(UTC)
+            work_db.calls.update_one(
+                {"job_id": job_id},
+                {"$set": {**cached["result"], "cached_from": source_job_id, "updated_at": now}}
+            )
+            if complete_from_cache(jobs, job_id, source_job_id):
+                db.logs.insert_one({
+                    "job_id": job_id,
+                    "service": "converter",
+                    "event": "cache_hit",
+                    "status": "completed",
+                    "timestamp": now,
+                    "message": f"동일 녹음 결과 재사용: {source_job_id} (sha256={audio_sha256})",
+                    "metadata": {
+                        "created_at": now,
+                        "updated_at": now,
+                        "created_by": user_name
+                    }
+                })
+                os.remove(input_path)
+                logger.info(f"중복 업로드, 캐시 결과 사용: {job_id} <- {source_job_id}")
+                return {"job_id": job_id, "status": "completed", "cached_from": source_job_id}
+
         # 로그 기록
         db.logs.insert_one({
             "job_id": job_id,
@@ -172,20 +220,24 @@ async def convert_audio_endpoint(file: UploadFile = File(...), job_id: str = Non
         
         # Celery 작업 시작
         try:
-            task = convert_audio_task.apply_async(
-                args=[],
-                kwargs={
-                    'job_id': job_id,
-                    'input_path': input_path,
-                    'output_dir': OUTPUT_DIR,
-                    'db_connection_string': MONGODB_URI,
-                    'work_db_connection_string': settings.MONGODB_URI,
-                    'work_db_name': settings.WORK_MONGODB_DB,
-                    'user_name': user_name
-                },
-                queue='converter'
-            )
-            logger.info(f"Celery 작업 시작됨: task_id={task.id}")
+            if settings.ORCHESTRATION_MODE == "chain":
+                # 변환 -> 전사 -> 요약을 한 번에 등록 (단계 사이에 게이트웨이를 거치지 않음)
+                task = build_processing_chain(celery, job_id, input_path, user_name).apply_async()
+            else:
+                task = convert_audio_task.apply_async(
+                    args=[],
+                    kwargs={
+                        'job_id': job_id,
+                        'input_path': input_path,
+                        'output_dir': OUTPUT_DIR,
+                        'db_connection_string': MONGODB_URI,
+                        'work_db_connection_string': settings.MONGODB_URI,
+                        'work_db_name': settings.WORK_MONGODB_DB,
+                        'user_name': user_name
+                    },
+                    queue='converter'
+                )
+            logger.info(f"Celery 작업 시작됨: task_id={task.id}, mode={settings.ORCHESTRATION_MODE}")
             
         except Exception as e:
             logger.error(f"Celery 작업 시작 실패: {str(e)}")
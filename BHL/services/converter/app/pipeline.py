@@ -0,0 +1,46 @@
+from celery import chain
+
+from .config import settings
+
+
+def build_processing_chain(celery_app, job_id: str, input_path: str, user_name: str = None):
+    """
+    변환 -> 전사 단계를 하나의 Celery chain 으로 묶는다.
+    각 단계는 이름과 큐로만 참조하므로 다른 서비스의 코드를 import 하지 않으며,
+    앞 단계가 성공하면 브로커에서 바로 다음 단계가 시작된다 (게이트웨이/HTTP 왕복 없음).
+    단계 사이의 데이터는 공유 볼륨의 파일과 작업 DB 로 전달되므로 서명은 immutable 로 만든다.
+    요약 단계는 transcribe_audio 가 전사 결과 참조(transcript_ref)를 담아 직접 큐에 넣는다.
+    """
+    converted_path = f"{settings.OUTPUT_DIR}/{job_id}.wav"
+    db_kwargs = {
+        'db_connection_string': settings.MONGODB_URI,
+        'work_db_connection_string': settings.MONGODB_URI,
+        'work_db_name': settings.WORK_MONGODB_DB,
+    }
+    return chain(
+        celery_app.signature(
+            'convert_audio',
+            kwargs={
+                'job_id': job_id,
+                'input_path': input_path,
+                'output_dir': settings.OUTPUT_DIR,
+                'user_name': user_name,
+                'chained': True,
+                **db_kwargs,
+            },
+            queue='converter',
+            immutable=True,
+        ),
+        celery_app.signature(
+            'transcribe_audio',
+            kwargs={
+                'job_id': job_id,
+                'input_path': converted_path,
+                'output_dir': settings.TRANSCRIPTION_OUTPUT_DIR,
+                'chained': True,
+                **db_kwargs,
+            },
+            queue='transcription',
+            immutable=True,
+        ),
+    )
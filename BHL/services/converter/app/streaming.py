@@ -0,0 +1,104 @@
+import logging
+import subprocess
+import tempfile
+import time
+import wave
+from typing import Callable, Optional
+
+from .energy import EnergyProfile
+
+logger = logging.getLogger(__name__)
+
+# on_progress(processed_seconds, duration_seconds)
+ProgressCallback = Callable[[float, Optional[float]], None]
+
+# 16bit PCM
+SAMPLE_WIDTH = 2
+
+
+class StreamingConversionError(RuntimeError):
+    """ffmpeg 변환 프로세스가 실패했을 때 발생."""
+
+
+def probe_duration(input_path: str) -> Optional[float]:
+    """ffprobe 로 컨테이너 헤더의 재생 시간(초)을 읽는다. 디코딩하지 않으므로 빠르다."""
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", input_path],
+            capture_output=True, text=True, timeout=30, check=True,
+        )
+        return float(result.stdout.strip())
+    except (subprocess.SubprocessError, ValueError, OSError) as e:
+        logger.warning(f"재생 시간 확인 실패 ({input_path}): {e}")
+        return None
+
+
+def stream_convert(input_path: str, output_path: str,
+                   frame_rate: int = 16000, channels: int = 1,
+                   on_progress: Optional[ProgressCallback] = None,
+                   progress_interval: float = 5.0,
+                   energy_profile: Optional[EnergyProfile] = None,
+                   block_seconds: float = 2.0) -> dict:
+    """
+    ffmpeg 프로세스 하나로 다운믹스/리샘플링한 16kHz s16le PCM 을 파이프로 받아 WAV 로 기록한다.
+    PCM 은 block_seconds 단위로만 메모리에 올라오므로 통화 길이와 관계없이 메모리 사용량이 일정하다.
+    각 블록은 energy_profile 에도 전달되어 묵음 분석용 에너지 프로파일을 같은 패스에서 계산한다.
+    진행 상황은 progress_interval 초마다 on_progress 로 알린다.
+    """
+    duration = probe_duration(input_path)
+    cmd = [
+        "ffmpeg", "-hide_banner", "-nostdin", "-loglevel", "error",
+        "-i", input_path,
+        "-vn", "-ac", str(channels), "-ar", str(frame_rate),
+        "-f", "s16le", "-c:a", "pcm_s16le",
+        "pipe:1",
+    ]
+    frame_width = SAMPLE_WIDTH * channels
+    block_bytes = max(int(frame_rate * block_seconds), 1) * frame_width
+
+    written_bytes = 0
+    last_report = time.monotonic()
+    with tempfile.TemporaryFile(mode="w+b") as stderr_file:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file)
+        try:
+            with wave.open(output_path, "wb") as wav:
+                wav.setnchannels(channels)
+                wav.setsampwidth(SAMPLE_WIDTH)
+                wav.setframerate(frame_rate)
+                while True:
+                    block = proc.stdout.read(block_bytes)
+                    if not block:
+                        break
+                    wav.writeframesraw(block)
+                    if energy_profile is not None:
+                        energy_profile.update(block)
+                    written_bytes += len(block)
+
+                    now = time.monotonic()
+                    if on_progress is not None and now - last_report >= progress_interval:
+                        last_report = now
+                        _report(on_progress, written_bytes / (frame_rate * frame_width), duration)
+            returncode = proc.wait()
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            raise
+
+        if returncode != 0:
+            stderr_file.seek(0)
+            error_output = stderr_file.read()[-1000:].decode("utf-8", errors="replace")
+            raise StreamingConversionError(f"ffmpeg 변환 실패 (exit={returncode}): {error_output}")
+
+    processed = written_bytes / (frame_rate * frame_width)
+    if on_progress is not None:
+        _report(on_progress, processed, duration)
+    return {"duration_seconds": processed, "source_duration_seconds": duration,
+            "processed_seconds": processed}
+
+
+def _report(on_progress: ProgressCallback, processed: float, duration: Optional[float]) -> None:
+    try:
+        on_progress(processed, duration)
+    except Exception as e:
+        logger.warning(f"진행 상황 기록 실패: {e}")
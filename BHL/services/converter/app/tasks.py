@@ -1,11 +1,18 @@
 from celery import Celery
+from celery.exceptions import Ignore
+from celery.signals import task_postrun, worker_process_init, worker_process_shutdown
 from datetime import datetime, timezone
-from pymongo import MongoClient
 from pydub import AudioSegment
 import os
 import logging
+import httpx
 from httpx import AsyncClient
 from .config import settings
+from .db import close_clients, get_client, init_clients
+from .event_log import event_log
+from .job_state import LeaseHeartbeat, claim_queued, complete_stage, fail_stage, start_stage, worker_id
+from .streaming import stream_convert
+from .energy import EnergyProfile, energy_profile_path
 import asyncio
 
 UTC = timezone.utc
@@ -36,24 +43,63 @@ celery.conf.update(
     task_default_routing_key='converter'
 )
 
+def notify_stage_status(job_id: str, stage: str, status: str, error: str = None):
+    """chain 모드에서 게이트웨이에 단계 상태 이벤트만 전달한다. 실패해도 작업은 계속 진행한다."""
+    try:
+        response = httpx.post(
+            f"{settings.API_GATEWAY_URL}/webhook/status/{job_id}",
+            json={"stage": stage, "status": status, "error": error},
+            timeout=10.0
+        )
+        response.raise_for_status()
+    except Exception as e:
+        logger.warning(f"상태 이벤트 전송 실패 ({job_id}, {stage}={status}): {e}")
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    # 워커 프로세스마다 MongoDB 클라이언트를 한 번 만들어 태스크 간에 재사용
+    init_clients(settings.MONGODB_URI)
+    # 이전 프로세스가 MongoDB 장애로 남긴 이벤트 로그 스풀을 기록 (백그라운드 스레드)
+    event_log.start()
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    event_log.flush()
+    close_clients()
+
+@task_postrun.connect
+def flush_event_log(**kwargs):
+    # 태스크가 끝나면(성공/실패 모두) 버퍼에 남은 로그 이벤트를 동기 기록
+    event_log.flush()
+
 @celery.task(name='convert_audio')
-def convert_audio(job_id: str, input_path: str, output_dir: str, db_connection_string: str, work_db_connection_string: str, work_db_name: str, user_name: str = None):
+def convert_audio(job_id: str, input_path: str, output_dir: str, db_connection_string: str, work_db_connection_string: str, work_db_name: str, user_name: str = None, chained: bool = False):
+    # 작업 상태 문서에서 변환 단계를 선점 (중복 전달/재시도 시 다른 워커가 처리 중이거나 이미 끝났으면 건너뜀)
+    owner = worker_id(celery.current_task.request.id if celery.current_task else None)
+    jobs = get_client(work_db_connection_string)[work_db_name].jobs
+    if start_stage(jobs, job_id, "conversion", owner, input_path=input_path) is None:
+        logger.info(f"Job {job_id}: 변환 단계가 이미 처리 중이거나 완료되어 건너뜀")
+        # chain 의 다음 단계도 실행하지 않음
+        raise Ignore()
+    heartbeat = LeaseHeartbeat(jobs, job_id, "conversion", owner).start()
+
     try:
         logger.info(f"작업 수신됨: task_id={celery.current_task.request.id}, job_id={job_id}, user_name={user_name}", extra={"input_path": input_path})
         
-        # MongoDB 연결 (로그용)
-        client = MongoClient(db_connection_string)
+        # MongoDB 연결 (로그용, 워커 프로세스 공유 클라이언트)
+        client = get_client(db_connection_string)
         db = client.converter_db
         
         # 작업 데이터베이스 연결
-        work_client = MongoClient(work_db_connection_string)
+        work_client = get_client(work_db_connection_string)
         work_db = work_client[work_db_name]
         
         # 파일 존재 확인
         if not os.path.exists(input_path):
             error_msg = f"오디오 파일을 찾을 수 없습니다: {input_path}"
             now = datetime.now(UTC)
-            db.logs.update_one(
+            event_log.update_one(
+                db.logs,
                 {"job_id": job_id},
                 {
                     "$set": {
@@ -75,16 +121,56 @@ def convert_audio(job_id: str, input_path: str, output_dir: str, db_connection_s
         logger.info(f"변환 시작: {input_path} -> {output_path}")
         
         # 오디오 변환 처리
-        audio = AudioSegment.from_file(input_path)
-        audio = audio.set_channels(1)  # 모노로 변환
-        audio = audio.set_frame_rate(16000)  # 16kHz로 변환
-        
-        # WAV로 저장
-        audio.export(
-            output_path,
-            format="wav",
-            parameters=["-acodec", "pcm_s16le"]
-        )
+        # 변환 중 PCM 을 가진 김에 묵음 분석용 에너지 프로파일도 함께 계산 (transcription 재디코딩 방지)
+        conversion_info = {}
+        energy_profile = EnergyProfile(frame_rate=16000)
+        if settings.STREAMING_CONVERSION:
+            # ===== [수정됨] 전체 디코딩 대신 ffmpeg 파이프로 모노/16kHz 변환을 스트리밍 =====
+            def report_progress(processed_seconds, duration_seconds):
+                now = datetime.now(UTC)
+                progress = None
+                if duration_seconds:
+                    progress = round(min(processed_seconds / duration_seconds, 1.0) * 100, 1)
+                event_log.update_one(
+                    db.logs,
+                    {"job_id": job_id},
+                    {
+                        "$set": {
+                            "progress": progress,
+                            "processed_seconds": round(processed_seconds, 2),
+                            "duration_seconds": duration_seconds,
+                            "timestamp": now,
+                            "metadata.updated_at": now
+                        }
+                    })
+
+            conversion_info = stream_convert(
+                input_path,
+                output_path,
+                frame_rate=16000,
+                channels=1,
+                on_progress=report_progress,
+                progress_interval=settings.CONVERSION_PROGRESS_INTERVAL_SEC,
+                energy_profile=energy_profile
+            )
+        else:
+            audio = AudioSegment.from_file(input_path)
+            audio = audio.set_channels(1)  # 모노로 변환
+            audio = audio.set_frame_rate(16000)  # 16kHz로 변환
+
+            # WAV로 저장
+            audio.export(
+                output_path,
+                format="wav",
+                parameters=["-acodec", "pcm_s16le"]
+            )
+            audio = audio.set_sample_width(2)
+            energy_profile.update(audio.raw_data)
+            conversion_info = {"duration_seconds": len(audio) / 1000.0}
+            del audio
+
+        profile_path = energy_profile.save(energy_profile_path(output_path))
+        logger.info(f"에너지 프로파일 저장: {profile_path}")
         
         logger.info(f"변환 완료: {output_path}")
         
@@ -94,12 +180,15 @@ def convert_audio(job_id: str, input_path: str, output_dir: str, db_connection_s
         
         # 작업 완료 로그
         now = datetime.now(UTC)
-        db.logs.update_one(
+        event_log.update_one(
+            db.logs,
             {"job_id": job_id},
             {
                 "$set": {
                     "status": "completed",
                     "output_file": output_path,
+                    "duration_seconds": conversion_info.get("duration_seconds"),
+                    "energy_profile": profile_path,
                     "timestamp": now,
                     "message": f"Audio conversion completed: {output_path}",
                     "metadata": {
@@ -109,19 +198,23 @@ def convert_audio(job_id: str, input_path: str, output_dir: str, db_connection_s
                 }
             })
         
-        # API Gateway에 웹훅 전송
-        async def send_webhook():
-            async with AsyncClient() as client:
-                await client.post(
-                    f"{settings.API_GATEWAY_URL}/webhook/conversion/{job_id}",
-                    json={"status": "completed", "user_name": user_name}
-                )
-        
-        asyncio.run(send_webhook())
-        
-        # 연결 종료
-        client.close()
-        work_client.close()
+        complete_stage(jobs, job_id, "conversion", owner, output_file=output_path)
+
+        if chained:
+            # chain 이 전사 태스크를 바로 등록하므로 queued 로 표시해 재시도 스캐너가 중복 등록하지 않게 함
+            claim_queued(jobs, job_id, "transcription", owner, from_statuses=("pending",))
+            # chain 모드: 다음 단계(transcribe_audio)는 브로커에서 바로 시작되므로 상태만 알림
+            notify_stage_status(job_id, "conversion", "completed")
+        else:
+            # API Gateway에 웹훅 전송
+            async def send_webhook():
+                async with AsyncClient() as client:
+                    await client.post(
+                        f"{settings.API_GATEWAY_URL}/webhook/conversion/{job_id}",
+                        json={"status": "completed", "user_name": user_name}
+                    )
+            
+            asyncio.run(send_webhook())
         
         return {"status": "completed", "output_file": output_path}
         
@@ -130,7 +223,8 @@ def convert_audio(job_id: str, input_path: str, output_dir: str, db_connection_s
         try:
             # 오류 로그 기록
             now = datetime.now(UTC)
-            db.logs.update_one(
+            event_log.update_one(
+                db.logs,
                 {"job_id": job_id},
                 {
                     "$set": {
@@ -144,17 +238,21 @@ def convert_audio(job_id: str, input_path: str, output_dir: str, db_connection_s
                         }
                     }
                 })
+            fail_stage(jobs, job_id, "conversion", owner, str(e),
+                       status="failed_missing_input" if isinstance(e, FileNotFoundError) else "failed")
         except Exception as inner_e:
             logger.error(f"오류 상태 업데이트 실패: {str(inner_e)}")
         finally:
-            client.close()
-            work_client.close()
+            if chained:
+                notify_stage_status(job_id, "conversion", "failed", str(e))
             if os.path.exists(input_path):
                 try:
                     os.remove(input_path)
                 except:
                     pass
         raise
+    finally:
+        heartbeat.stop()
 
 # task 함수를 변수에 할당하여 export
 convert_audio_task = celery.task(name='convert_audio', bind=True)(convert_audio)
\ No newline at end of file
@@ -1,5 +1,8 @@
 from datetime import datetime, timezone
 
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
 UTC = timezone.utc
 
 def parse_string_to_datetime(date_str: str) -> datetime:
@@ -19,4 +22,39 @@ def parse_string_to_datetime(date_str: str) -> datetime:
     hour = int(date_str[8:10])
     minute = int(date_str[10:12])
     second = int(date_str[12:14])
-    return datetime(year, month, day, hour, minute, second, tzinfo=UTC)
\ No newline at end of file
+    return datetime(year, month, day, hour, minute, second, tzinfo=UTC)
+
+
+async def save_upload_file(file: UploadFile, path: str, chunk_size: int, digest=None) -> int:
+    """
+    업로드 파일을 chunk_size 바이트씩 읽어 path 에 기록하고 기록한 바이트 수를 반환합니다.
+    파일 전체를 메모리에 올리지 않고, 디스크 쓰기와 해시 계산은 스레드풀에서 수행해 이벤트 루프를 막지 않습니다.
+    
+    Args:
+        file (UploadFile): 업로드된 파일
+        path (str): 저장할 경로
+        chunk_size (int): 한 번에 읽고 쓸 바이트 수
+        digest: 청크를 함께 넣을 hashlib 객체 (예: hashlib.sha256()). 파일을 다시 읽지 않고 내용 해시를 계산합니다.
+        
+    Returns:
+        int: 기록한 바이트 수
+    """
+    written = 0
+    out = await run_in_threadpool(open, path, "wb")
+
+    def write(chunk: bytes) -> None:
+        # 해시 계산도 쓰기와 같은 스레드풀 호출에서 수행 (큰 업로드의 SHA-256 이 이벤트 루프를 막지 않도록)
+        out.write(chunk)
+        if digest is not None:
+            digest.update(chunk)
+
+    try:
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+            await run_in_threadpool(write, chunk)
+            written += len(chunk)
+    finally:
+        await run_in_threadpool(out.close)
+    return written
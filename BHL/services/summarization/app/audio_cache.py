@@ -0,0 +1,53 @@
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from pymongo.errors import PyMongoError
+
+from .config import settings
+
+UTC = timezone.utc
+logger = logging.getLogger(__name__)
+
+# 오디오 내용 해시 캐시 (work_db.audio_cache) - 업로드 원본의 SHA-256 마다 문서 하나
+# {
+#   _id: sha256, source_job_id, created_at, last_hit_at, hits,
+#   result: { text, (요약 단계가 work_db.calls 에 저장한 추출 필드...) }
+# }
+# 요약 단계가 끝난 작업만 기록하므로 캐시에 있으면 전사/요약 결과가 모두 있다.
+# 같은 녹음이 다시 업로드되면 (휴대폰 재동기화, SQS 이벤트 재처리) converter 가 결과를 새 calls 문서에 복사하고 바로 완료한다.
+
+# work_db.calls 에서 캐시하지 않는 필드 (작업/업로드마다 다른 값)
+UNCACHED_FIELDS = ("_id", "job_id", "file_name", "customer_name", "customer_contact", "recording_date",
+                   "created_by", "audio_sha256", "cached_from", "updated_at")
+
+
+def cache_collection(client):
+    return client[settings.WORK_MONGODB_DB].audio_cache
+
+
+def find_cached(cache, sha256: str) -> Optional[dict]:
+    """해시에 해당하는 캐시 문서를 찾고 적중 횟수를 올린다. 없거나 조회에 실패하면 None."""
+    try:
+        return cache.find_one_and_update(
+            {"_id": sha256},
+            {"$inc": {"hits": 1}, "$set": {"last_hit_at": datetime.now(UTC)}},
+        )
+    except PyMongoError as e:
+        # 캐시는 최적화일 뿐이므로 조회 실패 시 일반 처리로 진행
+        logger.warning(f"오디오 캐시 조회 실패 ({sha256}): {e}")
+        return None
+
+
+def store_result(cache, sha256: str, job_id: str, call_doc: dict) -> None:
+    """요약까지 끝난 작업의 calls 문서에서 결과 필드를 캐시에 기록한다 (먼저 기록된 결과를 유지)."""
+    result = {name: value for name, value in call_doc.items() if name not in UNCACHED_FIELDS}
+    try:
+        cache.update_one(
+            {"_id": sha256},
+            {"$setOnInsert": {"source_job_id": job_id, "result": result, "hits": 0,
+                              "created_at": datetime.now(UTC)}},
+            upsert=True,
+        )
+    except PyMongoError as e:
+        logger.warning(f"오디오 캐시 기록 실패 ({sha256}, job_id={job_id}): {e}")
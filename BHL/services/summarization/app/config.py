@@ -7,6 +7,23 @@ class Settings(BaseSettings):
     MONGODB_URI: str = os.getenv("MONGODB_URI")
     MONGODB_DB: str = "summarization_db"
     WORK_MONGODB_DB: str = "mars_work_db"
+    MONGO_MAX_POOL_SIZE: int = 10                   # 워커 프로세스당 MongoDB 커넥션 풀 크기
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGO_HEALTHCHECK_INTERVAL_SEC: float = 30.0    # 공유 클라이언트 ping 확인 간격
+
+    # 이벤트 로그(db.logs) 버퍼링: 개수/시간 임계값에 도달하면 bulk_write, 실패 시 스풀 디렉토리에 JSONL 로 보관
+    EVENT_LOG_MAX_BATCH: int = 100
+    EVENT_LOG_FLUSH_INTERVAL_SEC: float = 1.0
+    EVENT_LOG_SPOOL_DIR: str = "/app/spool/event_log"
+
+    # 작업 상태 컬렉션(work_db.jobs) 임대: 만료되면 스캐너가 단계를 다시 큐에 넣는다
+    JOB_LEASE_SEC: int = 300               # 처리 중 임대 (하트비트로 연장)
+    JOB_LEASE_RENEW_SEC: float = 60.0      # 하트비트 연장 주기 (JOB_LEASE_SEC 보다 충분히 짧게)
+    JOB_QUEUE_LEASE_SEC: int = 3600        # 큐 등록 후 워커가 시작할 때까지의 임대
+
+    RETRY_SCAN_BATCH_SIZE: int = 1000               # 재시도 스캐너의 job_id $in 조회 묶음 크기
+
+    AUDIO_CACHE_ENABLED: bool = True                # 요약이 끝난 결과를 업로드 내용 해시(work_db.audio_cache)로 기록
     
     # 디렉토리 설정
     UPLOAD_DIR: str = "/app/text_outputs"
@@ -0,0 +1,113 @@
+import logging
+import threading
+import time
+from typing import Dict
+
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# 워커 프로세스 단위 MongoClient 풀 (URI -> 클라이언트).
+# 태스크마다 MongoClient 를 만들고 닫으면 매번 연결/인증/토폴로지 탐색 비용이 들므로
+# 프로세스당 한 번 만들어 재사용한다. 로그 DB 와 작업 DB 는 같은 URI 이므로 클라이언트 하나를 공유한다.
+# MongoClient 는 fork 후 재사용하면 안 되므로 prefork 워커에서는 worker_process_init 에서 만든다.
+_clients: Dict[str, MongoClient] = {}
+_last_checked: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def _create(uri: str) -> MongoClient:
+    return MongoClient(
+        uri,
+        maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+        serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    )
+
+
+def _is_healthy(client: MongoClient) -> bool:
+    try:
+        client.admin.command("ping")
+        return True
+    except PyMongoError as e:
+        logger.warning(f"MongoDB 연결 상태 확인 실패: {e}")
+        return False
+
+
+def get_client(uri: str) -> MongoClient:
+    """
+    URI 에 해당하는 공유 MongoClient 를 반환한다.
+    MONGO_HEALTHCHECK_INTERVAL_SEC 마다 ping 으로 상태를 확인하고, 실패하면 클라이언트를 새로 만든다.
+    ping 은 락 밖에서 한 스레드만 보내므로 다른 스레드(청크 스레드 등)는 느린 ping 을 기다리지 않는다.
+    반환된 클라이언트는 닫지 않는다 (close_clients 에서 일괄 종료).
+    """
+    with _lock:
+        client = _clients.get(uri)
+        now = time.monotonic()
+        if client is None:
+            client = _clients[uri] = _create(uri)
+            _last_checked[uri] = now
+            return client
+        if now - _last_checked.get(uri, 0.0) < settings.MONGO_HEALTHCHECK_INTERVAL_SEC:
+            return client
+        # 상태 확인 차례를 이 스레드가 가져간다 (확인이 끝날 때까지 다른 스레드는 기존 클라이언트를 그대로 사용)
+        _last_checked[uri] = now
+
+    if _is_healthy(client):
+        return client
+    with _lock:
+        if _clients.get(uri) is client:
+            logger.warning("MongoDB 클라이언트를 다시 생성합니다")
+            client.close()
+            _clients[uri] = _create(uri)
+            _last_checked[uri] = time.monotonic()
+        return _clients[uri]
+
+
+def init_clients(uri: str) -> None:
+    """
+    워커 프로세스 시작 시 호출 - 클라이언트를 만들고 연결은 백그라운드 스레드의 ping 으로 미리 맺어 첫 태스크의 지연을 없앤다.
+    worker_process_init 는 Celery 의 제한 시간(약 4초) 안에 끝나야 하므로 MongoDB 가 느리거나 내려가 있어도 기다리지 않는다.
+    """
+    client = get_client(uri)
+
+    def warm_up():
+        if _is_healthy(client):
+            logger.info("MongoDB 클라이언트 풀 초기화 완료")
+
+    threading.Thread(target=warm_up, name="mongo-warm-up", daemon=True).start()
+
+
+def close_clients() -> None:
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+        _last_checked.clear()
+
+
+# logs 컬렉션 조회용 인덱스
+#  - job_id 로 시작: 작업별 상태 확인, $lookup, job_id $in 일괄 조회
+#  - service/status 로 시작: 재시도 스캐너의 상태별 스캔 (timestamp 내림차순 정렬까지 인덱스로 처리)
+LOG_INDEXES = [
+    ([("job_id", 1), ("service", 1), ("status", 1), ("timestamp", -1)], "job_service_status_ts"),
+    ([("service", 1), ("status", 1), ("timestamp", -1)], "service_status_ts"),
+]
+
+
+def ensure_log_indexes(collection) -> None:
+    """logs 컬렉션에 조회용 복합 인덱스를 만든다 (이미 있으면 아무것도 하지 않음)."""
+    for keys, name in LOG_INDEXES:
+        try:
+            collection.create_index(keys, name=name, background=True)
+        except PyMongoError as e:
+            logger.warning(f"{collection.full_name} 인덱스({name}) 생성 실패: {e}")
+
+
+def chunked(items, size: int):
+    """$in 조회를 size 개씩 나눠 보내기 위한 분할."""
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
@@ -59,10 +59,13 @@ async def summarize(job_id: str, request: Request):
             if not isinstance(request_body, dict):
                 raise TypeError("요청 본문이 JSON 객체 형식이 아닙니다.")
             text_to_summarize = request_body.get("text") # 'text' 키 값 가져오기 (없으면 None)
-            if text_to_summarize is None:
-                raise ValueError("'text' 필드가 요청 본문에 누락되었습니다.")
-            if not isinstance(text_to_summarize, str):
+            transcript_ref = request_body.get("transcript_ref") # 전사 결과 참조 (work_db.calls 문서 _id)
+            if text_to_summarize is None and transcript_ref is None:
+                raise ValueError("'text' 또는 'transcript_ref' 필드가 요청 본문에 누락되었습니다.")
+            if text_to_summarize is not None and not isinstance(text_to_summarize, str):
                  raise TypeError("'text' 필드의 값이 문자열이 아닙니다.")
+            if transcript_ref is not None and not isinstance(transcript_ref, str):
+                 raise TypeError("'transcript_ref' 필드의 값이 문자열이 아닙니다.")
 
         except json.JSONDecodeError:
             logger.error(f"Summarize 요청 본문 JSON 파싱 오류 (Job ID: {job_id})")
@@ -76,7 +79,7 @@ async def summarize(job_id: str, request: Request):
         # ---------------------------------------
         
         # 로그 기록
-        logger.info(f"Summarize 요청 수신: job_id={job_id}, text_length={len(text_to_summarize)}")
+        logger.info(f"Summarize 요청 수신: job_id={job_id}, text_length={len(text_to_summarize) if text_to_summarize else None}, transcript_ref={transcript_ref}")
         db.logs.update_one(
             {"job_id": job_id, "service": "summarization"},
             {
@@ -96,14 +99,15 @@ async def summarize(job_id: str, request: Request):
             upsert=True
         )
         
-        # Celery 작업 시작 (다음 단계에서 text 전달하도록 수정 예정)
+        # Celery 작업 시작 (텍스트 또는 전사 결과 참조 전달)
         summarize_text_task.apply_async(
             kwargs={
                 'job_id': job_id,
                 'db_connection_string': settings.MONGODB_URI,
                 'work_db_connection_string': settings.MONGODB_URI,
-                'work_db_name': settings.WORK_MONGODB_DB
-                # 'text_to_summarize': text_to_summarize # <-- 다음 단계에서 추가
+                'work_db_name': settings.WORK_MONGODB_DB,
+                'text_to_summarize': text_to_summarize,
+                'transcript_ref': transcript_ref
             },
             queue='summarization'
         )
@@ -1,16 +1,24 @@
 from celery import Celery
-from celery.signals import worker_ready
+from celery.exceptions import Ignore
+from celery.signals import task_postrun, worker_process_init, worker_process_shutdown, worker_ready
 from datetime import datetime, timezone
-from pymongo import MongoClient
 from openai import OpenAI
 import os
 import logging
+import httpx
 from httpx import AsyncClient
 import asyncio
 import json
 from .config import settings
+from .db import chunked, close_clients, ensure_log_indexes, get_client, init_clients
+from .event_log import event_log
+from .audio_cache import cache_collection, store_result
+from .job_state import (LeaseHeartbeat, claim_queued, complete_stage, create_job, ensure_job_indexes, fail_stage,
+                        find_expired, jobs_collection, start_stage, worker_id)
 from .models import PropertyExtraction
 from pydantic import ValidationError
+from bson import ObjectId
+from bson.errors import InvalidId
 
 UTC = timezone.utc
 # 로깅 설정
@@ -49,21 +57,57 @@ celery.conf.update(
     timezone='UTC'
 )
 
+def notify_stage_status(job_id: str, stage: str, status: str, error: str = None):
+    """chain 모드에서 게이트웨이에 단계 상태 이벤트만 전달한다. 실패해도 작업은 계속 진행한다."""
+    try:
+        response = httpx.post(
+            f"{settings.API_GATEWAY_URL}/webhook/status/{job_id}",
+            json={"stage": stage, "status": status, "error": error},
+            timeout=10.0
+        )
+        response.raise_for_status()
+    except Exception as e:
+        logger.warning(f"상태 이벤트 전송 실패 ({job_id}, {stage}={status}): {e}")
+
+def load_transcript(work_db, job_id: str, transcript_ref: str = None) -> str:
+    """transcript_ref(work_db.calls 문서 _id) 로 전사 결과를 읽는다. 참조가 없으면 job_id 로 조회."""
+    query = {"job_id": job_id}
+    if transcript_ref:
+        try:
+            query = {"_id": ObjectId(transcript_ref)}
+        except InvalidId:
+            logger.warning(f"잘못된 transcript_ref ({transcript_ref}), job_id 로 조회: job_id={job_id}")
+    call_doc = work_db.calls.find_one(query, {"text": 1})
+    text = call_doc.get("text") if call_doc else None
+    if not text:
+        raise ValueError(f"요약할 전사 결과가 작업 DB 에 없습니다: job_id={job_id}, transcript_ref={transcript_ref}")
+    return text
+
 @celery.task(name='summarize_text')
-def summarize_text(job_id: str, db_connection_string: str, work_db_connection_string: str, work_db_name: str, text_to_summarize: str):
+def summarize_text(job_id: str, db_connection_string: str, work_db_connection_string: str, work_db_name: str, text_to_summarize: str = None, transcript_ref: str = None, chained: bool = False):
+    # 작업 상태 문서에서 요약 단계를 선점 (중복 전달/재시도 시 다른 워커가 처리 중이거나 이미 끝났으면 건너뜀)
+    owner = worker_id(celery.current_task.request.id if celery.current_task else None)
+    jobs = get_client(work_db_connection_string)[work_db_name].jobs
+    job = start_stage(jobs, job_id, "summarization", owner, transcript_ref=transcript_ref)
+    if job is None:
+        logger.info(f"Job {job_id}: 요약 단계가 이미 처리 중이거나 완료되어 건너뜀")
+        raise Ignore()
+    heartbeat = LeaseHeartbeat(jobs, job_id, "summarization", owner).start()
+
     try:
-        # MongoDB 연결 (로그용)
-        client = MongoClient(db_connection_string)
+        # MongoDB 연결 (로그용, 워커 프로세스 공유 클라이언트)
+        client = get_client(db_connection_string)
         db = client[settings.MONGODB_DB]
         
         # 작업 데이터베이스 연결
-        work_client = MongoClient(work_db_connection_string)
+        work_client = get_client(work_db_connection_string)
         work_db = work_client[work_db_name]
         
         # 작업 시작 로그
         now = datetime.now(UTC)
         logger.info(f"Summarize task 시작: job_id={job_id}")
-        db.logs.update_one  (
+        event_log.update_one(
+            db.logs,
             {"job_id": job_id},
             {
                 "$set": {
@@ -77,8 +121,15 @@ def summarize_text(job_id: str, db_connection_string: str, work_db_connection_st
                         "updated_at": now
                     }
                 }
-            }
+            },
+            upsert=True  # chain 모드에서는 /summarize 엔드포인트를 거치지 않아 로그가 없을 수 있음
         )
+        if chained:
+            notify_stage_status(job_id, "summarization", "processing")
+
+        # 전사 결과는 메시지로 받지 않고 참조(transcript_ref = calls 문서 _id)로 작업 DB 에서 직접 읽는다
+        if text_to_summarize is None:
+            text_to_summarize = load_transcript(work_db, job_id, transcript_ref)
             
         # OpenAI 클라이언트 초기화
         openai_client = OpenAI(api_key=OPENAI_API_KEY)
@@ -292,23 +343,29 @@ def summarize_text(job_id: str, db_connection_string: str, work_db_connection_st
 
         # 작업 완료 로그 (기존 로직 유지)
         now = datetime.now(UTC)
-        db.logs.update_one(
+        event_log.update_one(
+            db.logs,
             {"job_id": job_id, "service": "summarization"},
             {"$set": {"event": "summarization_completed", "status": "completed", "timestamp": now, "message": "텍스트 요약 및 검증 완료", "metadata.updated_at": now}} # 메시지 변경
         )
             
-        async def send_webhook():
-            async with AsyncClient() as client:
-                await client.post(
-                    f"{settings.API_GATEWAY_URL}/webhook/summarization/{job_id}",
-                    json={"status": "completed"}
-                )
-
-        asyncio.run(send_webhook())
-        
-        # 연결 종료
-        client.close()
-        work_client.close()
+        if complete_stage(jobs, job_id, "summarization", owner) and settings.AUDIO_CACHE_ENABLED and job.get("audio_sha256"):
+            # 같은 녹음이 다시 업로드되면 converter 가 이 결과를 재사용 (내용 해시 캐시)
+            call_doc = work_db.calls.find_one({"job_id": job_id})
+            if call_doc and call_doc.get("text"):
+                store_result(cache_collection(work_client), job["audio_sha256"], job_id, call_doc)
+
+        if chained:
+            notify_stage_status(job_id, "summarization", "completed")
+        else:
+            async def send_webhook():
+                async with AsyncClient() as client:
+                    await client.post(
+                        f"{settings.API_GATEWAY_URL}/webhook/summarization/{job_id}",
+                        json={"status": "completed"}
+                    )
+
+            asyncio.run(send_webhook())
         
         return {"status": "completed", "extracted_property_info": extraction_to_save}
         
@@ -317,7 +374,8 @@ def summarize_text(job_id: str, db_connection_string: str, work_db_connection_st
         try:
             # 오류 로그 기록
             now = datetime.now(UTC)
-            db.logs.update_one(
+            event_log.update_one(
+                db.logs,
                 {"job_id": job_id},
                 {
                     "$set": {
@@ -333,92 +391,179 @@ def summarize_text(job_id: str, db_connection_string: str, work_db_connection_st
                 },
                 upsert=True
             )
+            fail_stage(jobs, job_id, "summarization", owner, str(e))
         except Exception as inner_e:
             logger.error(f"오류 상태 업데이트 실패: {str(inner_e)}")
         finally:
-            client.close()
-            work_client.close()
+            if chained:
+                notify_stage_status(job_id, "summarization", "failed", str(e))
         raise
+    finally:
+        heartbeat.stop()
     
 # task 함수를 변수에 할당하여 export
 summarize_text_task = celery.task(name='summarize_text', bind=True)(summarize_text)
 
+def ensure_indexes():
+    client = get_client(settings.MONGODB_URI)
+    ensure_log_indexes(client[settings.MONGODB_DB].logs)
+    calls = client[settings.WORK_MONGODB_DB].calls
+    calls.create_index("job_id", name="job_id", background=True)
+    ensure_job_indexes(jobs_collection(client))
+
+# jobs 문서로 상태를 관리하기 시작한 시점의 calls _id 경계 (프로세스당 한 번 조회)
+_legacy_cutoff = None
+
+def legacy_calls_cutoff(jobs):
+    """
+    가장 오래된 jobs 문서의 생성 시각을 ObjectId 경계로 반환한다 (jobs 문서가 없으면 None).
+    그 이후에 만들어진 calls 는 converter 가 jobs 문서를 함께 만들므로 jobs 기준 스캔에서 처리되고,
+    calls 스캔은 그 이전(_id 가 경계보다 작은) 통화만 기본 _id 인덱스 범위로 읽으면 된다.
+    """
+    global _legacy_cutoff
+    if _legacy_cutoff is None:
+        first = jobs.find_one({}, {"created_at": 1}, sort=[("created_at", 1)])
+        if first and first.get("created_at"):
+            _legacy_cutoff = ObjectId.from_datetime(first["created_at"])
+    return _legacy_cutoff
+
+def send_summarization_retry(job_id: str, transcript_ref: str = None):
+    summarize_text_task.apply_async(kwargs={
+        'job_id': job_id,
+        'db_connection_string': settings.MONGODB_URI,
+        'work_db_connection_string': settings.MONGODB_URI,
+        'work_db_name': settings.WORK_MONGODB_DB,
+        'transcript_ref': transcript_ref
+    }, queue='summarization')
+
 @celery.task(name='retry_incomplete_jobs')
 def retry_incomplete_jobs():
     """
-    30분마다 실행되어, db.logs에서 'failed' 상태인 summarization 작업과
-    work_db.calls에서 전사(text)가 완료되었으나 요약 결과(extracted_property_info)가 없는 경우
-    작업을 찾아 다시 summarize_text 태스크를 재시도한다.
+    30분마다 실행되어, 요약이 실패했거나 임대가 만료되었거나(워커 종료, 메시지 유실) 전사는 끝났는데
+    요약이 시작되지 않은 작업을 찾아 다시 summarize_text 태스크를 재시도한다. 작업 상태는 work_db.jobs 문서로 판단한다.
+    큐에 넣기 전에 단계를 queued 로 CAS 전이(claim_queued)하므로 겹친 스캔/여러 워커가 같은 작업을 중복 등록하지 않는다.
+
+    jobs 문서가 없는 이전 작업은 db.logs 의 'failed' 로그와 work_db.calls 의 전사/요약 여부로 판단하고,
+    등록할 때 jobs 문서를 만들어 이후에는 jobs 로 관리한다.
+    로그 DB 와 작업 DB 가 달라 한 번의 집계로 합칠 수 없으므로, 후보는 인덱스를 타는 쿼리 두 번으로 모으고
+    작업별 확인은 job_id $in 으로 RETRY_SCAN_BATCH_SIZE 개씩 일괄 조회한다.
     """
     logger.info("===== 재시도 대상 작업 스캐닝 시작 =====")
+    processed_count = 0
 
     try:
         # 로그 DB 연결
-        client = MongoClient(settings.MONGODB_URI)
+        client = get_client(settings.MONGODB_URI)
         db = client[settings.MONGODB_DB]
         work_db = client[settings.WORK_MONGODB_DB]
+        jobs = jobs_collection(client)
+        scanner = worker_id(celery.current_task.request.id if celery.current_task else None)
+
+        # jobs 상태 문서 기준 재시도 대상 (summarization_status / summarization_lease / transcription_status 인덱스)
+        projection = {"stages.transcription.transcript_ref": 1}
+        tracked = list(jobs.find(
+            {"$or": [
+                {"stages.summarization.status": "failed"},
+                {"stages.transcription.status": "completed", "stages.summarization.status": "pending"},
+            ]},
+            projection
+        ))
+        tracked.extend(find_expired(jobs, "summarization", projection))
+        for doc in tracked:
+            job_id = doc["_id"]
+            if not claim_queued(jobs, job_id, "summarization", scanner, from_statuses=("pending", "failed")):
+                logger.info(f"job_id={job_id} 는 다른 스캐너/워커가 이미 등록했거나 처리 중이므로 스킵")
+                continue
+            logger.info(f"job_id={job_id} 재시도 수행 (요약 작업 실행)")
+            send_summarization_retry(job_id, doc.get("stages", {}).get("transcription", {}).get("transcript_ref"))
+            processed_count += 1
 
-        # 1. 로그에서 summarization 실패 상태의 job_id 집합
-        failed_job_ids = set(db.logs.find({"service": "summarization", "status": "failed"}).distinct("job_id"))
+        # === 이하 jobs 문서가 없는 이전 작업 ===
+        # 1. 로그에서 summarization 실패 상태의 job_id 집합 (service_status_ts 인덱스)
+        failed_job_ids = set(db.logs.distinct("job_id", {"service": "summarization", "status": "failed"}))
 
         # 2. work_db.calls에서 전사 결과가 존재하면서 요약 결과가 없는 job_id 집합
-        pending_job_ids = set(
-            work_db.calls.find({
-                "text": {"$ne": None},
-                "summary_content": {"$exists": False}
-            }).distinct("job_id")
-        )
-
-        # 두 집합의 합집합으로 재시도 대상 job_id 결정
+        #    jobs 문서가 생기기 전의 통화만 대상이므로 _id 범위로 좁혀 _id 인덱스로 읽는다
+        legacy_filter = {"summary_content": {"$exists": False}, "text": {"$ne": None}}
+        cutoff = legacy_calls_cutoff(jobs)
+        if cutoff is not None:
+            legacy_filter["_id"] = {"$lt": cutoff}
+        pending_job_ids = set(work_db.calls.distinct("job_id", legacy_filter))
+
+        # 두 집합의 합집합으로 재시도 대상 job_id 결정 (jobs 문서가 있는 작업은 위에서 처리)
         jobs_to_retry = failed_job_ids.union(pending_job_ids)
+        for batch in chunked(sorted(jobs_to_retry), settings.RETRY_SCAN_BATCH_SIZE):
+            jobs_to_retry.difference_update(jobs.distinct("_id", {"_id": {"$in": batch}}))
 
         if not jobs_to_retry:
-            logger.info("재시도 대상 작업이 없습니다.")
+            logger.info("jobs 문서가 없는 이전 작업 중 재시도 대상이 없습니다.")
             return
-        
-        processed_count = 0
-        for job_id in jobs_to_retry:
+
+        for batch in chunked(sorted(jobs_to_retry), settings.RETRY_SCAN_BATCH_SIZE):
             # 이미 "completed" 로그가 존재한다면(재시도 전에 해결된 경우) 스킵
-            completed_log = db.logs.find_one({"job_id": job_id, "status": "completed"})
-            if completed_log:
+            completed = set(db.logs.distinct("job_id", {"job_id": {"$in": batch}, "status": "completed"}))
+            for job_id in completed:
                 logger.info(f"job_id={job_id} 는 이미 완료 로그가 있으므로 재시도하지 않음")
-                continue
 
-            # 재시도할 job의 입력값들을 work_db에서 조회
-            call_doc = work_db.calls.find_one({"job_id": str(job_id)})
-            if not call_doc:
-                logger.warning(f"work_db.calls에서 job_id={job_id} 관련 정보를 찾을 수 없어 재시도 불가")
-                continue
-
-            # 전사 결과가 있어야 summarization 진행
-            if call_doc.get("text") is None:
-                logger.warning(f"job_id={job_id} 는 전사 결과가 없으므로 요약 재시도 대상에서 제외")
-                continue
-
-            # 만약 이미 요약 결과가 존재하면 재시도 대상에서 제외
-            if "summary_content" in call_doc:
-                logger.info(f"job_id={job_id} 는 이미 요약 결과가 존재하므로 재시도 대상에서 제외")
-                continue
-
-            logger.info(f"job_id={job_id} 재시도 수행 (요약 작업 실행)")
-            # summarize_text 태스크 재등록 (비동기)
-            summarize_text_task.apply_async(kwargs={
-                'job_id': job_id,
-                'db_connection_string': settings.MONGODB_URI,
-                'work_db_connection_string': settings.MONGODB_URI,
-                'work_db_name': settings.WORK_MONGODB_DB,
-                'text_to_summarize': call_doc.get("text")
-            }, queue='summarization')
-            processed_count += 1
-            # ====================================================================
+            # 재시도할 job의 입력값들을 work_db에서 조회 (전사/요약 본문은 읽지 않고 존재 여부만 계산)
+            remaining = [job_id for job_id in batch if job_id not in completed]
+            call_docs = {}
+            for doc in work_db.calls.aggregate([
+                {"$match": {"job_id": {"$in": [str(job_id) for job_id in remaining]}}},
+                {"$project": {
+                    "job_id": 1,
+                    "has_text": {"$ne": [{"$ifNull": ["$text", None]}, None]},
+                    "has_summary": {"$ne": [{"$type": "$summary_content"}, "missing"]},
+                }},
+            ]):
+                call_docs.setdefault(doc["job_id"], doc)
+
+            for job_id in remaining:
+                call_doc = call_docs.get(str(job_id))
+                if not call_doc:
+                    logger.warning(f"work_db.calls에서 job_id={job_id} 관련 정보를 찾을 수 없어 재시도 불가")
+                    continue
+
+                # 전사 결과가 있어야 summarization 진행
+                if not call_doc["has_text"]:
+                    logger.warning(f"job_id={job_id} 는 전사 결과가 없으므로 요약 재시도 대상에서 제외")
+                    continue
+
+                # 만약 이미 요약 결과가 존재하면 재시도 대상에서 제외
+                if call_doc["has_summary"]:
+                    logger.info(f"job_id={job_id} 는 이미 요약 결과가 존재하므로 재시도 대상에서 제외")
+                    continue
+
+                create_job(jobs, job_id, **{"stages.conversion.status": "completed",
+                                            "stages.transcription.status": "completed"})
+                if not claim_queued(jobs, job_id, "summarization", scanner, from_statuses=("pending", "failed")):
+                    continue
+                logger.info(f"job_id={job_id} 재시도 수행 (요약 작업 실행)")
+                # summarize_text 태스크 재등록 (비동기)
+                send_summarization_retry(job_id, str(call_doc["_id"]))
+                processed_count += 1
 
     except Exception as e:
         logger.error(f"재시도 작업 처리 중 오류 발생: {str(e)}", exc_info=True) # <-- exc_info 추가
     finally:
-        if client: client.close()
         logger.info(f"===== 재시도 대상 작업 스캐닝 종료 (총 {processed_count}건 큐 등록) =====") # <-- 처리 건수 로깅
 
-    logger.info("===== 재시도 대상 작업 스캐닝 종료 =====")
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    # 워커 프로세스마다 MongoDB 클라이언트를 한 번 만들어 태스크 간에 재사용
+    init_clients(settings.MONGODB_URI)
+    # 이전 프로세스가 MongoDB 장애로 남긴 이벤트 로그 스풀을 기록 (백그라운드 스레드)
+    event_log.start()
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    event_log.flush()
+    close_clients()
+
+@task_postrun.connect
+def flush_event_log(**kwargs):
+    # 태스크가 끝나면(성공/실패 모두) 버퍼에 남은 로그 이벤트를 동기 기록
+    event_log.flush()
 
 @worker_ready.connect
 def at_start(sender, **kwargs):
@@ -426,4 +571,8 @@ def at_start(sender, **kwargs):
     Celery 워커가 준비되면 즉시 retry_incomplete_jobs 태스크를 실행
     """
     logger.info("Celery 워커가 준비되었습니다. 초기 retry_incomplete_jobs 태스크를 실행합니다.")
+    try:
+        ensure_indexes()
+    except Exception as e:
+        logger.warning(f"인덱스 생성 실패 (재시도 스캔은 계속 진행): {e}")
     retry_incomplete_jobs.delay()
\ No newline at end of file
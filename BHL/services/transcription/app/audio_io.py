@@ -0,0 +1,166 @@
+import io
+import mmap
+import queue
+import struct
+import wave
+from contextlib import contextmanager
+from typing import Iterator, Optional, Sequence, Tuple
+
+from pydub import AudioSegment
+
+# WAV fmt 청크의 포맷 태그
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# mmap 으로 바로 읽을 수 있는 샘플 폭 (8bit WAV 는 unsigned 라 pydub 변환 경로 사용)
+_MMAP_SAMPLE_WIDTHS = (2, 4)
+
+
+class BufferPool:
+    """
+    청크 인코딩용 메모리 버퍼(BytesIO) 풀.
+    /tmp 에 WAV 파일을 쓰고 다시 읽는 대신, 청크를 버퍼에 바로 인코딩해 요청 본문으로 사용한다.
+    동시 호출 수만큼만 버퍼를 유지하고, 반환된 버퍼는 비운 뒤 재사용한다.
+    """
+
+    def __init__(self, max_size: int = 4):
+        self._free: "queue.LifoQueue[io.BytesIO]" = queue.LifoQueue(maxsize=max(max_size, 1))
+
+    @contextmanager
+    def buffer(self) -> Iterator[io.BytesIO]:
+        try:
+            buf = self._free.get_nowait()
+        except queue.Empty:
+            buf = io.BytesIO()
+        buf.seek(0)
+        buf.truncate(0)
+        try:
+            yield buf
+        finally:
+            try:
+                self._free.put_nowait(buf)
+            except queue.Full:
+                buf.close()
+
+
+def _find_wav_chunks(mm) -> Optional[Tuple[Tuple[int, int, int, int], int, int]]:
+    """RIFF 헤더를 읽어 ((format_tag, channels, frame_rate, sample_width), data_offset, data_size) 반환."""
+    if len(mm) < 12 or mm[0:4] != b"RIFF" or mm[8:12] != b"WAVE":
+        return None
+    pos, fmt = 12, None
+    while pos + 8 <= len(mm):
+        chunk_id = mm[pos:pos + 4]
+        chunk_size = struct.unpack_from("<I", mm, pos + 4)[0]
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            format_tag, channels, frame_rate = struct.unpack_from("<HHI", mm, body)
+            bits_per_sample = struct.unpack_from("<H", mm, body + 14)[0]
+            if format_tag == _WAVE_FORMAT_EXTENSIBLE and chunk_size >= 40:
+                format_tag = struct.unpack_from("<H", mm, body + 24)[0]
+            fmt = (format_tag, channels, frame_rate, bits_per_sample // 8)
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            # ffmpeg 이 스트리밍으로 쓴 파일은 data 크기가 비어있을 수 있으므로 파일 끝까지로 제한
+            return fmt, body, min(chunk_size, len(mm) - body)
+        pos = body + chunk_size + (chunk_size & 1)
+    return None
+
+
+class PcmSource:
+    """
+    WAV 파일의 PCM 데이터를 복사 없이 다루기 위한 래퍼.
+    16/32bit PCM WAV 는 파일을 mmap 하여 memoryview 로 구간만 잘라 보고,
+    그 외 포맷은 pydub 으로 한 번 디코딩한 뒤 같은 인터페이스를 제공한다.
+    AudioSegment 와 같은 속성 이름(raw_data, frame_rate, sample_width, channels)을 가진다.
+    """
+
+    def __init__(self, data: memoryview, frame_rate: int, sample_width: int, channels: int,
+                 mm: Optional[mmap.mmap] = None, fh=None):
+        self.raw_data = data
+        self.frame_rate = frame_rate
+        self.sample_width = sample_width
+        self.channels = channels
+        self.frame_width = sample_width * channels
+        self._mm = mm
+        self._fh = fh
+
+    @classmethod
+    def open(cls, path: str) -> "PcmSource":
+        fh = open(path, "rb")
+        mm = None
+        try:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            info = _find_wav_chunks(mm)
+            if info is not None:
+                (format_tag, channels, frame_rate, sample_width), offset, size = info
+                if format_tag == _WAVE_FORMAT_PCM and sample_width in _MMAP_SAMPLE_WIDTHS and channels > 0:
+                    frame_width = sample_width * channels
+                    size -= size % frame_width
+                    data = memoryview(mm)[offset:offset + size]
+                    return cls(data, frame_rate, sample_width, channels, mm=mm, fh=fh)
+        except (ValueError, OSError, struct.error):
+            # 빈 파일 등 mmap 불가 - 아래 pydub 경로 사용
+            pass
+        if mm is not None:
+            mm.close()
+        fh.close()
+
+        audio = AudioSegment.from_file(path)
+        if audio.sample_width not in _MMAP_SAMPLE_WIDTHS:
+            audio = audio.set_sample_width(2)
+        return cls(memoryview(audio.raw_data), audio.frame_rate, audio.sample_width, audio.channels)
+
+    @property
+    def max_possible_amplitude(self) -> float:
+        return float(2 ** (self.sample_width * 8)) / 2
+
+    def __len__(self) -> int:
+        """길이 (ms) - pydub len(AudioSegment) 와 동일한 계산."""
+        frame_count = len(self.raw_data) // self.frame_width
+        return int(round(1000 * frame_count / self.frame_rate))
+
+    def _frame(self, ms: int) -> int:
+        ms = min(max(ms, 0), len(self))
+        return int(ms * self.frame_rate / 1000.0)
+
+    def view(self, start_ms: int, end_ms: int) -> memoryview:
+        """[start_ms, end_ms) 구간의 PCM 을 복사 없이 반환 (pydub 슬라이싱과 같은 프레임 경계)."""
+        start = self._frame(start_ms)
+        end = max(self._frame(end_ms), start)
+        return self.raw_data[start * self.frame_width:end * self.frame_width]
+
+    def close(self) -> None:
+        try:
+            self.raw_data.release()
+        except BufferError:
+            # numpy 배열 등이 아직 참조 중이면 GC 에 맡긴다
+            return
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                return
+        if self._fh is not None:
+            self._fh.close()
+
+    def __enter__(self) -> "PcmSource":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def encode_intervals_wav(pcm: PcmSource, intervals: Sequence[Tuple[int, int]], buf: io.BytesIO) -> io.BytesIO:
+    """
+    원본 PCM 의 여러 (start_ms, end_ms) 구간을 이어 붙인 WAV 를 buf 에 기록한다.
+    AudioSegment 를 합치지 않고 각 구간의 memoryview 를 버퍼에 한 번씩만 복사한다.
+    """
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(pcm.channels)
+        wav.setsampwidth(pcm.sample_width)
+        wav.setframerate(pcm.frame_rate)
+        for start_ms, end_ms in intervals:
+            wav.writeframesraw(pcm.view(start_ms, end_ms))
+    buf.seek(0)
+    return buf
@@ -0,0 +1,75 @@
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Sequence
+
+from pymongo.errors import PyMongoError
+
+from .chunk_planner import ChunkPlan
+from .config import settings
+
+UTC = timezone.utc
+logger = logging.getLogger(__name__)
+
+# 청크 전사 체크포인트 (work_db.chunk_checkpoints) - 청크가 끝날 때마다 바로 기록
+# {_id: "job_id:index:boundaries_hash", job_id, index, start_ms, end_ms, boundaries, text, created_at}
+# 재시도된 전사 태스크는 같은 작업/순번/구간 경계의 체크포인트가 있는 청크를 다시 보내지 않는다.
+# 구간 경계까지 키에 넣으므로 청크 계획이 바뀌면(에너지 프로파일 유무 등) 이전 체크포인트는 쓰이지 않는다.
+# 전사 결과가 calls 에 저장되면 지우고, 남은 것(포기된 작업)은 created_at TTL 인덱스로 정리된다.
+
+
+def checkpoint_collection(client):
+    return client[settings.WORK_MONGODB_DB].chunk_checkpoints
+
+
+def ensure_checkpoint_indexes(checkpoints) -> None:
+    try:
+        checkpoints.create_index("job_id", name="job_id", background=True)
+        checkpoints.create_index("created_at", name="created_at_ttl",
+                                 expireAfterSeconds=settings.CHUNK_CHECKPOINT_TTL_SEC, background=True)
+    except PyMongoError as e:
+        logger.warning(f"청크 체크포인트 인덱스 생성 실패: {e}")
+
+
+def boundaries_hash(plan: ChunkPlan) -> str:
+    encoded = ",".join(f"{start}-{end}" for start, end in plan)
+    return hashlib.sha1(encoded.encode("ascii")).hexdigest()[:16]
+
+
+def checkpoint_id(job_id: str, index: int, plan: ChunkPlan) -> str:
+    return f"{job_id}:{index}:{boundaries_hash(plan)}"
+
+
+def load_checkpoints(checkpoints, job_id: str, plans: Sequence[ChunkPlan]) -> Dict[int, str]:
+    """현재 청크 계획과 순번/구간 경계가 같은 체크포인트만 index -> 텍스트로 반환한다. 조회 실패 시 빈 dict."""
+    wanted = {checkpoint_id(job_id, index, plan): index for index, plan in enumerate(plans)}
+    try:
+        docs = checkpoints.find({"job_id": job_id}, {"text": 1})
+        return {wanted[doc["_id"]]: doc["text"] for doc in docs if doc["_id"] in wanted}
+    except PyMongoError as e:
+        logger.warning(f"Job {job_id}: 청크 체크포인트 조회 실패, 전체 청크를 변환: {e}")
+        return {}
+
+
+def save_checkpoint(checkpoints, job_id: str, index: int, plan: ChunkPlan, text: str) -> None:
+    """청크 하나의 전사 결과를 바로 기록한다 (디스패처 스레드에서 호출)."""
+    checkpoints.replace_one(
+        {"_id": checkpoint_id(job_id, index, plan)},
+        {
+            "job_id": job_id,
+            "index": index,
+            "start_ms": plan[0][0],
+            "end_ms": plan[-1][1],
+            "boundaries": [list(interval) for interval in plan],
+            "text": text,
+            "created_at": datetime.now(UTC),
+        },
+        upsert=True,
+    )
+
+
+def clear_checkpoints(checkpoints, job_id: str) -> None:
+    try:
+        checkpoints.delete_many({"job_id": job_id})
+    except PyMongoError as e:
+        logger.warning(f"Job {job_id}: 청크 체크포인트 삭제 실패 (TTL 로 정리됨): {e}")
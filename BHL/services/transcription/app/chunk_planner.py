@@ -0,0 +1,66 @@
+from typing import List, Sequence, Tuple
+
+# (start_ms, end_ms) 구간
+Range = Tuple[int, int]
+# 하나의 전송 청크 = 원본 위 구간들의 목록 (이어 붙여 한 번에 인코딩)
+ChunkPlan = List[Range]
+
+# Cloudflare Whisper 1회 요청 최대 길이 (1분 미만)
+MAX_CHUNK_DURATION_MS = 59999
+# 긴 구간을 자르고 남은 마지막 조각이 이 길이 이하이면 버린다
+MIN_TAIL_MS = 100
+
+
+def plan_duration(plan: Sequence[Range]) -> int:
+    return sum(end - start for start, end in plan)
+
+
+def _coalesce(plan: ChunkPlan) -> ChunkPlan:
+    """맞닿은 구간(end == 다음 start)은 하나로 합쳐 원본을 한 번만 자르도록 한다."""
+    merged: ChunkPlan = []
+    for start, end in plan:
+        if merged and merged[-1][1] == start:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def plan_chunks(ranges: Sequence[Range],
+                max_duration: int = MAX_CHUNK_DURATION_MS,
+                min_tail: int = MIN_TAIL_MS) -> List[ChunkPlan]:
+    """
+    묵음 기준 구간들을 최대 max_duration(ms) 길이의 청크로 묶는다.
+    기존 AudioSegment 병합 루프(current_chunk += chunk, chunk[::max_duration])와 같은 규칙이지만
+    오디오를 복사하지 않고 (start_ms, end_ms) 구간만 다룬다.
+    """
+    plans: List[ChunkPlan] = []
+    current: ChunkPlan = []
+    current_len = 0
+
+    for start, end in ranges:
+        length = end - start
+        # 현재 청크와 다음 구간을 합쳤을 때 목표 길이를 넘지 않으면 합침
+        if current_len + length <= max_duration:
+            current.append((start, end))
+            current_len += length
+            continue
+
+        # 넘으면, 기존에 병합중이던 청크가 있으면 저장
+        if current_len > 0:
+            plans.append(_coalesce(current))
+
+        # 구간 자체가 최대 길이보다 긴 경우, 최대 길이로 분할
+        if length > max_duration:
+            pieces = [(s, min(s + max_duration, end)) for s in range(start, end, max_duration)]
+            for i, (piece_start, piece_end) in enumerate(pieces):
+                if i < len(pieces) - 1 or piece_end - piece_start > min_tail:
+                    plans.append([(piece_start, piece_end)])
+            current, current_len = [], 0
+        # 최대 길이 이하면, 이것이 다음 병합의 시작이 됨
+        else:
+            current, current_len = [(start, end)], length
+
+    if current_len > 0:
+        plans.append(_coalesce(current))
+    return plans
@@ -6,6 +6,21 @@ class Settings(BaseSettings):
     MONGODB_URI: str = os.getenv("MONGODB_URI")
     MONGODB_DB: str = "transcription_db"
     WORK_MONGODB_DB: str = "mars_work_db"
+    MONGO_MAX_POOL_SIZE: int = 10                   # 워커 프로세스당 MongoDB 커넥션 풀 크기
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGO_HEALTHCHECK_INTERVAL_SEC: float = 30.0    # 공유 클라이언트 ping 확인 간격
+
+    # 이벤트 로그(db.logs) 버퍼링: 개수/시간 임계값에 도달하면 bulk_write, 실패 시 스풀 디렉토리에 JSONL 로 보관
+    EVENT_LOG_MAX_BATCH: int = 100
+    EVENT_LOG_FLUSH_INTERVAL_SEC: float = 1.0
+    EVENT_LOG_SPOOL_DIR: str = "/app/spool/event_log"
+
+    # 작업 상태 컬렉션(work_db.jobs) 임대: 만료되면 스캐너가 단계를 다시 큐에 넣는다
+    JOB_LEASE_SEC: int = 300               # 처리 중 임대 (하트비트로 연장)
+    JOB_LEASE_RENEW_SEC: float = 60.0      # 하트비트 연장 주기 (JOB_LEASE_SEC 보다 충분히 짧게)
+    JOB_QUEUE_LEASE_SEC: int = 3600        # 큐 등록 후 워커가 시작할 때까지의 임대
+
+    RETRY_SCAN_BATCH_SIZE: int = 1000               # 재시도 스캐너의 job_id $in 조회 묶음 크기
     
     # 디렉토리 설정
     UPLOAD_DIR: str = "/app/audio_outputs"
@@ -16,6 +31,39 @@ class Settings(BaseSettings):
     
     # API Gateway URL
     API_GATEWAY_URL: str = "http://api_gateway:8000"
+
+    # 전사 보정(GPT) 결과 캐시 (work_db.refinement_cache): (원문 전사, 프롬프트 버전, 모델) 이 같으면 GPT 호출 생략
+    REFINEMENT_MODEL: str = "gpt-4o-mini"
+    REFINEMENT_CACHE_ENABLED: bool = True
+    REFINEMENT_CACHE_TTL_SEC: int = 30 * 24 * 3600   # 마지막 사용 후 보관 기간 (TTL 인덱스)
+    REFINEMENT_CACHE_MAX_ENTRIES: int = 50000        # 초과분은 재시도 스캔 때 가장 오래 쓰이지 않은 항목부터 삭제
+    # 긴 통화 구간별 보정: auto 는 전체가 REFINEMENT_SEGMENT_CHARS 를 넘을 때만 나눔 (single / segmented 로 고정 가능)
+    REFINEMENT_MODE: str = "auto"
+    REFINEMENT_SEGMENT_CHARS: int = 6000             # 구간 최대 길이 (청크 경계에서 나눔)
+    REFINEMENT_CONTEXT_CHARS: int = 300              # 구간 앞뒤에 참고용으로 붙이는 이웃 구간 문맥 길이
+    REFINEMENT_MAX_CONCURRENCY: int = 4              # 동시에 보정할 구간 수
+    REFINEMENT_PIPELINE: bool = True                 # 구간 보정을 청크 전사와 겹쳐 실행 (앞 구간이 확정되면 바로 보정)
+
+    # 전사(STT) 백엔드: cloudflare | openai | local (faster-whisper CPU)
+    # STT_FALLBACK_BACKENDS (쉼표 구분) 는 앞 백엔드가 요청 한도(429)에 걸리면 STT_QUOTA_COOLDOWN_SEC 동안 대신 사용
+    STT_BACKEND: str = "cloudflare"
+    STT_FALLBACK_BACKENDS: str = ""                # 예: "local" 또는 "openai,local"
+    STT_QUOTA_COOLDOWN_SEC: float = 60.0
+    STT_LANGUAGE: str = "ko"
+    OPENAI_WHISPER_MODEL: str = "whisper-1"
+    LOCAL_WHISPER_MODEL: str = "small"             # faster-whisper 모델 크기 또는 CTranslate2 변환 모델 경로
+    LOCAL_WHISPER_COMPUTE_TYPE: str = "int8"       # CPU int8 양자화
+    LOCAL_WHISPER_CPU_THREADS: int = 0             # 0 이면 CTranslate2 기본값
+    LOCAL_WHISPER_BEAM_SIZE: int = 1               # CPU 처리량을 위해 greedy 디코딩
+    LOCAL_WHISPER_DOWNLOAD_ROOT: str = "/app/whisper_cache"
+
+    # Cloudflare STT 청크 동시 호출 설정
+    STT_MAX_CONCURRENCY: int = 4          # 동시에 진행할 청크 요청 수
+    STT_RATE_LIMIT_PER_SEC: float = 2.0   # 원격 백엔드별 초당 허용 요청 수 (0 이하면 제한 없음, local 은 제한 없음)
+    STT_RATE_LIMIT_BURST: int = 4         # 순간 허용 버스트 크기
+    STT_CHUNK_MAX_RETRIES: int = 3        # 청크별 재시도 횟수
+    STT_RETRY_BACKOFF_SEC: float = 2.0    # 재시도 대기 시간 (지수 증가)
+    CHUNK_CHECKPOINT_TTL_SEC: int = 7 * 24 * 3600   # 청크 전사 체크포인트 보관 기간 (완료되면 바로 삭제)
     
     class Config:
         case_sensitive = True
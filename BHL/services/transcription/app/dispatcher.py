@@ -0,0 +1,126 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, List, Mapping, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    스레드 안전 토큰 버킷.
+    초당 rate 개의 토큰을 채우고, 최대 capacity 개까지 순간 버스트를 허용한다.
+    rate <= 0 이면 제한 없이 바로 통과한다.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ChunkTranscriptionError(RuntimeError):
+    """재시도 횟수를 모두 소진한 청크가 있을 때 발생."""
+
+    def __init__(self, index: int, attempts: int, cause: Exception):
+        self.index = index
+        self.attempts = attempts
+        self.cause = cause
+        super().__init__(f"청크 {index + 1} 변환 실패 ({attempts}회 시도): {cause}")
+
+
+def dispatch_chunks(chunks: Sequence[Any],
+                    transcribe_fn: Callable[[int, Any], str],
+                    max_concurrency: int = 4,
+                    max_retries: int = 3,
+                    retry_backoff: float = 2.0,
+                    rate_limiter: Optional[TokenBucket] = None,
+                    job_id: Optional[str] = None,
+                    completed: Optional[Mapping[int, str]] = None,
+                    on_result: Optional[Callable[[int, Any, str], None]] = None) -> List[str]:
+    """
+    청크들을 최대 max_concurrency 개씩 동시에 transcribe_fn(index, chunk)로 보내고,
+    결과 텍스트를 원래 청크 순서대로 반환한다.
+
+    - 실패한 청크는 해당 청크만 지수 백오프로 최대 max_retries 회 재시도한다.
+    - 모든 호출 전에 rate_limiter 토큰을 받아 외부 API 호출 속도를 제한한다.
+    - 재시도까지 실패한 청크가 있으면 남은 청크를 취소하고, 실행 중인 청크가 끝나길 기다린 뒤 ChunkTranscriptionError 발생.
+      (호출자가 정리한 PCM/버퍼를 반환 이후에 건드리는 청크 스레드가 없도록)
+    - completed(index -> 텍스트)에 있는 청크는 보내지 않고 그 결과를 그대로 쓴다 (이전 시도의 체크포인트).
+    - on_result(index, chunk, text)는 청크가 끝날 때마다 바로 호출된다 (체크포인트 기록용, 실패해도 전사는 계속).
+    """
+    total = len(chunks)
+    results: List[Optional[str]] = [None] * total
+    if total == 0:
+        return []
+    completed = completed or {}
+    for idx, text in completed.items():
+        if 0 <= idx < total:
+            results[idx] = text
+    pending = [(idx, chunk) for idx, chunk in enumerate(chunks) if results[idx] is None]
+    if not pending:
+        return results
+    if completed:
+        logger.info(f"Job {job_id}: 체크포인트 {total - len(pending)}/{total}개 재사용, {len(pending)}개 청크만 변환")
+
+    # 한 청크가 최종 실패하면 설정 - 다른 청크 스레드는 다음 호출/재시도/콜백 전에 멈춘다
+    stop = threading.Event()
+
+    def run(index: int, chunk: Any) -> Optional[str]:
+        attempt = 0
+        while True:
+            attempt += 1
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            if stop.is_set():
+                return None
+            try:
+                text = transcribe_fn(index, chunk)
+            except Exception as e:
+                if attempt > max_retries:
+                    raise ChunkTranscriptionError(index, attempt, e) from e
+                delay = retry_backoff * (2 ** (attempt - 1))
+                logger.warning(f"Job {job_id}: 청크 {index + 1}/{total} 변환 실패 ({attempt}회차), {delay:.1f}초 후 재시도: {e}")
+                if stop.wait(delay):
+                    return None
+                continue
+            if stop.is_set():
+                return None
+            if on_result is not None:
+                try:
+                    on_result(index, chunk, text)
+                except Exception as e:
+                    logger.warning(f"Job {job_id}: 청크 {index + 1}/{total} 결과 콜백 실패: {e}")
+            return text
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(pending))),
+                                  thread_name_prefix=f"stt-{job_id}")
+    try:
+        futures = {executor.submit(run, idx, chunk): idx for idx, chunk in pending}
+        for future in as_completed(futures):
+            idx = futures[future]
+            results[idx] = future.result()
+            logger.info(f"Job {job_id}: 청크 {idx + 1}/{total} 변환 완료.")
+    except BaseException:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+    executor.shutdown(wait=True)
+    return results
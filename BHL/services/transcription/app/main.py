@@ -6,6 +6,7 @@ import uuid
 import logging
 from .models import Transcript
 from .tasks import celery, transcribe_audio_task
+from .refinement import cache_stats
 from .config import settings
 
 UTC = timezone.utc
@@ -43,6 +44,14 @@ async def health_check():
     except Exception as e:
         raise HTTPException(status_code=503, detail=str(e))
 
+@app.get("/metrics/refinement-cache")
+async def refinement_cache_metrics():
+    """전사 보정(GPT) 결과 캐시의 누적 적중/미스 횟수 (모든 워커 합계)"""
+    try:
+        return cache_stats(work_client)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
 @app.post("/transcribe")
 async def transcribe_audio_endpoint(job_id: str = Query(..., description="처리할 작업의 고유 ID")): # <--- Query 사용
     try:
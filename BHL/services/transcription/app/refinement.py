@@ -0,0 +1,382 @@
+import asyncio
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, List, Mapping, Optional, Sequence, Tuple
+
+from pymongo import ASCENDING, WriteConcern
+from pymongo.errors import PyMongoError
+
+from .config import settings
+
+UTC = timezone.utc
+logger = logging.getLogger(__name__)
+
+# 전사 보정(GPT) 결과 캐시 (work_db.refinement_cache)
+# {_id: sha256(프롬프트 버전, 모델, 원문 전사), model, prompt_version, refined, created_at, last_accessed, hits}
+# 재시도 스캐너가 같은 작업을 다시 돌리거나 같은 녹음을 다시 처리할 때, Whisper 원문이 같으면 GPT 호출을 건너뛴다.
+# - last_accessed TTL 인덱스: REFINEMENT_CACHE_TTL_SEC 동안 쓰이지 않은 항목은 MongoDB 가 삭제
+# - evict_lru: 항목 수가 REFINEMENT_CACHE_MAX_ENTRIES 를 넘으면 가장 오래 쓰이지 않은 항목부터 삭제
+# 적중/미스 횟수는 work_db.cache_stats 의 "refinement" 문서에 누적한다 (main.py 의 /metrics/refinement-cache).
+
+# 아래 보정 프롬프트를 바꾸면 올려서 이전 프롬프트의 결과가 재사용되지 않게 한다
+PROMPT_VERSION = "1"
+STATS_ID = "refinement"
+
+# 이 프로세스의 적중/미스 횟수
+counters = {"hits": 0, "misses": 0}
+_counters_lock = threading.Lock()
+
+
+def build_prompt(transcribed_text: str) -> str:
+    return f"""
+                당신은 다음 전화 통화 녹취록(STT 출력)을 처리할 것입니다. 
+                이 통화는 서울시 강남구 청담동 소재의 부동산(중개사)에서 사장님과 고객이 나눈 대화입니다. 
+                아래의 지침을 엄격히 따라주세요:
+
+                1. 원문 최대 보존
+                - 원문에 기재된 표현, 단어, 어조를 최대한 그대로 유지해주세요.
+                - 원문이 아무리 길어도 일부만 처리하지 말고 원문 전체를 최대한 출력해주세요.
+                - 확실한 오류가 아니라면, 의심되는 부분도 가능한 한 원문 그대로 둡니다.
+                - 데이터가 아무리 짧더라도 최선을 다해 처리해서 반환하세요. 추가 정보 요청은 절대 하지 마세요.
+                
+                2. 오류/불필요한 반복(환각) 최소 수정
+                - 철자 오류가 섞인 반복(예: "청담동동동"처럼 철자가 엉켜서 반복된 경우)만 명백히 수정하거나 제거하세요.
+                - 철자는 맞지만 의미 없이 기계적으로 반복된 구절(예: "있는 곳에 있는 곳에 있는 곳에..."가 문맥상 불필요하다고 확실히 보이면)도, 최소한으로만 정리하세요.
+                - 다만 실제 대화 맥락에서 강조하거나 습관적으로 반복한 표현이라면 그대로 두세요.
+                - 애매한 경우에는 원문을 그대로 둡니다.
+                
+                3. 부동산 이름 표준화
+                - 아래 리스트에 유사하게 들리는 부동산(아파트, 상가 등) 이름이 나오면, 가능한 한 명확하게 파악하여 해당 리스트 중 정확한 이름으로 표준화해 주세요.
+                1) 아크로 삼성
+                2) 청담 르엘
+                3) 청담 삼익
+                4) 엘프론트 청담
+                5) 삼성 아이파크
+                6) 청구
+                7) 청담 자이
+                8) 홍실
+                9) 진흥
+                10) 래미안 로이뷰
+                
+                - 만약 실제로는 다른 단어이거나, 리스트에 속하지 않는 이름으로 확실하게 보이면 그대로 두세요.
+
+                4. 한국어 이외 텍스트 처리
+                - 맥락상 불필요하고 의미 없는 외국어, 특수문자(예: 무작위 영문, 온갖 기호 등)만 제거합니다.
+                - 부동산 가격이나 면적 등 맥락상 의미 있는 숫자, 브랜드명, 주소 내 영문 표기 등은 그대로 두세요.
+                - 오타 및 맥락상 어색한 단어 명백한 오타나 맞춤법 오류라면 최소한으로 수정하되, 원문의 의미를 절대 바꾸지 마세요.
+                - 정확한 오류인지 애매하면 원문 그대로 둡니다.
+                
+                5. 문장 가독성 개선
+                - 문장의 가독성을 높이기 위해 최소한의 쉼표, 마침표 등 문장부호를 추가해 주세요.
+                - 불필요한 어미나 접속어는 그대로 두고, 문장 구조 자체는 가능한 그대로 유지합니다.
+                - 문장을 인식해서 하나의 문장이 끝날 때마다 줄바꿈을 수행합니다.
+
+                6. 최종 출력물 형태
+                - 최종 출력물은 다음과 같은 형태가 되어야 합니다:
+
+                (원문 내용 중 문장1) \n
+                (원문 내용 중 문장2) \n
+                (원문 내용 중 문장3) \n
+                ...
+
+                위의 지침을 바탕으로, 가능한 한 원문의 모든 내용을 그대로 살리되, 확실히 불필요한 반복이나 명백한 철자 오류, 리스트에 포함된 부동산 이름 교정 정도만 수행해 주세요.
+                가장 중요한 것은 과잉 수정이나 삭제 없이, 원문에 최대한 가깝게 유지하는 것입니다.
+                ---
+                통화 녹취록:
+                {transcribed_text}
+                """
+
+
+def cache_collection(client):
+    return client[settings.WORK_MONGODB_DB].refinement_cache
+
+
+def stats_collection(client):
+    return client[settings.WORK_MONGODB_DB].cache_stats
+
+
+def ensure_cache_indexes(cache) -> None:
+    try:
+        cache.create_index("last_accessed", name="last_accessed_ttl",
+                           expireAfterSeconds=settings.REFINEMENT_CACHE_TTL_SEC, background=True)
+    except PyMongoError as e:
+        logger.warning(f"보정 캐시 인덱스 생성 실패: {e}")
+
+
+def cache_key(transcribed_text: str, model: str, prompt_version: Optional[str] = None) -> str:
+    digest = hashlib.sha256()
+    for part in (prompt_version or PROMPT_VERSION, model, transcribed_text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _lookup(cache, key: str) -> Optional[str]:
+    try:
+        doc = cache.find_one_and_update(
+            {"_id": key},
+            {"$set": {"last_accessed": datetime.now(UTC)}, "$inc": {"hits": 1}},
+            projection={"refined": 1},
+        )
+    except PyMongoError as e:
+        # 캐시 장애 시에는 미스로 보고 GPT 를 호출
+        logger.warning(f"보정 캐시 조회 실패: {e}")
+        return None
+    return doc["refined"] if doc else None
+
+
+def _store(cache, key: str, model: str, refined: str) -> None:
+    now = datetime.now(UTC)
+    try:
+        cache.update_one(
+            {"_id": key},
+            {"$set": {"refined": refined, "last_accessed": now},
+             "$setOnInsert": {"model": model, "prompt_version": PROMPT_VERSION, "created_at": now, "hits": 0}},
+            upsert=True,
+        )
+    except PyMongoError as e:
+        logger.warning(f"보정 캐시 기록 실패: {e}")
+
+
+def _count(stats, name: str) -> None:
+    with _counters_lock:
+        counters[name] += 1
+    # 지표는 파이프라인 이벤트 로그(버퍼/스풀)를 거치지 않고 바로 $inc 한다 - 지연/스풀 재기록으로 인한 중복이 없다.
+    # 응답을 기다리지 않는 w=0 쓰기라 보정 경로를 늦추지 않는다
+    try:
+        stats.with_options(write_concern=WriteConcern(w=0)).update_one(
+            {"_id": STATS_ID}, {"$inc": {name: 1}, "$set": {"updated_at": datetime.now(UTC)}}, upsert=True)
+    except PyMongoError as e:
+        logger.warning(f"보정 캐시 통계 기록 실패: {e}")
+
+
+def _complete(openai_client, model: str, prompt: str) -> str:
+    completion = openai_client.chat.completions.create(
+        model=model,
+        messages=[{"role": "system", "content": prompt}],
+    )
+    return completion.choices[0].message.content
+
+
+def _cached_complete(openai_client, client, key_text: str, prompt: str, job_id: str = None,
+                     prompt_version: Optional[str] = None) -> str:
+    """캐시에 결과가 있으면 재사용하고, 없으면 GPT 를 호출해 결과를 캐시에 기록한다."""
+    model = settings.REFINEMENT_MODEL
+    if not settings.REFINEMENT_CACHE_ENABLED:
+        return _complete(openai_client, model, prompt)
+
+    cache = cache_collection(client)
+    stats = stats_collection(client)
+    key = cache_key(key_text, model, prompt_version)
+    refined = _lookup(cache, key)
+    if refined is not None:
+        _count(stats, "hits")
+        logger.info(f"Job {job_id}: 보정 캐시 적중, GPT 호출 생략 (key={key[:12]})")
+        return refined
+
+    _count(stats, "misses")
+    refined = _complete(openai_client, model, prompt)
+    _store(cache, key, model, refined)
+    return refined
+
+
+def refine_transcript(openai_client, client, transcribed_text: str, job_id: str = None) -> str:
+    """
+    Whisper 원문 전사를 GPT 로 보정한다.
+    (원문, PROMPT_VERSION, 모델) 이 같은 결과가 캐시에 있으면 GPT 를 호출하지 않고 재사용한다.
+    """
+    return _cached_complete(openai_client, client, transcribed_text, build_prompt(transcribed_text), job_id)
+
+
+def split_segments(chunk_texts: Sequence[str], max_chars: int, context_chars: int) -> List[Tuple[str, str, str]]:
+    """
+    청크별 전사를 청크 경계에서 max_chars 이하의 구간으로 묶는다 (한 청크가 더 길면 그 청크 하나가 한 구간).
+    구간마다 (앞 문맥, 본문, 뒤 문맥) 을 반환하며, 문맥은 이웃 구간의 끝/처음 context_chars 글자다.
+    문맥은 보정 참고용으로만 주고 출력에는 본문만 나오므로, 구간 결과를 순서대로 이어 붙이면 중복 없이 전체가 된다.
+    """
+    bodies: List[str] = []
+    current: List[str] = []
+    length = 0
+    for text in (t.strip() for t in chunk_texts):
+        if not text:
+            continue
+        if current and length + 1 + len(text) > max_chars:
+            bodies.append(" ".join(current))
+            current, length = [], 0
+        current.append(text)
+        length += len(text) + (1 if length else 0)
+    if current:
+        bodies.append(" ".join(current))
+
+    segments = []
+    for index, body in enumerate(bodies):
+        before = bodies[index - 1][-context_chars:] if index > 0 and context_chars > 0 else ""
+        after = bodies[index + 1][:context_chars] if index + 1 < len(bodies) and context_chars > 0 else ""
+        segments.append((before, body, after))
+    return segments
+
+
+def build_segment_prompt(body: str, before: str, after: str) -> str:
+    return build_prompt(body) + f"""
+                ---
+                이 녹취록은 긴 통화의 일부 구간입니다. 아래 앞/뒤 문맥은 이름이나 용어를 판단할 때만 참고하고,
+                출력에는 절대 포함하지 마세요. 위 '통화 녹취록' 구간의 내용만 출력하세요.
+                [앞 문맥]
+                {before or "(없음 - 통화의 시작)"}
+                [뒤 문맥]
+                {after or "(없음 - 통화의 끝)"}
+                """
+
+
+def refine_chunks(openai_client, client, chunk_texts: Sequence[str], job_id: str = None) -> str:
+    """
+    청크별 전사를 보정한다.
+    REFINEMENT_MODE 가 segmented 이거나, auto 이고 전체 길이가 REFINEMENT_SEGMENT_CHARS 를 넘으면
+    청크 경계에서 나눈 구간들을 REFINEMENT_MAX_CONCURRENCY 개까지 동시에 보정하고 원래 순서대로 잇는다.
+    이 경우 보정 지연은 통화 전체 길이가 아니라 가장 느린 구간에 좌우된다. 그 외에는 전체를 한 번에 보정한다.
+    """
+    transcribed_text = " ".join(chunk_texts)
+    mode = settings.REFINEMENT_MODE
+    if mode == "single" or (mode == "auto" and len(transcribed_text) <= settings.REFINEMENT_SEGMENT_CHARS):
+        return refine_transcript(openai_client, client, transcribed_text, job_id)
+
+    segments = split_segments(chunk_texts, settings.REFINEMENT_SEGMENT_CHARS, settings.REFINEMENT_CONTEXT_CHARS)
+    if len(segments) <= 1:
+        return refine_transcript(openai_client, client, transcribed_text, job_id)
+    logger.info(f"Job {job_id}: 보정을 {len(segments)}개 구간으로 나눠 최대 {settings.REFINEMENT_MAX_CONCURRENCY}개씩 동시 처리")
+
+    def refine_segment(segment: Tuple[str, str, str]) -> str:
+        return _refine_segment(openai_client, client, segment, job_id)
+
+    # executor.map 은 입력 순서대로 결과를 돌려주므로 완료 순서와 관계없이 결과가 같다
+    with ThreadPoolExecutor(max_workers=max(1, min(settings.REFINEMENT_MAX_CONCURRENCY, len(segments))),
+                            thread_name_prefix=f"refine-{job_id}") as executor:
+        refined = list(executor.map(refine_segment, segments))
+    return "\n".join(part.strip() for part in refined)
+
+
+def ready_segments(chunk_texts: Sequence[str], max_chars: int, context_chars: int) -> List[Tuple[str, str, str]]:
+    """
+    앞에서부터 이어서 끝난 청크들(chunk_texts)만으로 입력이 확정된 구간들을 반환한다.
+    split_segments 는 앞에서부터 채워 나가므로 다음 구간이 시작되면 앞 구간의 본문은 바뀌지 않고,
+    다음 구간 본문이 context_chars 이상이면(또는 그 다음 구간까지 시작되면) 뒤 문맥도 바뀌지 않는다.
+    따라서 여기서 반환한 구간은 전체 전사로 split_segments 를 한 결과의 앞부분과 같다.
+    """
+    segments = split_segments(chunk_texts, max_chars, context_chars)
+    ready = []
+    for index, segment in enumerate(segments[:-1]):
+        if index + 2 < len(segments) or len(segments[index + 1][1]) >= context_chars:
+            ready.append(segment)
+        else:
+            break
+    return ready
+
+
+def _refine_segment(openai_client, client, segment: Tuple[str, str, str], job_id: str = None) -> str:
+    before, body, after = segment
+    return _cached_complete(openai_client, client, "\0".join(segment), build_segment_prompt(body, before, after),
+                            job_id, prompt_version=f"{PROMPT_VERSION}-segment")
+
+
+async def _transcribe_and_refine(openai_client, client, total: int, transcribe: Callable,
+                                 completed: Mapping[int, str], job_id: str = None) -> Tuple[List[str], str]:
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def on_text(index: int, text: str) -> None:
+        # 디스패처 스레드에서 호출 - 이벤트 루프 스레드로 넘겨 큐에 넣는다
+        # (전사가 실패한 뒤에도 남은 청크 스레드가 끝나며 호출할 수 있으므로 루프가 닫혔으면 무시)
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(queue.put_nowait, (index, text))
+
+    def produce() -> List[str]:
+        try:
+            return transcribe(on_text)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    for index, text in completed.items():
+        queue.put_nowait((index, text))
+    producer = loop.run_in_executor(None, produce)
+
+    max_chars, context_chars = settings.REFINEMENT_SEGMENT_CHARS, settings.REFINEMENT_CONTEXT_CHARS
+    refine_pool = ThreadPoolExecutor(max_workers=max(1, settings.REFINEMENT_MAX_CONCURRENCY),
+                                     thread_name_prefix=f"refine-{job_id}")
+    texts: List[Optional[str]] = [None] * total
+    prefix = 0
+    refining = []
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            index, text = item
+            texts[index] = text
+            while prefix < total and texts[prefix] is not None:
+                prefix += 1
+            # 앞에서부터 이어서 끝난 청크로 확정된 구간은 나머지 청크의 전사를 기다리지 않고 바로 보정 시작
+            for segment in ready_segments(texts[:prefix], max_chars, context_chars)[len(refining):]:
+                logger.info(f"Job {job_id}: 보정 구간 {len(refining) + 1} 시작 (청크 {prefix}/{total} 전사 완료)")
+                refining.append(loop.run_in_executor(refine_pool, _refine_segment, openai_client, client, segment, job_id))
+
+        chunk_texts = await producer
+        segments = split_segments(chunk_texts, max_chars, context_chars)
+        if len(segments) <= 1:
+            # 전체가 한 구간이면 일반 보정과 같다 (캐시 키도 같음)
+            refined = await loop.run_in_executor(refine_pool, refine_transcript, openai_client, client,
+                                                 " ".join(chunk_texts), job_id)
+            return chunk_texts, refined
+        for segment in segments[len(refining):]:
+            refining.append(loop.run_in_executor(refine_pool, _refine_segment, openai_client, client, segment, job_id))
+        refined_parts = await asyncio.gather(*refining)
+        return chunk_texts, "\n".join(part.strip() for part in refined_parts)
+    finally:
+        # 전사가 실패해도 이미 시작한 구간 보정은 끝까지 기다려 캐시에 남긴다 (재시도 시 재사용).
+        # 기다리지 않고 나가면 asyncio.run 이 루프를 닫은 뒤 남은 run_in_executor 콜백이 닫힌 루프에 호출된다
+        if refining:
+            await asyncio.gather(*refining, return_exceptions=True)
+        refine_pool.shutdown(wait=True)
+
+
+def refine_while_transcribing(openai_client, client, total: int, transcribe: Callable,
+                              completed: Optional[Mapping[int, str]] = None,
+                              job_id: str = None) -> Tuple[List[str], str]:
+    """
+    전사(STT)와 보정(GPT)을 겹쳐 실행한다.
+    transcribe(on_text) 는 작업 스레드에서 청크 전사를 수행하며 청크가 끝날 때마다 on_text(index, text) 를 호출하고
+    청크별 전사 목록을 반환해야 한다. on_text 는 asyncio 큐로 전달되고, 소비자는 앞에서부터 이어서 끝난 청크로
+    확정된 구간(ready_segments)의 보정을 바로 시작한다. 구간 나누기/프롬프트/이어 붙이기는 refine_chunks 의 구간
+    보정과 같으므로 결과와 캐시 키도 같다. (청크별 전사 목록, 보정된 전체 텍스트) 를 반환한다.
+    """
+    return asyncio.run(_transcribe_and_refine(openai_client, client, total, transcribe, completed or {}, job_id))
+
+
+def evict_lru(cache, max_entries: Optional[int] = None) -> int:
+    """항목 수가 max_entries 를 넘으면 last_accessed 가 가장 오래된 항목부터 삭제하고 삭제한 개수를 반환한다."""
+    max_entries = settings.REFINEMENT_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+    excess = cache.estimated_document_count() - max_entries
+    if excess <= 0:
+        return 0
+    # last_accessed_ttl 인덱스 순서로 가장 오래된 항목의 _id 만 읽는다
+    stale = [doc["_id"] for doc in cache.find({}, {"_id": 1}).sort("last_accessed", ASCENDING).limit(excess)]
+    deleted = cache.delete_many({"_id": {"$in": stale}}).deleted_count
+    logger.info(f"보정 캐시 LRU 정리: {deleted}건 삭제 (최대 {max_entries}건)")
+    return deleted
+
+
+def cache_stats(client) -> dict:
+    """누적 적중/미스 횟수와 캐시 항목 수 (모든 워커 합계)."""
+    doc = stats_collection(client).find_one({"_id": STATS_ID}) or {}
+    hits, misses = doc.get("hits", 0), doc.get("misses", 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else None,
+        "entries": cache_collection(client).estimated_document_count(),
+        "prompt_version": PROMPT_VERSION,
+        "model": settings.REFINEMENT_MODEL,
+    }
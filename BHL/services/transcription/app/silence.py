@@ -0,0 +1,208 @@
+import logging
+import math
+import os
+
+import numpy as np
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# pydub.silence 와 같은 의미의 (start_ms, end_ms) 구간
+Range = Tuple[int, int]
+
+# 샘플 폭(bytes) -> numpy dtype (audioop.rms 와 같이 부호 있는 정수로 해석)
+_SAMPLE_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+# converter 가 변환된 WAV 옆에 저장하는 1ms 에너지 프로파일 접미사 (converter 서비스와 동일해야 함)
+ENERGY_PROFILE_SUFFIX = ".energy.npy"
+
+# 에너지 계산 시 한 번에 처리할 길이 (ms) - 긴 통화에서도 임시 배열 메모리를 일정하게 유지
+_BLOCK_MS = 60000
+
+
+def pcm_to_samples(raw_data, sample_width: int) -> np.ndarray:
+    """PCM 바이트(bytes/memoryview)를 복사 없이 numpy 샘플 배열로 본다."""
+    dtype = _SAMPLE_DTYPES.get(sample_width)
+    if dtype is None:
+        raise ValueError(f"지원하지 않는 샘플 폭입니다: {sample_width} bytes")
+    return np.frombuffer(raw_data, dtype=dtype)
+
+
+def frame_energy(samples: np.ndarray, frame_rate: int, channels: int = 1) -> np.ndarray:
+    """
+    1ms 프레임 단위 평균 제곱(mean square) 에너지를 한 번의 벡터 연산으로 계산한다.
+    반환 길이는 pydub 의 len(AudioSegment) 와 같은 ms 단위 길이.
+    """
+    if frame_rate < 1000:
+        raise ValueError(f"frame_rate 는 1000Hz 이상이어야 합니다: {frame_rate}")
+    frame_count = len(samples) // channels
+    n_ms = int(round(frame_count * 1000.0 / frame_rate))
+    if n_ms == 0:
+        return np.zeros(0, dtype=np.float64)
+
+    # ms 경계(샘플 인덱스). 마지막 경계는 실제 샘플 수를 넘지 않도록 자른다.
+    bounds = (np.arange(n_ms + 1, dtype=np.int64) * frame_rate // 1000) * channels
+    bounds = np.minimum(bounds, frame_count * channels)
+
+    energy = np.zeros(n_ms, dtype=np.float64)
+    for block_start in range(0, n_ms, _BLOCK_MS):
+        block_end = min(block_start + _BLOCK_MS, n_ms)
+        lo, hi = bounds[block_start], bounds[block_end]
+        if hi <= lo:
+            continue
+        block = samples[lo:hi].astype(np.int64)
+        np.multiply(block, block, out=block)
+        offsets = bounds[block_start:block_end] - lo
+        # 마지막 ms 가 잘려 샘플이 없는 경우(offset == 길이)는 reduceat 에서 제외
+        valid = offsets < len(block)
+        sums = np.add.reduceat(block, offsets[valid])
+        counts = np.diff(np.append(offsets[valid], len(block)))
+        energy[block_start:block_end][valid] = sums / counts
+    return energy
+
+
+def energy_profile_path(wav_path: str) -> str:
+    """{job_id}.wav -> {job_id}.energy.npy"""
+    return os.path.splitext(wav_path)[0] + ENERGY_PROFILE_SUFFIX
+
+
+def load_energy_profile(wav_path: str, expected_ms: int) -> Optional[np.ndarray]:
+    """
+    converter 가 변환 중에 저장한 에너지 프로파일을 읽는다.
+    없거나 길이가 오디오와 맞지 않으면 None 을 반환하여 PCM 에서 다시 계산하도록 한다.
+    """
+    path = energy_profile_path(wav_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        energy = np.load(path, mmap_mode="r")
+    except (OSError, ValueError) as e:
+        logger.warning(f"에너지 프로파일 읽기 실패 ({path}): {e}")
+        return None
+    if energy.ndim != 1 or abs(len(energy) - expected_ms) > 1:
+        logger.warning(f"에너지 프로파일 길이 불일치 ({path}): {len(energy)}ms != {expected_ms}ms")
+        return None
+    return energy
+
+
+def _window_sums(energy: np.ndarray, frame_rate: Optional[int], frame_count: Optional[int]):
+    """
+    창 합 계산용 누적 배열 (누적 에너지, 누적 샘플 수).
+    frame_rate 를 주면 ms 마다 샘플 수로 가중한다 - 44.1kHz 처럼 ms 당 샘플 수가 정수가 아니면(44/45개)
+    ms 평균들의 단순 평균은 pydub 의 창 RMS 와 1ms 어긋날 수 있다. 마지막 ms 가 잘린 경우도 pydub 처럼
+    모자란 샘플을 0 으로 채운 것으로 계산한다. 정수 합으로 누적하므로 긴 통화에서도 오차가 없다.
+    frame_rate 가 없으면 ms 당 샘플 수가 같다고 보고 1ms 평균을 그대로 누적한다.
+    """
+    n_ms = len(energy)
+    if frame_rate is None:
+        return np.concatenate(([0.0], np.cumsum(energy, dtype=np.float64))), None
+    nominal = np.arange(n_ms + 1, dtype=np.int64) * frame_rate // 1000
+    actual = nominal if frame_count is None else np.minimum(nominal, frame_count)
+    sums = np.rint(np.asarray(energy, dtype=np.float64) * np.diff(actual)).astype(np.int64)
+    return np.concatenate(([0], np.cumsum(sums))), nominal
+
+
+def detect_silence(energy: np.ndarray, min_silence_len: int = 1000,
+                   silence_thresh: float = -40, max_amplitude: float = 32768.0,
+                   seek_step: int = 1, frame_rate: Optional[int] = None,
+                   frame_count: Optional[int] = None) -> List[List[int]]:
+    """
+    pydub.silence.detect_silence 와 같은 결과를 1ms 에너지 배열에서 벡터 연산으로 계산한다.
+    길이 min_silence_len 창의 RMS 가 silence_thresh(dBFS) 이하인 구간들을 병합해 반환.
+    frame_rate/frame_count(채널당 프레임 수)를 주면 창을 샘플 수로 가중해 어떤 샘플레이트에서도 pydub 과 같고,
+    주지 않으면 ms 당 샘플 수가 정수(16kHz 등)이고 마지막 ms 가 온전할 때 같다.
+    """
+    seg_len = len(energy)
+    if seg_len < min_silence_len:
+        return []
+
+    # pydub 은 정수로 내림한 RMS(audioop.rms)를 임계값과 비교하므로
+    # floor(sqrt(mean_sq)) <= thresh  <=>  mean_sq < (floor(thresh) + 1)^2
+    thresh = (10 ** (silence_thresh / 20.0)) * max_amplitude
+    limit = (math.floor(thresh) + 1) ** 2
+    cumulative, nominal = _window_sums(energy, frame_rate, frame_count)
+
+    last_slice_start = seg_len - min_silence_len
+    starts = np.arange(0, last_slice_start + 1, seek_step, dtype=np.int64)
+    if last_slice_start % seek_step:
+        starts = np.append(starts, last_slice_start)
+
+    window_sum = cumulative[starts + min_silence_len] - cumulative[starts]
+    if nominal is None:
+        is_silent = window_sum / min_silence_len < limit
+    else:
+        is_silent = window_sum < limit * (nominal[starts + min_silence_len] - nominal[starts])
+    silence_starts = starts[is_silent]
+    if len(silence_starts) == 0:
+        return []
+
+    # 연속되지 않고 창 길이보다 멀리 떨어진 지점에서 새 묵음 구간이 시작된다 (pydub 과 동일한 규칙)
+    gaps = np.diff(silence_starts)
+    breaks = np.nonzero((gaps != seek_step) & (gaps > min_silence_len))[0]
+    range_starts = np.concatenate(([silence_starts[0]], silence_starts[breaks + 1]))
+    range_ends = np.concatenate((silence_starts[breaks], [silence_starts[-1]])) + min_silence_len
+    return [[int(s), int(e)] for s, e in zip(range_starts, range_ends)]
+
+
+def detect_nonsilent(energy: np.ndarray, min_silence_len: int = 1000,
+                     silence_thresh: float = -40, max_amplitude: float = 32768.0,
+                     seek_step: int = 1, frame_rate: Optional[int] = None,
+                     frame_count: Optional[int] = None) -> List[List[int]]:
+    """pydub.silence.detect_nonsilent 와 같은 결과를 반환."""
+    silent_ranges = detect_silence(energy, min_silence_len, silence_thresh, max_amplitude, seek_step,
+                                   frame_rate, frame_count)
+    len_seg = len(energy)
+
+    if not silent_ranges:
+        return [[0, len_seg]]
+    if silent_ranges[0][0] == 0 and silent_ranges[0][1] == len_seg:
+        return []
+
+    prev_end_i = 0
+    nonsilent_ranges = []
+    for start_i, end_i in silent_ranges:
+        nonsilent_ranges.append([prev_end_i, start_i])
+        prev_end_i = end_i
+    if end_i != len_seg:
+        nonsilent_ranges.append([prev_end_i, len_seg])
+    if nonsilent_ranges[0] == [0, 0]:
+        nonsilent_ranges.pop(0)
+    return nonsilent_ranges
+
+
+def split_ranges(energy: np.ndarray, min_silence_len: int = 1000,
+                 silence_thresh: float = -40, keep_silence=100,
+                 max_amplitude: float = 32768.0, seek_step: int = 1,
+                 frame_rate: Optional[int] = None, frame_count: Optional[int] = None) -> List[Range]:
+    """
+    pydub.silence.split_on_silence 가 잘라낼 구간을 (start_ms, end_ms) 로 반환한다.
+    오디오를 실제로 자르지 않으므로 기존 병합 로직(59,999ms)에 구간 그대로 넘길 수 있다.
+    """
+    if isinstance(keep_silence, bool):
+        keep_silence = len(energy) if keep_silence else 0
+
+    output_ranges = [
+        [start - keep_silence, end + keep_silence]
+        for (start, end) in detect_nonsilent(energy, min_silence_len, silence_thresh, max_amplitude, seek_step,
+                                             frame_rate, frame_count)
+    ]
+    for range_i, range_ii in zip(output_ranges, output_ranges[1:]):
+        last_end = range_i[1]
+        next_start = range_ii[0]
+        if next_start < last_end:
+            range_i[1] = (last_end + next_start) // 2
+            range_ii[0] = range_i[1]
+
+    len_seg = len(energy)
+    return [(max(start, 0), min(end, len_seg)) for start, end in output_ranges]
+
+
+def split_segment_ranges(audio, min_silence_len: int = 1000, silence_thresh: float = -40,
+                         keep_silence=100, seek_step: int = 1) -> List[Range]:
+    """AudioSegment(또는 같은 속성을 가진 PcmSource)의 PCM 을 복사 없이 읽어 split_ranges 를 수행한다."""
+    samples = pcm_to_samples(audio.raw_data, audio.sample_width)
+    energy = frame_energy(samples, audio.frame_rate, audio.channels)
+    return split_ranges(energy, min_silence_len, silence_thresh, keep_silence,
+                        float(audio.max_possible_amplitude), seek_step,
+                        audio.frame_rate, len(samples) // audio.channels)
+
@@ -0,0 +1,317 @@
+import importlib.util
+import logging
+import os
+from abc import ABC, abstractmethod
+import threading
+import time
+from typing import BinaryIO, Dict, List, Optional, Sequence, Union
+
+import requests
+from openai import OpenAI, RateLimitError
+
+from .config import settings
+from .dispatcher import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# 전사(STT) 백엔드
+#   cloudflare - Cloudflare Workers AI Whisper (원격, 기본값)
+#   openai     - OpenAI Whisper API (원격)
+#   local      - faster-whisper (CTranslate2, CPU int8). 모델은 워커 프로세스당 한 번만 읽는다.
+# STT_BACKEND 가 기본 백엔드이고, STT_FALLBACK_BACKENDS 의 백엔드들은 앞 백엔드가 요청 한도(429)에 걸렸을 때
+# STT_QUOTA_COOLDOWN_SEC 동안 대신 쓴다 (예: 원격 할당량이 떨어지면 로컬 CPU 로 넘김).
+# 요청 속도 제한(STT_RATE_LIMIT_*)은 원격 백엔드마다 따로 건다 - 로컬 백엔드로 넘긴 요청은 원격 할당량에 묶이지 않는다.
+
+Audio = Union[str, BinaryIO]
+
+
+class SttQuotaExceeded(RuntimeError):
+    """백엔드의 요청 한도/할당량 초과 (HTTP 429). 대체 백엔드가 있으면 그쪽으로 넘긴다."""
+
+
+def remote_rate_limiter() -> TokenBucket:
+    """원격 백엔드 하나의 요청 속도 제한 (워커 프로세스 안의 모든 청크 스레드가 공유)."""
+    return TokenBucket(settings.STT_RATE_LIMIT_PER_SEC, settings.STT_RATE_LIMIT_BURST)
+
+
+class SttBackend(ABC):
+    name = ""
+
+    @abstractmethod
+    def transcribe(self, audio: Audio) -> str:
+        """오디오(파일 경로 또는 WAV 가 인코딩된 메모리 버퍼)를 텍스트로 변환한다."""
+
+    def warm_up(self) -> None:
+        """워커 프로세스 시작 시 호출 (모델 로딩 등)."""
+
+
+class CloudflareWhisperBackend(SttBackend):
+    name = "cloudflare"
+
+    def __init__(self, account_id: Optional[str] = None, api_token: Optional[str] = None):
+        self.account_id = account_id or os.getenv("CLOUDFLARE_ACCOUNT_ID")
+        self.api_token = api_token or os.getenv("CLOUDFLARE_API_TOKEN")
+        if not (self.account_id and self.api_token):
+            raise ValueError("CLOUDFLARE_ACCOUNT_ID 또는 CLOUDFLARE_API_TOKEN이 설정되지 않았습니다")
+        self.rate_limiter = remote_rate_limiter()
+
+    def transcribe(self, audio: Audio) -> str:
+        """
+        오디오(파일 경로 또는 WAV 가 인코딩된 메모리 버퍼)를 Cloudflare Workers AI Whisper 모델로 전송 후 텍스트를 반환.
+        버퍼는 통째로 bytes 로 복사하지 않고 요청 본문으로 그대로 스트리밍한다.
+        오류 발생 시 구체적인 로깅 및 RuntimeError 발생.
+        """
+        url = (
+            f"https://api.cloudflare.com/client/v4/accounts/"
+            f"{self.account_id}/ai/run/@cf/openai/whisper" # 모델 버전 명시 제거 (최신 사용 권장) 또는 확인 후 명시
+            # 모델명 확인 필요: '@cf/openai/whisper' 또는 '@cf/openai/whisper-large-v3' 등
+            # 이전 코드: @cf/openai/whisper-large-v3-turbo (turbo가 붙는지 확인 필요)
+        )
+        # Cloudflare API 타임아웃: 필요시 조정
+        timeout_seconds = 180
+        self.rate_limiter.acquire()
+
+        try:
+            headers = {
+                "Authorization": f"Bearer {self.api_token}",
+                # Content-Type은 requests가 바이너리 데이터 전송 시 자동으로 설정하므로 명시 불필요
+                # "Content-Type": "application/octet-stream" (필요시 명시 가능)
+            }
+
+            logger.debug(f"Cloudflare API 요청 시작: {url}")
+            if isinstance(audio, str):
+                with open(audio, "rb") as f:
+                    response = requests.post(url, headers=headers, data=f, timeout=timeout_seconds)
+            else:
+                response = requests.post(url, headers=headers, data=audio, timeout=timeout_seconds)
+            logger.debug(f"Cloudflare API 응답 수신: Status={response.status_code}")
+
+            # === HTTP 상태 코드 확인 ===
+            response.raise_for_status() # 200 OK가 아니면 HTTPError 발생
+
+            # === 응답 JSON 파싱 및 결과 추출 ===
+            try:
+                result_json = response.json()
+                # Cloudflare 응답 구조 확인 필요: 'result' 객체 안에 'text'가 있는지, 또는 최상위에 있는지
+                if isinstance(result_json.get("result"), dict) and "text" in result_json["result"]:
+                    transcribed_text = result_json["result"]["text"]
+                elif "text" in result_json: # 최상위 'text' 필드 확인 (이전 코드 방식)
+                    transcribed_text = result_json["text"]
+                else:
+                    # 예상치 못한 JSON 구조
+                    error_msg = f"Cloudflare 응답 JSON 형식 오류: 'text' 필드를 찾을 수 없음. 응답: {response.text[:500]}..." # 전체 응답 로깅은 너무 길 수 있음
+                    logger.error(error_msg)
+                    raise RuntimeError(error_msg)
+
+                if transcribed_text is None: # text 필드는 있으나 값이 null인 경우
+                     logger.warning(f"Cloudflare API가 null 텍스트를 반환했습니다. 빈 문자열로 처리합니다. 응답: {response.text[:200]}")
+                     return ""
+                return str(transcribed_text) # 명시적으로 문자열 변환
+
+            except requests.exceptions.JSONDecodeError as json_err:
+                # 응답이 유효한 JSON이 아닌 경우
+                error_msg = f"Cloudflare API 응답 JSON 파싱 실패: {json_err}. 응답 내용 (일부): {response.text[:500]}..."
+                logger.error(error_msg)
+                raise RuntimeError(error_msg) from json_err
+
+        # === requests 라이브러리 관련 예외 처리 ===
+        except requests.exceptions.HTTPError as http_err:
+            # 4xx (클라이언트 오류), 5xx (서버 오류) 등 처리
+            error_msg = f"Cloudflare API HTTP 오류 발생: {http_err}. 응답: {http_err.response.text[:500]}..."
+            logger.error(error_msg)
+            # 429 (요청 한도 초과) 는 대체 백엔드로 넘기도록 구분 (SttRouter)
+            if http_err.response.status_code == 429:
+                raise SttQuotaExceeded(error_msg) from http_err
+            raise RuntimeError(error_msg) from http_err # 상위 except 블록에서 잡도록 Runtime Error 발생
+
+        except requests.exceptions.Timeout:
+            # 타임아웃 발생
+            error_msg = f"Cloudflare API 요청 시간 초과 ({timeout_seconds}초)"
+            logger.error(error_msg)
+            raise RuntimeError(error_msg) # Celery 재시도 유도
+
+        except requests.exceptions.ConnectionError as conn_err:
+            # 네트워크 연결 오류
+            error_msg = f"Cloudflare API 연결 오류: {conn_err}"
+            logger.error(error_msg)
+            raise RuntimeError(error_msg) from conn_err # Celery 재시도 유도
+
+        except requests.exceptions.RequestException as req_err:
+            # 기타 requests 관련 예외 (상위 예외 클래스)
+            error_msg = f"Cloudflare API 요청 중 알 수 없는 오류 발생: {req_err}"
+            logger.error(error_msg)
+            raise RuntimeError(error_msg) from req_err # Celery 재시도 유도
+
+        # === 파일 처리 등 기타 예외 ===
+        except IOError as io_err:
+            # 파일 읽기 오류
+            error_msg = f"오디오 읽기 오류 ({audio if isinstance(audio, str) else 'memory buffer'}): {io_err}"
+            logger.error(error_msg)
+            # 파일 오류는 재시도해도 해결되지 않을 가능성이 높음 (상위에서 FileNotFoundError와 유사하게 처리될 수 있음)
+            raise RuntimeError(error_msg) from io_err
+        except Exception as e:
+            # 예상치 못한 모든 기타 오류
+            error_msg = f"Cloudflare 처리 중 예상치 못한 내부 오류: {e}"
+            logger.error(error_msg, exc_info=True) # 상세 스택 트레이스 로깅
+            raise RuntimeError(error_msg) from e # 원본 예외 첨부
+
+
+class OpenAIWhisperBackend(SttBackend):
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY 환경 변수가 설정되지 않았습니다")
+        self.client = OpenAI(api_key=api_key, timeout=180)
+        self.model = model or settings.OPENAI_WHISPER_MODEL
+        self.rate_limiter = remote_rate_limiter()
+
+    def transcribe(self, audio: Audio) -> str:
+        self.rate_limiter.acquire()
+        try:
+            if isinstance(audio, str):
+                with open(audio, "rb") as f:
+                    result = self.client.audio.transcriptions.create(
+                        model=self.model, file=f, language=settings.STT_LANGUAGE)
+            else:
+                result = self.client.audio.transcriptions.create(
+                    model=self.model, file=("chunk.wav", audio, "audio/wav"), language=settings.STT_LANGUAGE)
+        except RateLimitError as e:
+            raise SttQuotaExceeded(f"OpenAI Whisper API 요청 한도 초과: {e}") from e
+        except Exception as e:
+            error_msg = f"OpenAI Whisper API 오류: {e}"
+            logger.error(error_msg)
+            raise RuntimeError(error_msg) from e
+        return result.text or ""
+
+
+LOCAL_STT_MISSING = ("local STT 백엔드를 쓰려면 faster-whisper 패키지가 필요합니다 "
+                     "(INSTALL_LOCAL_STT=true 로 이미지를 빌드하거나 requirements-local-stt.txt 설치)")
+
+# 워커 프로세스 단위 faster-whisper 모델 ((모델, compute_type) -> WhisperModel)
+_local_models: Dict[tuple, object] = {}
+_local_models_lock = threading.Lock()
+
+
+def load_local_model(model_size: str, compute_type: str):
+    """faster-whisper 모델을 프로세스당 한 번만 읽는다 (청크 스레드들이 같은 모델을 공유)."""
+    key = (model_size, compute_type)
+    with _local_models_lock:
+        model = _local_models.get(key)
+        if model is None:
+            try:
+                from faster_whisper import WhisperModel
+            except ImportError as e:
+                raise RuntimeError(LOCAL_STT_MISSING) from e
+            start = time.perf_counter()
+            model = WhisperModel(
+                model_size,
+                device="cpu",
+                compute_type=compute_type,
+                cpu_threads=settings.LOCAL_WHISPER_CPU_THREADS,
+                num_workers=max(1, settings.STT_MAX_CONCURRENCY),
+                download_root=settings.LOCAL_WHISPER_DOWNLOAD_ROOT,
+            )
+            _local_models[key] = model
+            logger.info(f"faster-whisper 모델 로드 완료: {model_size} ({compute_type}), "
+                        f"{time.perf_counter() - start:.1f}초")
+        return model
+
+
+class LocalWhisperBackend(SttBackend):
+    name = "local"
+
+    def __init__(self, model_size: Optional[str] = None, compute_type: Optional[str] = None):
+        # 패키지가 없는 이미지에서 local 을 설정했으면 첫 청크가 아니라 워커 시작 시 바로 실패시킨다
+        if importlib.util.find_spec("faster_whisper") is None:
+            raise ValueError(LOCAL_STT_MISSING)
+        self.model_size = model_size or settings.LOCAL_WHISPER_MODEL
+        self.compute_type = compute_type or settings.LOCAL_WHISPER_COMPUTE_TYPE
+
+    def warm_up(self) -> None:
+        load_local_model(self.model_size, self.compute_type)
+
+    def transcribe(self, audio: Audio) -> str:
+        model = load_local_model(self.model_size, self.compute_type)
+        try:
+            # segments 는 제너레이터이므로 순회하는 동안 실제 디코딩이 일어난다
+            segments, _ = model.transcribe(audio, language=settings.STT_LANGUAGE,
+                                           beam_size=settings.LOCAL_WHISPER_BEAM_SIZE)
+            return " ".join(segment.text.strip() for segment in segments).strip()
+        except Exception as e:
+            error_msg = f"faster-whisper 변환 오류: {e}"
+            logger.error(error_msg)
+            raise RuntimeError(error_msg) from e
+
+
+BACKENDS = {
+    CloudflareWhisperBackend.name: CloudflareWhisperBackend,
+    OpenAIWhisperBackend.name: OpenAIWhisperBackend,
+    LocalWhisperBackend.name: LocalWhisperBackend,
+}
+
+
+def create_backend(name: str) -> SttBackend:
+    try:
+        backend_cls = BACKENDS[name.strip().lower()]
+    except KeyError:
+        raise ValueError(f"알 수 없는 STT 백엔드: {name} (사용 가능: {', '.join(BACKENDS)})") from None
+    return backend_cls()
+
+
+class SttRouter(SttBackend):
+    """
+    백엔드들을 순서대로 시도한다. 요청 한도(SttQuotaExceeded)에 걸린 백엔드는 cooldown 초 동안 건너뛰고
+    다음 백엔드로 넘긴다. 그 외 오류는 그대로 올려 청크 재시도(dispatch_chunks)에 맡긴다.
+    """
+
+    def __init__(self, backends: Sequence[SttBackend], cooldown: float = 60.0):
+        if not backends:
+            raise ValueError("STT 백엔드가 하나 이상 필요합니다")
+        self.backends: List[SttBackend] = list(backends)
+        self.cooldown = cooldown
+        self.name = "+".join(backend.name for backend in self.backends)
+        self.calls: Dict[str, int] = {backend.name: 0 for backend in self.backends}
+        self._blocked_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _available(self) -> List[SttBackend]:
+        now = time.monotonic()
+        with self._lock:
+            available = [b for b in self.backends if self._blocked_until.get(b.name, 0.0) <= now]
+        # 모두 한도에 걸렸으면 마지막 백엔드로 시도 (실패하면 청크 재시도 백오프)
+        return available or self.backends[-1:]
+
+    def transcribe(self, audio: Audio) -> str:
+        candidates = self._available()
+        for position, backend in enumerate(candidates):
+            if not isinstance(audio, str):
+                audio.seek(0)  # 앞 백엔드가 읽은 버퍼를 처음부터 다시 보냄
+            try:
+                text = backend.transcribe(audio)
+            except SttQuotaExceeded as e:
+                with self._lock:
+                    self._blocked_until[backend.name] = time.monotonic() + self.cooldown
+                if position + 1 == len(candidates):
+                    raise
+                logger.warning(f"STT 백엔드 {backend.name} 요청 한도 초과, {self.cooldown:.0f}초 동안 "
+                               f"{candidates[position + 1].name} 사용: {e}")
+                continue
+            with self._lock:
+                self.calls[backend.name] += 1
+            return text
+        raise RuntimeError("사용 가능한 STT 백엔드가 없습니다")
+
+    def warm_up(self) -> None:
+        for backend in self.backends:
+            backend.warm_up()
+
+
+def build_stt_backend() -> SttBackend:
+    """STT_BACKEND / STT_FALLBACK_BACKENDS 설정으로 백엔드를 만든다 (대체 백엔드가 없으면 기본 백엔드 그대로)."""
+    names = [settings.STT_BACKEND] + [name for name in settings.STT_FALLBACK_BACKENDS.split(",") if name.strip()]
+    backends = [create_backend(name) for name in names]
+    if len(backends) == 1:
+        return backends[0]
+    return SttRouter(backends, cooldown=settings.STT_QUOTA_COOLDOWN_SEC)
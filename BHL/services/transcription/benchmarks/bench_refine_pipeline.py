@@ -0,0 +1,72 @@
+"""
+전사 -> 보정 지연 벤치마크: 전사를 모두 끝낸 뒤 구간 보정(refine_chunks) vs 전사와 겹친 보정(refine_while_transcribing).
+
+Cloudflare Whisper / GPT 호출은 지정한 지연만큼 기다리는 가짜 클라이언트로 대신하므로 네트워크와 API 키가 필요 없다.
+청크 수, 청크당 글자 수, 각 단계의 지연을 바꿔 가며 두 방식의 전체 지연과 결과 일치 여부를 비교한다.
+
+사용법 (transcription 서비스 디렉토리에서):
+    python -m benchmarks.bench_refine_pipeline
+    python -m benchmarks.bench_refine_pipeline --chunks 60 --stt-sec 3 --llm-sec-per-kchar 4
+"""
+import argparse
+import time
+
+from app.config import settings
+from app.dispatcher import dispatch_chunks
+from app.refinement import refine_chunks, refine_while_transcribing
+
+
+class FakeOpenAI:
+    """프롬프트 길이에 비례해 기다린 뒤 '통화 녹취록' 본문을 그대로 돌려주는 가짜 클라이언트."""
+
+    def __init__(self, sec_per_kchar: float):
+        self.sec_per_kchar = sec_per_kchar
+        self.chat = self
+        self.completions = self
+
+    def create(self, model, messages):
+        prompt = messages[0]["content"]
+        body = prompt.split("통화 녹취록:")[1].split("---")[0].strip()
+        time.sleep(len(body) / 1000 * self.sec_per_kchar)
+        message = type("Message", (), {"content": body})()
+        return type("Completion", (), {"choices": [type("Choice", (), {"message": message})()]})()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=40, help="청크 수 (약 1분 단위)")
+    parser.add_argument("--chars", type=int, default=400, help="청크당 전사 글자 수")
+    parser.add_argument("--stt-sec", type=float, default=1.0, help="청크당 STT 지연 (초)")
+    parser.add_argument("--llm-sec-per-kchar", type=float, default=1.0, help="보정 지연 (1000자당 초)")
+    args = parser.parse_args()
+
+    # 캐시를 끄면 두 방식 모두 매번 GPT 를 호출하고 MongoDB 에 접근하지 않는다
+    settings.REFINEMENT_CACHE_ENABLED = False
+    client = None
+    openai_client = FakeOpenAI(args.llm_sec_per_kchar)
+    texts = [f"[{index:03d}] " + "가" * args.chars for index in range(args.chunks)]
+
+    def transcribe(on_text=None):
+        def stt(index, _):
+            time.sleep(args.stt_sec)
+            return texts[index]
+        return dispatch_chunks(list(range(args.chunks)), stt, max_concurrency=settings.STT_MAX_CONCURRENCY,
+                               on_result=(lambda index, _, text: on_text(index, text)) if on_text else None)
+
+    print(f"청크 {args.chunks}개 x {args.chars}자, STT 동시 {settings.STT_MAX_CONCURRENCY}개, "
+          f"보정 구간 {settings.REFINEMENT_SEGMENT_CHARS}자 / 동시 {settings.REFINEMENT_MAX_CONCURRENCY}개")
+
+    start = time.perf_counter()
+    sequential = refine_chunks(openai_client, client, transcribe(), "bench")
+    sequential_sec = time.perf_counter() - start
+    print(f"전사 후 보정 : {sequential_sec:8.2f}초")
+
+    start = time.perf_counter()
+    _, pipelined = refine_while_transcribing(openai_client, client, args.chunks, transcribe, job_id="bench")
+    pipelined_sec = time.perf_counter() - start
+    print(f"겹친 보정    : {pipelined_sec:8.2f}초")
+    print(f"지연 감소: {sequential_sec - pipelined_sec:.2f}초 ({sequential_sec / pipelined_sec:.2f}배), 결과 일치: {sequential == pipelined}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+묵음 분할 벤치마크: pydub.silence.split_on_silence vs app.silence (NumPy).
+
+사용법 (transcription 서비스 디렉토리에서):
+    python -m benchmarks.bench_silence                      # 합성 통화 10분
+    python -m benchmarks.bench_silence --minutes 40
+    python -m benchmarks.bench_silence --file ../../test_audio.m4a
+"""
+import argparse
+import time
+
+import numpy as np
+from pydub import AudioSegment
+from pydub.silence import detect_nonsilent
+
+from app.silence import frame_energy, pcm_to_samples, split_ranges, detect_nonsilent as np_detect_nonsilent
+
+MIN_SILENCE_LEN = 1000
+SILENCE_THRESH = -40
+KEEP_SILENCE = 500
+
+
+def synthetic_call(minutes: float, frame_rate: int = 16000, seed: int = 0) -> AudioSegment:
+    """발화(잡음 버스트)와 묵음이 번갈아 나오는 16kHz 모노 PCM 을 만든다."""
+    rng = np.random.default_rng(seed)
+    total = int(minutes * 60 * frame_rate)
+    samples = (rng.normal(0, 30, total)).astype(np.int16)  # 배경 잡음 (약 -60 dBFS)
+    pos = 0
+    while pos < total:
+        speech = int(rng.uniform(0.5, 8.0) * frame_rate)
+        pause = int(rng.uniform(0.2, 2.5) * frame_rate)
+        end = min(pos + speech, total)
+        samples[pos:end] = rng.normal(0, 4000, end - pos).astype(np.int16)
+        pos = end + pause
+    return AudioSegment(samples.tobytes(), frame_rate=frame_rate, sample_width=2, channels=1)
+
+
+def pydub_ranges(audio: AudioSegment):
+    return detect_nonsilent(audio, min_silence_len=MIN_SILENCE_LEN, silence_thresh=SILENCE_THRESH)
+
+
+def numpy_ranges(audio: AudioSegment):
+    samples = pcm_to_samples(audio.raw_data, audio.sample_width)
+    energy = frame_energy(samples, audio.frame_rate, audio.channels)
+    return np_detect_nonsilent(energy, MIN_SILENCE_LEN, SILENCE_THRESH, float(audio.max_possible_amplitude),
+                               frame_rate=audio.frame_rate, frame_count=int(audio.frame_count()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", help="측정할 오디오 파일 (없으면 합성 오디오 사용)")
+    parser.add_argument("--minutes", type=float, default=10.0, help="합성 오디오 길이 (분)")
+    parser.add_argument("--skip-pydub", action="store_true", help="pydub 측정 생략 (긴 오디오용)")
+    args = parser.parse_args()
+
+    if args.file:
+        audio = AudioSegment.from_file(args.file).set_channels(1).set_frame_rate(16000)
+    else:
+        audio = synthetic_call(args.minutes)
+    print(f"오디오 길이: {len(audio) / 1000:.1f}초, {audio.frame_rate}Hz, {audio.channels}ch")
+
+    start = time.perf_counter()
+    ours = numpy_ranges(audio)
+    numpy_sec = time.perf_counter() - start
+    print(f"numpy : {numpy_sec:8.3f}초, 발화 구간 {len(ours)}개")
+
+    if not args.skip_pydub:
+        start = time.perf_counter()
+        theirs = pydub_ranges(audio)
+        pydub_sec = time.perf_counter() - start
+        print(f"pydub : {pydub_sec:8.3f}초, 발화 구간 {len(theirs)}개")
+        print(f"속도 향상: {pydub_sec / numpy_sec:.1f}배")
+        max_diff = max((abs(a - b) for r1, r2 in zip(ours, theirs) for a, b in zip(r1, r2)), default=0)
+        print(f"구간 일치: {ours == theirs} (구간 수 차이 {len(ours) - len(theirs)}, 최대 경계 차이 {max_diff}ms)")
+
+    energy = frame_energy(pcm_to_samples(audio.raw_data, audio.sample_width), audio.frame_rate)
+    cut_points = split_ranges(energy, MIN_SILENCE_LEN, SILENCE_THRESH, KEEP_SILENCE)
+    print(f"keep_silence={KEEP_SILENCE} 적용 구간: {len(cut_points)}개")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+STT 백엔드 벤치마크: 같은 오디오를 워커와 같은 방식으로 청크로 나눠 백엔드별 실시간 배율(RTF)과 처리량을 비교한다.
+
+  RTF    = 전사에 걸린 시간 / 오디오 길이 (1 보다 작으면 실시간보다 빠름)
+  처리량 = 오디오 길이 / 전사에 걸린 시간 (초당 처리한 오디오 초)
+local(faster-whisper) 은 모델 로딩 시간을 따로 측정하고, 전사 시간에는 포함하지 않는다 (워커는 프로세스당 한 번 로드).
+백엔드별 자격 증명(CLOUDFLARE_*, OPENAI_API_KEY)이나 패키지(faster-whisper)가 없으면 그 백엔드는 건너뛴다.
+
+사용법 (transcription 서비스 디렉토리에서):
+    python -m benchmarks.bench_stt_backends --backends local
+    python -m benchmarks.bench_stt_backends --backends cloudflare,openai,local --concurrency 4
+    LOCAL_WHISPER_MODEL=medium python -m benchmarks.bench_stt_backends --backends local --max-chunks 5
+"""
+import argparse
+import io
+import os
+import statistics
+import tempfile
+import time
+
+from pydub import AudioSegment
+
+from app.audio_io import PcmSource, encode_intervals_wav
+from app.chunk_planner import MAX_CHUNK_DURATION_MS, plan_chunks, plan_duration
+from app.config import settings
+from app.dispatcher import dispatch_chunks
+from app.silence import split_segment_ranges
+from app.stt_backends import create_backend
+
+DEFAULT_FILE = os.path.join(os.path.dirname(__file__), "..", "..", "..", "test_audio.m4a")
+
+
+def plan_file(path: str, wav_path: str):
+    """converter 와 같이 모노/16kHz WAV 로 변환하고, transcription 워커와 같은 기준으로 청크를 나눈다."""
+    audio = AudioSegment.from_file(path).set_channels(1).set_frame_rate(16000).set_sample_width(2)
+    audio.export(wav_path, format="wav", parameters=["-acodec", "pcm_s16le"])
+    pcm = PcmSource.open(wav_path)
+    ranges = split_segment_ranges(pcm, min_silence_len=1000, silence_thresh=-40, keep_silence=500)
+    return pcm, plan_chunks(ranges, max_duration=MAX_CHUNK_DURATION_MS)
+
+
+def run_backend(name: str, pcm: PcmSource, chunks, concurrency: int) -> None:
+    try:
+        backend = create_backend(name)
+        start = time.perf_counter()
+        backend.warm_up()
+        load_sec = time.perf_counter() - start
+    except Exception as e:
+        print(f"{name:<10}: 건너뜀 ({e})")
+        return
+
+    latencies = []
+
+    def transcribe(index, plan):
+        buf = io.BytesIO()
+        encode_intervals_wav(pcm, plan, buf)
+        buf.seek(0)
+        start = time.perf_counter()
+        text = backend.transcribe(buf)
+        latencies.append(time.perf_counter() - start)
+        return text
+
+    audio_sec = sum(plan_duration(plan) for plan in chunks) / 1000
+    start = time.perf_counter()
+    try:
+        texts = dispatch_chunks(chunks, transcribe, max_concurrency=concurrency, max_retries=0, job_id=f"bench-{name}")
+    except Exception as e:
+        print(f"{name:<10}: 실패 ({e})")
+        return
+    wall_sec = time.perf_counter() - start
+
+    p95 = sorted(latencies)[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"{name:<10}: 전사 {wall_sec:7.2f}초, RTF {wall_sec / audio_sec:6.3f}, 처리량 {audio_sec / wall_sec:6.2f}x 실시간, "
+          f"청크 지연 평균 {statistics.mean(latencies):5.2f}초 / p95 {p95:5.2f}초, 모델 준비 {load_sec:5.2f}초")
+    print(f"{'':<10}  {' '.join(texts)[:120]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", default=DEFAULT_FILE, help="측정할 오디오 파일 (기본: 저장소의 test_audio.m4a)")
+    parser.add_argument("--backends", default="cloudflare,openai,local", help="비교할 백엔드 (쉼표 구분)")
+    parser.add_argument("--concurrency", type=int, default=settings.STT_MAX_CONCURRENCY, help="동시 청크 수")
+    parser.add_argument("--max-chunks", type=int, default=0, help="앞에서부터 이 개수의 청크만 사용 (0 이면 전체)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pcm, chunks = plan_file(args.file, os.path.join(tmp, "bench.wav"))
+        try:
+            if args.max_chunks:
+                chunks = chunks[:args.max_chunks]
+            audio_sec = sum(plan_duration(plan) for plan in chunks) / 1000
+            print(f"오디오: {args.file}, 청크 {len(chunks)}개, 전사 대상 {audio_sec:.1f}초, 동시 {args.concurrency}개, "
+                  f"local 모델 {settings.LOCAL_WHISPER_MODEL} ({settings.LOCAL_WHISPER_COMPUTE_TYPE})")
+            for name in args.backends.split(","):
+                if name.strip():
+                    run_backend(name.strip(), pcm, chunks, args.concurrency)
+        finally:
+            pcm.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+import os
+
+# app.config 는 import 시점에 환경 변수를 읽으므로 테스트용 값을 먼저 설정
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("CLOUDFLARE_ACCOUNT_ID", "test-account")
+os.environ.setdefault("CLOUDFLARE_API_TOKEN", "test-token")
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
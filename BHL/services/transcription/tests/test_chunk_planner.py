@@ -0,0 +1,43 @@
+from app.chunk_planner import MAX_CHUNK_DURATION_MS, MIN_TAIL_MS, plan_chunks, plan_duration
+
+
+def test_merges_ranges_up_to_max_duration():
+    ranges = [(0, 20000), (21000, 41000), (42000, 61999)]
+    # 세 구간의 합은 59,999ms 로 한 청크에 들어간다
+    assert plan_chunks(ranges) == [[(0, 20000), (21000, 41000), (42000, 61999)]]
+    assert plan_duration(plan_chunks(ranges)[0]) == MAX_CHUNK_DURATION_MS
+
+
+def test_starts_new_chunk_when_next_range_overflows():
+    ranges = [(0, 30000), (31000, 61000), (62000, 63000)]
+    assert plan_chunks(ranges) == [[(0, 30000)], [(31000, 61000), (62000, 63000)]]
+
+
+def test_adjacent_ranges_are_coalesced():
+    ranges = [(0, 1000), (1000, 2000), (2500, 3000)]
+    assert plan_chunks(ranges) == [[(0, 2000), (2500, 3000)]]
+
+
+def test_long_range_is_split_into_max_duration_pieces():
+    start, end = 5000, 5000 + 2 * MAX_CHUNK_DURATION_MS + 5000
+    plans = plan_chunks([(0, 1000), (start, end), (end + 100, end + 200)])
+    assert plans == [
+        [(0, 1000)],
+        [(start, start + MAX_CHUNK_DURATION_MS)],
+        [(start + MAX_CHUNK_DURATION_MS, start + 2 * MAX_CHUNK_DURATION_MS)],
+        [(start + 2 * MAX_CHUNK_DURATION_MS, end)],
+        [(end + 100, end + 200)],
+    ]
+
+
+def test_short_tail_of_long_range_is_dropped():
+    # 마지막 조각이 MIN_TAIL_MS 이하면 버리고, 넘으면 남긴다
+    dropped = plan_chunks([(0, MAX_CHUNK_DURATION_MS + MIN_TAIL_MS)])
+    kept = plan_chunks([(0, MAX_CHUNK_DURATION_MS + MIN_TAIL_MS + 1)])
+    assert dropped == [[(0, MAX_CHUNK_DURATION_MS)]]
+    assert kept == [[(0, MAX_CHUNK_DURATION_MS)],
+                    [(MAX_CHUNK_DURATION_MS, MAX_CHUNK_DURATION_MS + MIN_TAIL_MS + 1)]]
+
+
+def test_empty_input():
+    assert plan_chunks([]) == []
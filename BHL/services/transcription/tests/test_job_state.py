@@ -0,0 +1,208 @@
+import time
+from datetime import timedelta
+
+import mongomock
+import pytest
+
+from app import job_state
+from app.job_state import (LeaseHeartbeat, claim_queued, complete_from_cache, complete_stage, create_job,
+                           fail_stage, find_expired, finish_stage, get_job, renew_lease, start_stage)
+
+JOB = "job-1"
+STAGE = "transcription"
+
+
+@pytest.fixture
+def jobs():
+    return mongomock.MongoClient().work_db.jobs
+
+
+def stage_of(jobs, job_id=JOB, stage=STAGE):
+    return get_job(jobs, job_id)["stages"][stage]
+
+
+def set_stage(jobs, status, job_id=JOB, stage=STAGE, **fields):
+    fields = {f"stages.{stage}.{name}": value for name, value in fields.items()}
+    jobs.update_one({"_id": job_id}, {"$set": {f"stages.{stage}.status": status, **fields}})
+
+
+def expire_lease(jobs, job_id=JOB, stage=STAGE):
+    jobs.update_one({"_id": job_id},
+                    {"$set": {f"stages.{stage}.lease_expires_at": job_state._now() - timedelta(seconds=1)}})
+
+
+# ---- start_stage ----
+
+@pytest.mark.parametrize("status", ["pending", "queued", "failed"])
+def test_start_stage_from_startable_status(jobs, status):
+    create_job(jobs, JOB)
+    set_stage(jobs, status)
+    job = start_stage(jobs, JOB, STAGE, "worker-a", input_path="/tmp/a.wav")
+    assert job is not None
+    stage = job["stages"][STAGE]
+    assert stage["status"] == "processing"
+    assert stage["lease_owner"] == "worker-a"
+    assert stage["attempts"] == 1
+    assert stage["input_path"] == "/tmp/a.wav"
+    assert job["status"] == "processing"
+
+
+def test_start_stage_refused_while_lease_is_live(jobs):
+    create_job(jobs, JOB)
+    assert start_stage(jobs, JOB, STAGE, "worker-a") is not None
+    assert start_stage(jobs, JOB, STAGE, "worker-b") is None
+    assert stage_of(jobs)["lease_owner"] == "worker-a"
+    assert stage_of(jobs)["attempts"] == 1
+
+
+def test_start_stage_takes_over_expired_lease(jobs):
+    create_job(jobs, JOB)
+    start_stage(jobs, JOB, STAGE, "worker-a")
+    expire_lease(jobs)
+    job = start_stage(jobs, JOB, STAGE, "worker-b")
+    assert job["stages"][STAGE]["lease_owner"] == "worker-b"
+    assert job["stages"][STAGE]["attempts"] == 2
+
+
+def test_start_stage_refused_when_completed(jobs):
+    create_job(jobs, JOB)
+    start_stage(jobs, JOB, STAGE, "worker-a")
+    assert complete_stage(jobs, JOB, STAGE, "worker-a")
+    assert start_stage(jobs, JOB, STAGE, "worker-b") is None
+
+
+def test_start_stage_creates_missing_job_document(jobs):
+    job = start_stage(jobs, "legacy-job", STAGE, "worker-a")
+    assert job["_id"] == "legacy-job"
+    assert job["stages"][STAGE]["status"] == "processing"
+    assert job["stages"]["conversion"]["status"] == "pending"
+    assert job["stages"]["summarization"]["status"] == "pending"
+
+
+# ---- finish_stage ----
+
+def test_finish_stage_by_lease_owner(jobs):
+    create_job(jobs, JOB)
+    start_stage(jobs, JOB, STAGE, "worker-a")
+    assert complete_stage(jobs, JOB, STAGE, "worker-a", transcript_ref="ref-1")
+    stage = stage_of(jobs)
+    assert stage["status"] == "completed"
+    assert stage["transcript_ref"] == "ref-1"
+    assert stage["lease_owner"] is None
+    assert get_job(jobs, JOB)["status"] == "processing"  # 마지막 단계가 아니므로 작업은 계속
+
+
+def test_finish_final_stage_completes_job(jobs):
+    create_job(jobs, JOB)
+    start_stage(jobs, JOB, "summarization", "worker-a")
+    assert complete_stage(jobs, JOB, "summarization", "worker-a")
+    assert get_job(jobs, JOB)["status"] == "completed"
+
+
+def test_fail_stage_marks_job_failed(jobs):
+    create_job(jobs, JOB)
+    start_stage(jobs, JOB, STAGE, "worker-a")
+    assert fail_stage(jobs, JOB, STAGE, "worker-a", "boom", status="failed_missing_input")
+    assert stage_of(jobs)["status"] == "failed_missing_input"
+    assert stage_of(jobs)["error"] == "boom"
+    assert get_job(jobs, JOB)["status"] == "failed"
+
+
+def test_finish_stage_after_lease_lost_returns_false(jobs):
+    create_job(jobs, JOB)
+    start_stage(jobs, JOB, STAGE, "worker-a")
+    expire_lease(jobs)
+    start_stage(jobs, JOB, STAGE, "worker-b")
+    assert not complete_stage(jobs, JOB, STAGE, "worker-a")
+    assert stage_of(jobs)["status"] == "processing"
+    assert stage_of(jobs)["lease_owner"] == "worker-b"
+    assert complete_stage(jobs, JOB, STAGE, "worker-b")
+
+
+# ---- claim_queued / find_expired ----
+
+@pytest.mark.parametrize("from_statuses,status,claimed", [
+    (("failed",), "failed", True),
+    (("failed",), "pending", False),
+    (("pending", "failed"), "pending", True),
+    (("pending", "failed"), "failed", True),
+    (("pending", "failed"), "completed", False),
+    (("pending",), "failed", False),
+])
+def test_claim_queued_from_statuses(jobs, from_statuses, status, claimed):
+    create_job(jobs, JOB)
+    set_stage(jobs, status)
+    assert claim_queued(jobs, JOB, STAGE, "scanner-1", from_statuses=from_statuses) is claimed
+    assert stage_of(jobs)["status"] == ("queued" if claimed else status)
+
+
+def test_claim_queued_is_exclusive_until_lease_expires(jobs):
+    create_job(jobs, JOB)
+    set_stage(jobs, "failed")
+    assert claim_queued(jobs, JOB, STAGE, "scanner-1")
+    assert not claim_queued(jobs, JOB, STAGE, "scanner-2", from_statuses=("pending", "failed"))
+    expire_lease(jobs)
+    assert claim_queued(jobs, JOB, STAGE, "scanner-2")
+    assert stage_of(jobs)["lease_owner"] == "scanner-2"
+
+
+def test_claim_queued_takes_over_expired_processing(jobs):
+    create_job(jobs, JOB)
+    start_stage(jobs, JOB, STAGE, "worker-a")
+    assert not claim_queued(jobs, JOB, STAGE, "scanner-1")
+    expire_lease(jobs)
+    assert claim_queued(jobs, JOB, STAGE, "scanner-1")
+    assert not complete_stage(jobs, JOB, STAGE, "worker-a")
+
+
+def test_find_expired_returns_only_expired_leases(jobs):
+    for job_id in ("live", "expired", "done"):
+        create_job(jobs, job_id)
+        start_stage(jobs, job_id, STAGE, "worker-a")
+    expire_lease(jobs, "expired")
+    complete_stage(jobs, "done", STAGE, "worker-a")
+    expire_lease(jobs, "done")
+    assert [doc["_id"] for doc in find_expired(jobs, STAGE, {"_id": 1})] == ["expired"]
+
+
+# ---- 임대 연장 ----
+
+def test_renew_lease_only_by_owner(jobs):
+    create_job(jobs, JOB)
+    start_stage(jobs, JOB, STAGE, "worker-a")
+    expire_lease(jobs)
+    assert not renew_lease(jobs, JOB, STAGE, "worker-b")
+    assert renew_lease(jobs, JOB, STAGE, "worker-a")
+    assert stage_of(jobs)["lease_expires_at"] > job_state._now().replace(tzinfo=None)
+    assert start_stage(jobs, JOB, STAGE, "worker-b") is None
+
+
+def test_lease_heartbeat_renews_and_detects_loss(jobs):
+    create_job(jobs, JOB)
+    start_stage(jobs, JOB, STAGE, "worker-a")
+    with LeaseHeartbeat(jobs, JOB, STAGE, "worker-a", interval=0.05) as heartbeat:
+        time.sleep(0.2)
+        assert not heartbeat.lost
+        assert "heartbeat_at" in stage_of(jobs)
+        # 다른 워커가 임대를 가져가면 다음 연장에서 lost
+        expire_lease(jobs)
+        start_stage(jobs, JOB, STAGE, "worker-b")
+        time.sleep(0.2)
+        assert heartbeat.lost
+    assert stage_of(jobs)["lease_owner"] == "worker-b"
+
+
+# ---- 캐시 재사용 ----
+
+def test_complete_from_cache_only_from_pending(jobs):
+    create_job(jobs, JOB)
+    assert complete_from_cache(jobs, JOB, "source-job")
+    job = get_job(jobs, JOB)
+    assert job["status"] == "completed"
+    assert job["cached_from"] == "source-job"
+    assert all(job["stages"][stage]["status"] == "completed" for stage in job_state.STAGES)
+
+    create_job(jobs, "started")
+    start_stage(jobs, "started", "conversion", "worker-a")
+    assert not complete_from_cache(jobs, "started", "source-job")
+    assert get_job(jobs, "started")["stages"]["conversion"]["status"] == "processing"
@@ -0,0 +1,22 @@
+from pathlib import Path
+
+import pytest
+
+# 서비스마다 빌드 컨텍스트가 달라 같은 모듈을 서비스별 app/ 에 복사해 둔다.
+# 복사본이 어긋나면 work_db 의 공유 문서(jobs 등) 스키마가 서비스마다 달라지므로 항상 같아야 한다.
+SERVICES_DIR = Path(__file__).resolve().parents[2]
+SHARED_MODULES = {
+    "db.py": ("converter", "summarization", "transcription"),
+    "event_log.py": ("converter", "summarization", "transcription"),
+    "job_state.py": ("converter", "summarization", "transcription"),
+    "audio_cache.py": ("converter", "summarization"),
+}
+
+
+@pytest.mark.parametrize("module,services", sorted(SHARED_MODULES.items()))
+def test_shared_module_copies_are_identical(module, services):
+    copies = {service: (SERVICES_DIR / service / "app" / module).read_bytes() for service in services}
+    reference = services[0]
+    different = [service for service, source in copies.items() if source != copies[reference]]
+    assert not different, (f"{module} 복사본이 {reference} 와 다릅니다: {', '.join(different)} "
+                           f"(한 곳을 고치면 {', '.join(services)} 모두에 같이 반영)")
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+from pydub import AudioSegment
+from pydub.silence import detect_nonsilent, detect_silence, split_on_silence
+
+from app.silence import (detect_nonsilent as np_detect_nonsilent, detect_silence as np_detect_silence,
+                         frame_energy, pcm_to_samples, split_segment_ranges)
+
+
+def synthetic_call(seconds: float, frame_rate: int, seed: int, channels: int = 1) -> AudioSegment:
+    """배경 잡음 위에 발화 버스트와 임계값 근처의 작은 소리가 섞인 PCM."""
+    rng = np.random.default_rng(seed)
+    total = int(seconds * frame_rate)
+    samples = rng.normal(0, 30, total)
+    pos = 0
+    while pos < total:
+        speech = int(rng.uniform(0.05, 3.0) * frame_rate)
+        pause = int(rng.uniform(0.2, 2.5) * frame_rate)
+        end = min(pos + speech, total)
+        # 일부 버스트는 -40 dBFS(약 327) 근처 크기로 만들어 경계 판단을 검증
+        scale = rng.choice([4000, 330, 300])
+        samples[pos:end] = rng.normal(0, scale, end - pos)
+        pos = end + pause
+    samples = np.clip(samples, -32768, 32767).astype(np.int16)
+    if channels > 1:
+        samples = np.repeat(samples, channels)
+    return AudioSegment(samples.tobytes(), frame_rate=frame_rate, sample_width=2, channels=channels)
+
+
+def energy_of(audio: AudioSegment) -> np.ndarray:
+    return frame_energy(pcm_to_samples(audio.raw_data, audio.sample_width), audio.frame_rate, audio.channels)
+
+
+def test_frame_energy_length_matches_pydub():
+    for frame_rate in (8000, 16000, 44100):
+        audio = synthetic_call(1.2345, frame_rate, seed=1)
+        assert len(energy_of(audio)) == len(audio)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_detect_silence_matches_pydub_16k_mono(seed):
+    # 운영 포맷 (converter 출력: 16kHz 모노 16bit)
+    audio = synthetic_call(30, 16000, seed)
+    energy = energy_of(audio)
+    for min_silence_len, silence_thresh in ((1000, -40), (300, -45)):
+        expected = detect_silence(audio, min_silence_len=min_silence_len, silence_thresh=silence_thresh)
+        assert np_detect_silence(energy, min_silence_len, silence_thresh) == expected
+        assert np_detect_silence(energy, min_silence_len, silence_thresh,
+                                 frame_rate=audio.frame_rate, frame_count=int(audio.frame_count())) == expected
+
+
+def near_threshold_noise(seed: int, frame_rate: int, channels: int = 1):
+    """-40 dBFS(약 327) 근처 크기의 잡음 - 창 RMS 가 임계값 바로 위아래를 오가 1ms 차이도 드러난다."""
+    rng = np.random.default_rng(seed)
+    total = int(rng.uniform(0.5, 1.5) * frame_rate)
+    samples = rng.normal(0, rng.uniform(200, 450), total).clip(-32768, 32767).astype(np.int16)
+    if channels > 1:
+        samples = np.repeat(samples, channels)
+    audio = AudioSegment(samples.tobytes(), frame_rate=frame_rate, sample_width=2, channels=channels)
+    return audio, int(rng.integers(100, 400))
+
+
+@pytest.mark.parametrize("frame_rate,channels", [(44100, 1), (22050, 2), (16000, 1)])
+def test_detect_silence_matches_pydub_with_sample_weighting(frame_rate, channels):
+    # 44.1kHz 처럼 ms 당 샘플 수가 정수가 아니면(44/45개) 샘플 수로 가중해야 pydub 과 같다
+    # (가중하지 않으면 이 시드들 중 일부에서 구간 끝이 1ms 어긋남)
+    for seed in range(300):
+        audio, min_silence_len = near_threshold_noise(seed, frame_rate, channels)
+        expected = detect_silence(audio, min_silence_len=min_silence_len, silence_thresh=-40)
+        actual = np_detect_silence(energy_of(audio), min_silence_len, -40, float(audio.max_possible_amplitude),
+                                   frame_rate=audio.frame_rate, frame_count=int(audio.frame_count()))
+        assert actual == expected, f"seed={seed}"
+
+
+def test_detect_nonsilent_matches_pydub_44k():
+    audio = synthetic_call(20, 44100, seed=7)
+    expected = detect_nonsilent(audio, min_silence_len=1000, silence_thresh=-40)
+    actual = np_detect_nonsilent(energy_of(audio), 1000, -40, frame_rate=44100, frame_count=int(audio.frame_count()))
+    assert actual == expected
+
+
+def test_truncated_last_ms_is_zero_padded_like_pydub():
+    # 마지막 ms 의 샘플이 모자라면 pydub 은 0 으로 채운 뒤 RMS 를 계산한다
+    for seed in range(100):
+        audio, min_silence_len = near_threshold_noise(seed, 16000)
+        audio = AudioSegment(audio.raw_data[:-2 * 9], frame_rate=16000, sample_width=2, channels=1)
+        expected = detect_silence(audio, min_silence_len=min_silence_len, silence_thresh=-40)
+        actual = np_detect_silence(energy_of(audio), min_silence_len, -40,
+                                   frame_rate=16000, frame_count=int(audio.frame_count()))
+        assert actual == expected, f"seed={seed}"
+
+
+def test_seek_step_matches_pydub():
+    audio = synthetic_call(15, 16000, seed=11)
+    expected = detect_silence(audio, min_silence_len=700, silence_thresh=-40, seek_step=7)
+    assert np_detect_silence(energy_of(audio), 700, -40, seek_step=7) == expected
+
+
+def test_split_segment_ranges_matches_split_on_silence():
+    audio = synthetic_call(40, 16000, seed=5)
+    ranges = split_segment_ranges(audio, min_silence_len=1000, silence_thresh=-40, keep_silence=500)
+    chunks = split_on_silence(audio, min_silence_len=1000, silence_thresh=-40, keep_silence=500)
+    assert [audio[start:end].raw_data for start, end in ranges] == [chunk.raw_data for chunk in chunks]
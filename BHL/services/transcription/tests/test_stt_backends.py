@@ -0,0 +1,107 @@
+import io
+import time
+
+import pytest
+import requests
+
+from app import stt_backends
+from app.stt_backends import (CloudflareWhisperBackend, LocalWhisperBackend, SttBackend, SttQuotaExceeded,
+                              SttRouter, create_backend)
+
+
+class QuotaBackend(SttBackend):
+    name = "remote"
+
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe(self, audio):
+        self.calls += 1
+        audio.read()
+        raise SttQuotaExceeded("429")
+
+
+class EchoBackend(SttBackend):
+    name = "local"
+
+    def transcribe(self, audio):
+        return audio.read().decode()
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.text = str(payload)
+        self._payload = payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(str(self.status_code), response=self)
+
+    def json(self):
+        return self._payload
+
+
+def test_router_falls_back_on_quota_and_rewinds_buffer():
+    remote, local = QuotaBackend(), EchoBackend()
+    router = SttRouter([remote, local], cooldown=60)
+    assert router.transcribe(io.BytesIO(b"first")) == "first"
+    # 쿨다운 동안은 한도에 걸린 백엔드를 다시 시도하지 않는다
+    assert router.transcribe(io.BytesIO(b"second")) == "second"
+    assert remote.calls == 1
+    assert router.calls == {"remote": 0, "local": 2}
+
+
+def test_router_retries_primary_after_cooldown():
+    remote = QuotaBackend()
+    router = SttRouter([remote, EchoBackend()], cooldown=0.05)
+    router.transcribe(io.BytesIO(b"a"))
+    time.sleep(0.1)
+    router.transcribe(io.BytesIO(b"b"))
+    assert remote.calls == 2
+
+
+def test_router_raises_when_last_backend_is_over_quota():
+    with pytest.raises(SttQuotaExceeded):
+        SttRouter([QuotaBackend()]).transcribe(io.BytesIO(b"a"))
+
+
+def test_cloudflare_maps_429_to_quota(monkeypatch):
+    monkeypatch.setattr(stt_backends.requests, "post", lambda *a, **k: FakeResponse(429, "rate limited"))
+    with pytest.raises(SttQuotaExceeded):
+        CloudflareWhisperBackend("account", "token").transcribe(io.BytesIO(b"a"))
+    monkeypatch.setattr(stt_backends.requests, "post", lambda *a, **k: FakeResponse(500, "error"))
+    with pytest.raises(RuntimeError) as error:
+        CloudflareWhisperBackend("account", "token").transcribe(io.BytesIO(b"a"))
+    assert not isinstance(error.value, SttQuotaExceeded)
+
+
+def test_rate_limit_applies_per_remote_backend(monkeypatch):
+    monkeypatch.setattr(stt_backends.settings, "STT_RATE_LIMIT_PER_SEC", 1.0)
+    monkeypatch.setattr(stt_backends.settings, "STT_RATE_LIMIT_BURST", 1)
+    monkeypatch.setattr(stt_backends.requests, "post", lambda *a, **k: FakeResponse(200, {"result": {"text": "ok"}}))
+    cloudflare = CloudflareWhisperBackend("account", "token")
+    local = EchoBackend()
+    router = SttRouter([cloudflare, local])
+
+    assert router.transcribe(io.BytesIO(b"a")) == "ok"
+    # 원격 토큰이 바닥나도 대체(local) 백엔드 호출은 원격 속도 제한에 묶이지 않는다
+    start = time.monotonic()
+    for _ in range(5):
+        assert local.transcribe(io.BytesIO(b"x")) == "x"
+    assert time.monotonic() - start < 0.5
+    # 원격은 다음 토큰까지 기다린다
+    start = time.monotonic()
+    cloudflare.transcribe(io.BytesIO(b"b"))
+    assert time.monotonic() - start >= 0.5
+
+
+def test_local_backend_requires_faster_whisper(monkeypatch):
+    monkeypatch.setattr(stt_backends.importlib.util, "find_spec", lambda name: None)
+    with pytest.raises(ValueError):
+        LocalWhisperBackend()
+
+
+def test_create_backend_rejects_unknown_name():
+    with pytest.raises(ValueError):
+        create_backend("nope")